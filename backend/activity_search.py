@@ -0,0 +1,187 @@
+"""Ranked, paginated search over an organization's activities.
+
+Backed by one compound MongoDB text index on `activities` (see `TEXT_INDEX`):
+
+    organization_id (prefix)  text: description + search_text  activity_category, date (suffix)
+
+The equality prefix confines every search to the organization's own index
+entries. Without it, a search in a small organization would walk the
+postings of every organization. The suffix keys let category and date
+filters be applied to index entries before any document is fetched.
+Descriptions weigh more than `search_text`, which holds the type fields of
+`details` (vehicle_type, event_type, ...) with underscores replaced by
+spaces. The text tokenizer keeps `flight_domestic` as one word, so the
+field is written with every activity (`search_text()`), and
+`python activity_search.py` backfills activities stored before it existed.
+"flight" then finds flight_domestic. Terms are stemmed and OR-ed; quote a
+phrase to require it.
+
+Results are ranked by text score, then newest first. Scores cannot be read
+from the index in order, so a ranked page scores and sorts its matches. The
+matches are capped at MAX_RANKED_CANDIDATES (taken in index order, before
+ranking), which bounds the work of broad terms; filters narrow the candidates
+first. Pages are cut by an opaque cursor holding the last result's (score,
+date, id), so pages stay stable while activities are added. Without `q` the
+same filters and cursor apply, newest first, read in index order.
+"""
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+logger = logging.getLogger("ecopulse.activity_search")
+
+# String fields of `details` per activity type (see the create endpoints in server.py)
+DETAIL_TEXT_FIELDS = (
+    "vehicle_type", "event_type", "equipment_type", "marketing_type", "activity_type", "welfare_type", "category"
+)
+TEXT_INDEX = [
+    ("organization_id", 1),
+    ("description", "text"),
+    ("search_text", "text"),
+    ("activity_category", 1),
+    ("date", 1),
+]
+TEXT_WEIGHTS = {"description": 10, "search_text": 3}
+TEXT_INDEX_NAME = "org_text_search_v2"
+# Earlier text index over the details fields; a collection can only have one
+OLD_TEXT_INDEX_NAME = "org_text_search"
+MAX_LIMIT = 100
+MAX_QUERY_LENGTH = 200
+MAX_RANKED_CANDIDATES = 5000
+BACKFILL_BATCH = 5000
+
+
+def search_text(details: Optional[Dict[str, Any]]) -> str:
+    """The searchable words of an activity's `details`: its type fields, underscores as spaces."""
+    details = details or {}
+    return " ".join(
+        details[field].replace("_", " ") for field in DETAIL_TEXT_FIELDS if isinstance(details.get(field), str)
+    )
+
+
+def encode_cursor(last: Dict[str, Any], ranked: bool) -> str:
+    key = [last["score"], last["date"], last["id"]] if ranked else [last["date"], last["id"]]
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, ranked: bool) -> List[Any]:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != (3 if ranked else 2):
+        raise ValueError("Invalid cursor (was it issued for a different query?)")
+    return key
+
+
+def after(key: List[Any], ranked: bool) -> Dict[str, Any]:
+    """Filter for results sorting after `key` in (score desc,) date desc, id desc order."""
+    if ranked:
+        score, date, activity_id = key
+        return {"$or": [
+            {"score": {"$lt": score}},
+            {"score": score, "date": {"$lt": date}},
+            {"score": score, "date": date, "id": {"$lt": activity_id}},
+        ]}
+    date, activity_id = key
+    return {"$or": [{"date": {"$lt": date}}, {"date": date, "id": {"$lt": activity_id}}]}
+
+
+def _check_date(value: Optional[str], name: str):
+    if value is not None:
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"{name} must be YYYY-MM-DD")
+
+
+async def search_activities(
+    db, org_id: str, fields: Dict[str, int], q: Optional[str] = None, category: Optional[str] = None,
+    start: Optional[str] = None, end: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """One page of matching activities (projected to `fields`) and the cursor of the next.
+
+    Dates are filtered on [start, end). Raises ValueError for invalid parameters.
+    """
+    q = (q or "").strip()
+    if len(q) > MAX_QUERY_LENGTH:
+        raise ValueError(f"q is limited to {MAX_QUERY_LENGTH} characters")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+    _check_date(start, "start")
+    _check_date(end, "end")
+    ranked = bool(q)
+
+    match: Dict[str, Any] = {"organization_id": org_id}
+    if ranked:
+        match["$text"] = {"$search": q}
+    if category:
+        match["activity_category"] = category
+    if start or end:
+        match["date"] = {**({"$gte": start} if start else {}), **({"$lt": end} if end else {})}
+    page_filter = after(decode_cursor(cursor, ranked), ranked) if cursor else None
+
+    if ranked:
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": match},
+            {"$limit": MAX_RANKED_CANDIDATES},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+        ]
+        if page_filter:
+            pipeline.append({"$match": page_filter})
+        pipeline += [
+            {"$sort": {"score": -1, "date": -1, "id": -1}},
+            {"$limit": limit + 1},
+            {"$project": {**fields, "score": 1}},
+        ]
+        items = await db.activities.aggregate(pipeline).to_list(limit + 1)
+    else:
+        query = {"$and": [match, page_filter]} if page_filter else match
+        items = await db.activities.find(query, fields).sort([("date", -1), ("id", -1)]).limit(limit + 1).to_list(limit + 1)
+
+    more = len(items) > limit
+    items = items[:limit]
+    return {
+        "items": items,
+        "next_cursor": encode_cursor(items[-1], ranked) if more else None,
+    }
+
+
+async def backfill_search_text(db) -> int:
+    """Set `search_text` on activities stored before it existed; returns how many were updated."""
+    updated = 0
+    ops: List[UpdateOne] = []
+    cursor = db.activities.find({"search_text": {"$exists": False}}, {"_id": 1, "details": 1}).batch_size(BACKFILL_BATCH)
+    async for activity in cursor:
+        ops.append(UpdateOne({"_id": activity["_id"]}, {"$set": {"search_text": search_text(activity.get("details"))}}))
+        if len(ops) >= BACKFILL_BATCH:
+            updated += (await db.activities.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        updated += (await db.activities.bulk_write(ops, ordered=False)).modified_count
+    logger.info(f"search_text backfilled on {updated} activities")
+    return updated
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        print({"updated": await backfill_search_text(client[os.environ['DB_NAME']])})
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,280 @@
+"""Admission control for expensive endpoints.
+
+Two checks run before an expensive handler, in this order:
+
+* Per-organization rate: a token bucket per `org_id` holding up to `burst`
+  tokens and refilled at `rate` tokens per second. Each route costs its
+  weight in tokens (an LLM insight costs more than a leaderboard read). An
+  organization over its budget gets `RateLimited` with the time until
+  enough tokens are back, answered as 429 with Retry-After.
+* Per-route concurrency: at most `limit` requests of a route run at once in
+  this process, so one hot route cannot take every event-loop turn or pooled
+  Mongo connection. Others wait in FIFO order, but only within the queue-time
+  budget. The budget counts from the moment the request was received, so
+  time already lost to a saturated event loop counts too. A request whose
+  expected wait (queue position x average service time) exceeds what is
+  left is shed at once, and one still waiting when it runs out is shed
+  then. Both raise `Overloaded` (503 with Retry-After), and the tokens the
+  request took are refunded: a shed request did no work.
+
+Callers admit only requests that do work: responses served from a cache or
+answered 304 skip both checks (see `cached_response` in server.py).
+
+`TokenBuckets` keeps the buckets per process, so with N workers an
+organization gets up to N times the rate. With `ADMISSION_REDIS_URL`,
+`RedisTokenBuckets` keeps them in Redis instead: one atomic script per check,
+timed by Redis's clock, so the rate holds across all workers. Redis errors
+are logged and the request is admitted: an unavailable limiter must not take
+the API down. Concurrency limits stay per process, like the event loop and
+the connection pool they protect.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger("ecopulse.admission")
+
+EWMA_ALPHA = 0.2
+MAX_BUCKETS = 100_000
+
+
+class RateLimited(Exception):
+    """The organization has used up its request budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    """The route's queue is longer than the queue-time budget allows."""
+
+    def __init__(self, route: str, retry_after: float):
+        super().__init__(f"{route} is overloaded, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class TokenBuckets:
+    """In-process token buckets, least recently used evicted past `max_buckets`
+    (an evicted bucket restarts full)."""
+
+    def __init__(self, rate: float, burst: float, max_buckets: int = MAX_BUCKETS):
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        # key -> [tokens, monotonic time of the last update]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def take(self, key: str, cost: float) -> float:
+        """Take `cost` tokens: 0 if admitted, otherwise the seconds until they are available."""
+        now = time.monotonic()
+        cost = min(cost, self.burst)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / self.rate
+
+    async def refund(self, key: str, cost: float):
+        """Give back tokens taken by a request that was not served."""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(self.burst, bucket[0] + min(cost, self.burst))
+
+
+# KEYS[1] bucket; ARGV rate, burst, cost. Returns the wait as a string (Lua
+# numbers come back from Redis truncated to integers).
+_TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+# KEYS[1] bucket; ARGV burst, cost. A bucket that expired meanwhile is full already.
+_REFUND_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+  redis.call('HSET', KEYS[1], 'tokens', tostring(math.min(tonumber(ARGV[1]), tokens + tonumber(ARGV[2]))))
+end
+return 0
+"""
+
+
+class RedisTokenBuckets:
+    """Token buckets shared by all workers through Redis (`pip install redis`)."""
+
+    def __init__(self, url: str, rate: float, burst: float, prefix: str = "ecopulse:ratelimit:"):
+        import redis.asyncio as redis  # optional dependency
+
+        self._errors = (redis.RedisError, OSError)
+        # Connections are opened lazily, i.e. in each worker after the fork
+        self._redis = redis.Redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._refund = self._redis.register_script(_REFUND_SCRIPT)
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+
+    async def take(self, key: str, cost: float) -> float:
+        try:
+            wait = await self._take(keys=[self.prefix + key], args=[self.rate, self.burst, min(cost, self.burst)])
+        except self._errors as e:
+            logger.warning(f"Rate limiter unavailable, admitting request: {e}")
+            return 0.0
+        return float(wait)
+
+    async def refund(self, key: str, cost: float):
+        try:
+            await self._refund(keys=[self.prefix + key], args=[self.burst, min(cost, self.burst)])
+        except self._errors as e:
+            logger.warning(f"Rate limiter unavailable, refund dropped: {e}")
+
+
+def make_token_buckets(url: Optional[str], rate: float, burst: float):
+    """Redis-backed buckets when `url` is set, otherwise per process."""
+    if url:
+        return RedisTokenBuckets(url, rate, burst)
+    return TokenBuckets(rate, burst)
+
+
+class RouteGate:
+    """FIFO concurrency limit for one route, shedding by expected queue time."""
+
+    def __init__(self, route: str, limit: int, queue_budget: float):
+        self.route = route
+        self.limit = limit
+        self.queue_budget = queue_budget
+        self.active = 0
+        self.service_seconds: Optional[float] = None  # EWMA of time holding a slot
+        self.admitted = 0
+        self.shed = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def expected_wait(self) -> float:
+        """Rough wait for a request joining the queue now."""
+        return (len(self._waiters) + 1) / self.limit * (self.service_seconds or 0.0)
+
+    async def acquire(self, waited: float = 0.0):
+        """Take a slot, or raise `Overloaded`. `waited`: seconds the request has already queued elsewhere."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        budget = self.queue_budget - waited
+        expected = self.expected_wait()
+        if expected > budget:
+            self.shed += 1
+            raise Overloaded(self.route, expected)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, budget)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            raise Overloaded(self.route, self.expected_wait())
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Cancelled right after being handed a slot: pass it on
+                self._release_slot()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+        self.admitted += 1
+
+    def release(self, held: float):
+        """Give the slot back after holding it for `held` seconds."""
+        if self.service_seconds is None:
+            self.service_seconds = held
+        else:
+            self.service_seconds += EWMA_ALPHA * (held - self.service_seconds)
+        self._release_slot()
+
+    def _release_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Handed straight to the next waiter: `active` is unchanged
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "service_ms": round(self.service_seconds * 1000, 1) if self.service_seconds is not None else None,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    cost: float  # tokens taken from the organization's bucket
+    concurrency: int  # requests running at once per process
+
+
+class AdmissionController:
+    def __init__(self, buckets, policies: Dict[str, RoutePolicy], queue_budget: float):
+        self.buckets = buckets
+        self.policies = policies
+        self.gates = {route: RouteGate(route, p.concurrency, queue_budget) for route, p in policies.items()}
+        self.rate_limited = 0
+
+    async def admit(self, route: str, org_id: str, waited: float = 0.0) -> RouteGate:
+        """Check the organization's rate, then take a slot of `route` (release it on the returned gate)."""
+        cost = self.policies[route].cost
+        wait = await self.buckets.take(org_id, cost)
+        if wait > 0:
+            self.rate_limited += 1
+            raise RateLimited(wait)
+        gate = self.gates[route]
+        try:
+            await gate.acquire(waited)
+        except Overloaded:
+            await self.buckets.refund(org_id, cost)
+            raise
+        return gate
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if isinstance(self.buckets, RedisTokenBuckets) else "memory",
+            "rate_per_second": self.buckets.rate,
+            "burst": self.buckets.burst,
+            "rate_limited": self.rate_limited,
+            "routes": {route: gate.status() for route, gate in self.gates.items()},
+        }
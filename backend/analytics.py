@@ -0,0 +1,153 @@
+"""Per-organization analytics shared by the dashboard, insights and report.
+
+Each collection is summarised by one aggregation: activities go through a
+single `$facet` (totals, per-category, per-month and the most recent
+emissions for trend windows), energy readings through another. Only the
+fields the summaries need are projected, so descriptions and details never
+leave the database. The three pipelines run concurrently.
+
+Activities moved to cold storage (cold_storage.py) are added from their
+monthly rollups, so summaries cover hot and archived activities alike.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import cold_storage
+
+# Newest activities returned for recent-vs-older comparisons (2 x 30)
+TREND_SAMPLE = 60
+
+
+def _by_key(rows: List[Dict[str, Any]]) -> Dict[str, float]:
+    return {row["_id"]: row["emissions"] for row in rows if row["_id"]}
+
+
+def org_match(org_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """Filter for an organization's entries, optionally within dates [start, end)."""
+    match: Dict[str, Any] = {"organization_id": org_id}
+    if start or end:
+        match["date"] = {**({"$gte": start} if start else {}), **({"$lt": end} if end else {})}
+    return match
+
+
+async def activity_summary(db, org_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    pipeline = [
+        {"$match": org_match(org_id, start, end)},
+        {"$project": {"_id": 0, "activity_category": 1, "carbon_emission_kg": 1, "date": 1, "cost": 1}},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None,
+                "emissions": {"$sum": "$carbon_emission_kg"},
+                "cost": {"$sum": {"$ifNull": ["$cost", 0]}},
+                "count": {"$sum": 1},
+                "first_date": {"$min": "$date"},
+                "last_date": {"$max": "$date"}
+            }}],
+            "by_category": [{"$group": {"_id": "$activity_category", "emissions": {"$sum": "$carbon_emission_kg"}}}],
+            "by_month": [{"$group": {"_id": {"$substr": ["$date", 0, 7]}, "emissions": {"$sum": "$carbon_emission_kg"}}}],
+            "recent": [
+                {"$sort": {"date": -1}},
+                {"$limit": TREND_SAMPLE},
+                {"$project": {"carbon_emission_kg": 1, "date": 1}}
+            ]
+        }}
+    ]
+    results, cold = await asyncio.gather(
+        db.activities.aggregate(pipeline).to_list(1), cold_storage.archived_summary(db, org_id, start, end)
+    )
+    result = results[0]
+    totals = result["totals"][0] if result["totals"] else {}
+    by_category = {row["_id"] or "other": row["emissions"] for row in result["by_category"]}
+    by_month = _by_key(result["by_month"])
+    recent = [(row.get("date") or "", row.get("carbon_emission_kg", 0)) for row in result["recent"]]
+    dates = [d for d in (totals.get("first_date"), totals.get("last_date")) if d]
+    if cold["count"]:
+        for category, emissions in cold["by_category"].items():
+            by_category[category] = by_category.get(category, 0) + emissions
+        for month, emissions in cold["by_month"].items():
+            by_month[month] = by_month.get(month, 0) + emissions
+        dates += [cold["first_date"], cold["last_date"]]
+        if len(recent) < TREND_SAMPLE or cold["last_date"] > recent[-1][0]:
+            # Archived activities can still be among the newest (short or backdated hot history)
+            recent = sorted(
+                recent + await cold_storage.newest(db, org_id, TREND_SAMPLE, start, end),
+                key=lambda row: row[0], reverse=True
+            )[:TREND_SAMPLE]
+    return {
+        "emissions": totals.get("emissions", 0) + cold["emissions"],
+        "cost": totals.get("cost", 0) + cold["cost"],
+        "count": totals.get("count", 0) + cold["count"],
+        "first_date": min(dates, default=""),
+        "last_date": max(dates, default=""),
+        "by_category": by_category,
+        "by_month": by_month,
+        # Newest first, by activity date
+        "recent_emissions": [emissions for _, emissions in recent]
+    }
+
+
+async def energy_summary(db, org_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    pipeline = [
+        {"$match": org_match(org_id, start, end)},
+        {"$project": {"_id": 0, "carbon_emission_kg": 1, "date": 1}},
+        {"$facet": {
+            "totals": [{"$group": {"_id": None, "emissions": {"$sum": "$carbon_emission_kg"}, "count": {"$sum": 1}}}],
+            "by_month": [{"$group": {"_id": {"$substr": ["$date", 0, 7]}, "emissions": {"$sum": "$carbon_emission_kg"}}}]
+        }}
+    ]
+    result = (await db.energy_data.aggregate(pipeline).to_list(1))[0]
+    totals = result["totals"][0] if result["totals"] else {}
+    return {
+        "emissions": totals.get("emissions", 0),
+        "count": totals.get("count", 0),
+        "by_month": _by_key(result["by_month"])
+    }
+
+
+async def goal_summary(db, org_id: str, top: int = 5) -> Dict[str, Any]:
+    counts, first_goals = await asyncio.gather(
+        db.goals.aggregate([
+            {"$match": {"organization_id": org_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None),
+        db.goals.find(
+            {"organization_id": org_id}, {"_id": 0, "title": 1, "progress_percent": 1}
+        ).to_list(top)
+    )
+    by_status = {row["_id"]: row["count"] for row in counts}
+    return {
+        "active": by_status.get("active", 0),
+        "completed": by_status.get("completed", 0),
+        "top": [{"title": g["title"], "progress": g.get("progress_percent", 0)} for g in first_goals]
+    }
+
+
+async def org_summary(db, org_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """Activity and energy summaries (within dates [start, end) if given) and goal counts."""
+    activity, energy, goals = await asyncio.gather(
+        activity_summary(db, org_id, start, end), energy_summary(db, org_id, start, end), goal_summary(db, org_id)
+    )
+    return {"activity": activity, "energy": energy, "goals": goals}
+
+
+def reduction_percent(activity: Dict[str, Any], window: int = 30) -> float:
+    """Percent drop of the newest `window` activities versus the `window` before them.
+
+    Like the original in-memory check, this needs more than 2 * window activities.
+    """
+    recent_emissions = activity["recent_emissions"]
+    if activity["count"] <= 2 * window or len(recent_emissions) < 2 * window:
+        return 0
+    recent_total = sum(recent_emissions[:window])
+    older_total = sum(recent_emissions[window:2 * window])
+    if older_total <= 0:
+        return 0
+    return ((older_total - recent_total) / older_total) * 100
+
+
+def merge_monthly(*monthly: Dict[str, float]) -> Dict[str, float]:
+    merged: Dict[str, float] = {}
+    for series in monthly:
+        for month, value in series.items():
+            merged[month] = merged.get(month, 0) + value
+    return merged
@@ -0,0 +1,192 @@
+"""Online anomaly detection for energy readings.
+
+Every reading is scored against a per (organization, site, metric) state of
+fixed size, however long the history:
+
+    expected  = seasonal mean of the reading's slot once that slot has
+                SEASONAL_WARMUP observations, else the overall EWMA level
+    residual  = value - expected
+    z         = residual / max(sqrt(EWMA residual variance), floors)
+
+Slots are the day of the week for daily `energy_data` entries and the hour
+of the week (168 slots) for meter readings. A reading with |z| >= THRESHOLD
+after WARMUP readings is an anomaly. It is recorded in `alerts` and updates
+the state only after being clipped to the threshold band, so one spike cannot
+drag the baseline along with it.
+
+Scoring is plain float arithmetic (a few microseconds per reading). Storage
+costs one state read and one write per site, metric and batch. States are
+saved under an optimistic `rev` check: when two batches for the same site
+race, the later save fails and that batch is rescored from the fresh state.
+Readings older than
+the newest one already scored (late backfills) are stored but not scored
+online; `anomaly_backfill.py` rescores the full history with the same
+arithmetic, vectorized across organizations, and leaves the states where
+online scoring picks up.
+"""
+import math
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+ALPHA = 0.1             # overall level and residual variance: ~10-reading memory
+# Per-slot means. A daily slot is seen once a week, so it adapts faster than the
+# level; a meter hour-of-week slot sees every reading of that hour (6-60 a week)
+SEASONAL_ALPHA = 0.3
+WARMUP = 14
+MAX_SAVE_RETRIES = 5
+SEASONAL_WARMUP = 3
+THRESHOLD = 4.0
+# A flat series has ~0 variance; these keep tiny wobbles from scoring as anomalies
+RELATIVE_STD_FLOOR = 0.05
+ABSOLUTE_STD_FLOOR = 0.01
+
+# source -> (metrics scored, seasonal slots)
+SOURCES = {
+    "energy_data": (("electricity_kwh", "ac_hours"), 7),
+    "meter": (("kwh",), 168),
+}
+
+
+def season_of(ts: datetime, seasons: int) -> int:
+    return ts.weekday() if seasons == 7 else ts.weekday() * 24 + ts.hour
+
+
+def new_state(seasons: int) -> Dict[str, Any]:
+    return {
+        "n": 0, "level": 0.0, "resid_var": 0.0,
+        "season_n": [0] * seasons, "season_mean": [0.0] * seasons,
+        "last_ts": None,
+    }
+
+
+def observe(state: Dict[str, Any], value: float, season: int) -> Optional[Tuple[float, float]]:
+    """Score `value`, then fold it into `state`. Returns (z, expected), or None while warming up."""
+    if state["n"] == 0:
+        state["level"] = value
+    seasonal = state["season_n"][season] >= SEASONAL_WARMUP
+    expected = state["season_mean"][season] if seasonal else state["level"]
+    residual = value - expected
+    std = max(math.sqrt(state["resid_var"]), RELATIVE_STD_FLOOR * abs(expected), ABSOLUTE_STD_FLOOR)
+    z = residual / std
+    scored = state["n"] >= WARMUP
+
+    # Learn from the reading, limited to the threshold band
+    band = THRESHOLD * std
+    if scored and abs(residual) > band:
+        residual = math.copysign(band, residual)
+    clipped = expected + residual
+    state["resid_var"] = (1 - ALPHA) * state["resid_var"] + ALPHA * residual * residual
+    state["level"] += ALPHA * (clipped - state["level"])
+    if state["season_n"][season] == 0:
+        state["season_mean"][season] = clipped
+    else:
+        state["season_mean"][season] += SEASONAL_ALPHA * (clipped - state["season_mean"][season])
+    state["season_n"][season] += 1
+    state["n"] += 1
+    return (z, expected) if scored else None
+
+
+def alert_document(
+    org_id: str, site_id: str, source: str, metric: str, timestamp: str,
+    value: float, expected: float, z: float, reference_id: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "organization_id": org_id,
+        "site_id": site_id,
+        "source": source,
+        "metric": metric,
+        "timestamp": timestamp,
+        "value": round(value, 4),
+        "expected": round(expected, 4),
+        "z_score": round(z, 2),
+        "direction": "spike" if z > 0 else "drop",
+        "reference_id": reference_id,
+        "status": "open",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _state_key(org_id: str, site_id: str, source: str, metric: str) -> Dict[str, str]:
+    return {"organization_id": org_id, "site_id": site_id, "source": source, "metric": metric}
+
+
+async def load_state(db, key: Dict[str, str], seasons: int) -> Dict[str, Any]:
+    doc = await db.anomaly_state.find_one(key, {"_id": 0})
+    return doc or new_state(seasons)
+
+
+async def save_state(db, key: Dict[str, str], state: Dict[str, Any]) -> bool:
+    """Store `state`; False when another writer saved the state since it was loaded."""
+    rev = state.get("rev")
+    fields = {k: v for k, v in state.items() if k not in key and k != "rev"}
+    try:
+        # A missing document matches rev None and is inserted; a newer rev fails the
+        # match, and the upsert then hits the unique key
+        await db.anomaly_state.update_one({**key, "rev": rev}, {"$set": {**fields, "rev": (rev or 0) + 1}}, upsert=True)
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def record_alerts(db, alerts: List[Dict[str, Any]]):
+    """Insert alerts, ignoring ones already recorded for the same reading (reruns, backfills)."""
+    if not alerts:
+        return
+    await db.alerts.bulk_write([
+        UpdateOne(
+            {**_state_key(a["organization_id"], a["site_id"], a["source"], a["metric"]), "timestamp": a["timestamp"]},
+            {"$setOnInsert": a},
+            upsert=True
+        )
+        for a in alerts
+    ], ordered=False)
+
+
+async def detect(
+    db, org_id: str, site_id: str, source: str,
+    readings: List[Tuple[datetime, Dict[str, Optional[float]], Optional[str]]]
+) -> Tuple[Dict[str, Dict[str, float]], List[Dict[str, Any]]]:
+    """Score `readings` ([(timestamp, {metric: value}, reference id)]) in time order.
+
+    Returns the z-scores per reading timestamp ({iso timestamp: {metric: z}})
+    and the alerts, which are also stored.
+    """
+    metrics, seasons = SOURCES[source]
+    readings = sorted(readings, key=lambda r: r[0])
+    scores: Dict[str, Dict[str, float]] = {}
+    alerts: List[Dict[str, Any]] = []
+    for metric in metrics:
+        key = _state_key(org_id, site_id, source, metric)
+        for _ in range(MAX_SAVE_RETRIES):
+            state = await load_state(db, key, seasons)
+            metric_scores: List[Tuple[str, float]] = []
+            metric_alerts: List[Dict[str, Any]] = []
+            for ts, values, reference_id in readings:
+                timestamp = ts.isoformat()
+                value = values.get(metric)
+                if value is None or (state["last_ts"] is not None and timestamp < state["last_ts"]):
+                    continue
+                state["last_ts"] = timestamp
+                result = observe(state, float(value), season_of(ts, seasons))
+                if result is None:
+                    continue
+                z, expected = result
+                metric_scores.append((timestamp, round(z, 2)))
+                if abs(z) >= THRESHOLD:
+                    metric_alerts.append(
+                        alert_document(org_id, site_id, source, metric, timestamp, value, expected, z, reference_id)
+                    )
+            if await save_state(db, key, state):
+                break
+        else:
+            raise RuntimeError(f"Anomaly state {site_id}/{metric} kept changing; gave up after {MAX_SAVE_RETRIES} attempts")
+        for timestamp, z in metric_scores:
+            scores.setdefault(timestamp, {})[metric] = z
+        alerts.extend(metric_alerts)
+    await record_alerts(db, alerts)
+    return scores, alerts
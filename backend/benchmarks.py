@@ -0,0 +1,327 @@
+"""Peer benchmarking: where an organization's emissions fall among all organizations.
+
+Three layers, each maintained incrementally:
+
+    benchmark_values    {organization_id, month, category, emissions_kg, entries}
+                        One per org, month and category (plus "total"). Updated
+                        with $inc by `record_event` on every activity or energy
+                        mutation, from the same fields the leaderboard sums.
+    benchmark_months    {month, version}   bumped with every change to the month
+    benchmark_sketches  {month, version, built_at, sketches: {category: {metric: t-digest}},
+                         orgs: {category: [org ids]}, staffed: [org ids with a headcount]}
+
+A month's t-digests (quantile_sketch.py) are rebuilt from its
+`benchmark_values` only when its version has moved on, and at most once per
+`refresh_seconds`. Past months are therefore built once, and the current month
+at most once per interval, whatever the write rate. Built digests are stored
+for other workers and cached in process. A trailing window merges its
+monthly digests, so a multi-month window ranks the organization's average
+month against org-months: every month of every organization active in the
+category during the window. It is not a ranking of the peers' own averages,
+which the monthly digests cannot give. Months without entries count as 0 on
+both sides, so the merged digests get a zero weight for each peer's
+inactive months (counted from the stored org ids). The reported `peers` is
+the number of distinct organizations. Each lookup is then a binary search.
+
+Metrics are `kg` (emissions) and `kg_per_staff` (divided by the
+organization's latest `num_people` from energy entries). Percentiles are the
+share of peers with lower emissions, so lower is better. Only organizations
+with entries in a category during the window count as peers for it.
+
+`python benchmarks.py` rebuilds `benchmark_values` from scratch (first
+deployment, or repair).
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from quantile_sketch import TDigest
+
+logger = logging.getLogger("ecopulse.benchmarks")
+
+METRICS = ("kg", "kg_per_staff")
+TOTAL = "total"
+COMPRESSION = 100
+MAX_CACHED_WINDOWS = 64
+REPORTED_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# (digests per category and metric, active org ids per category, org ids with a headcount)
+MonthSketches = Tuple[Dict[str, Dict[str, TDigest]], Dict[str, List[str]], List[str]]
+
+
+async def record_event(db, org_id: str, event: Optional[str], data: Any):
+    """Apply an activity or energy mutation to `benchmark_values` (other events are ignored)."""
+    if event in ("activity_created", "activity_deleted"):
+        category = data["activity_category"]
+    elif event == "energy_created":
+        category = "energy"
+    else:
+        return
+    sign = -1 if event == "activity_deleted" else 1
+    month = data["date"][:7]
+    kg = data.get("carbon_emission_kg") or 0
+    await db.benchmark_values.bulk_write([
+        UpdateOne(
+            {"organization_id": org_id, "month": month, "category": key},
+            {"$inc": {"emissions_kg": sign * kg, "entries": sign}},
+            upsert=True
+        )
+        for key in (category, TOTAL)
+    ], ordered=False)
+    await db.benchmark_months.update_one({"month": month}, {"$inc": {"version": 1}}, upsert=True)
+    if event == "energy_created" and data.get("num_people"):
+        # Headcount for per-staff metrics: the newest energy entry's occupancy
+        await db.organizations.update_one(
+            {"id": org_id, "$or": [{"staff_count_date": {"$lte": data["date"]}}, {"staff_count_date": None}]},
+            {"$set": {"staff_count": data["num_people"], "staff_count_date": data["date"]}}
+        )
+
+
+async def build_month(db, month: str) -> MonthSketches:
+    """Fresh digests per category and metric from a month's `benchmark_values`, with the
+    organizations they count."""
+    values = await db.benchmark_values.find(
+        {"month": month, "entries": {"$gt": 0}},
+        {"_id": 0, "organization_id": 1, "category": 1, "emissions_kg": 1}
+    ).to_list(None)
+    org_ids = list({v["organization_id"] for v in values})
+    staff = {
+        org["id"]: org["staff_count"]
+        for org in await db.organizations.find(
+            {"id": {"$in": org_ids}, "staff_count": {"$gt": 0}}, {"_id": 0, "id": 1, "staff_count": 1}
+        ).to_list(None)
+    }
+    sketches: Dict[str, Dict[str, TDigest]] = {}
+    orgs: Dict[str, List[str]] = {}
+    for value in values:
+        digests = sketches.setdefault(value["category"], {m: TDigest(COMPRESSION) for m in METRICS})
+        orgs.setdefault(value["category"], []).append(value["organization_id"])
+        kg = max(value["emissions_kg"], 0.0)
+        digests["kg"].add(kg)
+        headcount = staff.get(value["organization_id"])
+        if headcount:
+            digests["kg_per_staff"].add(kg / headcount)
+    return sketches, orgs, sorted(staff)
+
+
+class BenchmarkSketches:
+    def __init__(self, refresh_seconds: float = 300.0):
+        self.refresh_seconds = refresh_seconds
+        # month -> (version, monotonic time built or loaded, month sketches)
+        self._cache: Dict[str, Tuple[int, float, MonthSketches]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # window -> (the monthly digests merged, merged digests, peer counts)
+        self._windows: Dict[Tuple[str, ...], Tuple[list, Dict[str, Dict[str, TDigest]], Dict[str, Dict[str, int]]]] = {}
+
+    async def window(self, db, months: List[str]) -> Tuple[Dict[str, Dict[str, TDigest]], Dict[str, Dict[str, int]]]:
+        """Monthly digests merged per category and metric, plus the peers' months without
+        entries as zeros, and the number of distinct peers of each; reused until a month is
+        rebuilt."""
+        monthly = await self.months(db, months)
+        key = tuple(months)
+        sources = [monthly.get(month) for month in months]
+        cached = self._windows.get(key)
+        if cached is not None and all(a is b for a, b in zip(cached[0], sources)):
+            return cached[1], cached[2]
+        merged: Dict[str, Dict[str, TDigest]] = {}
+        peers: Dict[str, Dict[str, set]] = {}
+        for digests_by_category, orgs, staffed in monthly.values():
+            for category, digests in digests_by_category.items():
+                target = merged.setdefault(category, {m: TDigest(COMPRESSION) for m in METRICS})
+                for metric, digest in digests.items():
+                    target[metric].merge(digest)
+                active = set(orgs.get(category, ()))
+                seen = peers.setdefault(category, {"kg": set(), "kg_per_staff": set()})
+                seen["kg"] |= active
+                seen["kg_per_staff"] |= active.intersection(staffed)
+        for category, digests in merged.items():
+            for metric, digest in digests.items():
+                inactive = len(peers[category][metric]) * len(months) - digest.total
+                if inactive >= 1:
+                    digest.add(0.0, inactive)
+                    digest.compress()
+        counts = {
+            category: {metric: len(orgs) for metric, orgs in seen.items()} for category, seen in peers.items()
+        }
+        if len(self._windows) >= MAX_CACHED_WINDOWS:
+            self._windows.pop(next(iter(self._windows)))
+        self._windows[key] = (sources, merged, counts)
+        return merged, counts
+
+    async def months(self, db, months: List[str]) -> Dict[str, MonthSketches]:
+        rows = await db.benchmark_months.find({"month": {"$in": months}}, {"_id": 0}).to_list(None)
+        versions = {row["month"]: row["version"] for row in rows}
+        return {
+            month: await self._month(db, month, versions[month])
+            for month in months if month in versions
+        }
+
+    async def _month(self, db, month: str, version: int) -> MonthSketches:
+        if self._usable(self._cache.get(month), version):
+            return self._cache[month][2]
+        lock = self._locks.setdefault(month, asyncio.Lock())
+        async with lock:
+            cached = self._cache.get(month)
+            if self._usable(cached, version):
+                return cached[2]
+            stored = await db.benchmark_sketches.find_one({"month": month}, {"_id": 0})
+            age = (time.time() - stored["built_at"]) if stored else None
+            # Documents stored before org ids were kept are rebuilt
+            if stored and "orgs" in stored and (stored["version"] >= version or age < self.refresh_seconds):
+                sketches = ({
+                    category: {metric: TDigest.from_dict(d) for metric, d in digests.items()}
+                    for category, digests in stored["sketches"].items()
+                }, stored["orgs"], stored["staffed"])
+                self._cache[month] = (stored["version"], time.monotonic() - (age or 0), sketches)
+                return sketches
+            started = time.perf_counter()
+            sketches = await build_month(db, month)
+            await db.benchmark_sketches.replace_one({"month": month}, {
+                "month": month,
+                "version": version,
+                "built_at": time.time(),
+                "sketches": {
+                    category: {metric: d.to_dict() for metric, d in digests.items()}
+                    for category, digests in sketches[0].items()
+                },
+                "orgs": sketches[1],
+                "staffed": sketches[2]
+            }, upsert=True)
+            self._cache[month] = (version, time.monotonic(), sketches)
+            logger.info(f"Benchmark sketches for {month} (v{version}) built in {(time.perf_counter() - started) * 1000:.1f}ms")
+            return sketches
+
+    def _usable(self, cached, version: int) -> bool:
+        return cached is not None and (cached[0] >= version or time.monotonic() - cached[1] < self.refresh_seconds)
+
+
+def trailing_months(end_month: str, count: int) -> List[str]:
+    year, month = int(end_month[:4]), int(end_month[5:7])
+    months = []
+    for _ in range(count):
+        months.append(f"{year:04d}-{month:02d}")
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return sorted(months)
+
+
+async def percentiles(db, sketches: BenchmarkSketches, org_id: str, end_month: str, months: int = 1) -> Dict[str, Any]:
+    """The organization's percentile per category and metric over the `months` ending at `end_month`.
+
+    Over several months this is the average month's percentile among the peers' org-months.
+    """
+    window = trailing_months(end_month, months)
+    (merged, peers), own, org = await asyncio.gather(
+        sketches.window(db, window),
+        db.benchmark_values.find(
+            {"organization_id": org_id, "month": {"$in": window}, "entries": {"$gt": 0}},
+            {"_id": 0, "category": 1, "emissions_kg": 1}
+        ).to_list(None),
+        db.organizations.find_one({"id": org_id}, {"_id": 0, "staff_count": 1})
+    )
+    # The organization's average month per category; months without entries count as 0,
+    # as they do for the peers in the merged digests
+    totals: Dict[str, float] = {}
+    for value in own:
+        totals[value["category"]] = totals.get(value["category"], 0.0) + max(value["emissions_kg"], 0.0)
+    headcount = (org or {}).get("staff_count")
+
+    categories: Dict[str, Any] = {}
+    for category, digests in sorted(merged.items()):
+        if category not in totals:
+            continue
+        kg = totals[category] / len(window)
+        values = {"kg": kg, "kg_per_staff": kg / headcount if headcount else None}
+        categories[category] = {}
+        for metric, digest in digests.items():
+            value = values[metric]
+            if value is None or not digest.total:
+                continue
+            categories[category][metric] = {
+                "value": round(value, 2),
+                "percentile": round(digest.cdf(value) * 100, 1),
+                "peers": peers[category][metric],
+                "quantiles": {f"p{int(q * 100)}": round(digest.quantile(q), 2) for q in REPORTED_QUANTILES}
+            }
+    return {
+        "period": {"start": window[0], "end": window[-1], "months": len(window)},
+        "staff_count": headcount,
+        "categories": categories,
+        "generated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+async def rebuild_values(db):
+    """Recompute `benchmark_values` and staff counts from activities and energy entries
+    (first deployment, or repair), and mark every month changed."""
+    rows = []
+    for collection, category in ((db.activities, "$activity_category"), (db.energy_data, "energy")):
+        rows += await collection.aggregate([
+            {"$group": {
+                "_id": {"org": "$organization_id", "month": {"$substr": ["$date", 0, 7]}, "category": category},
+                "emissions_kg": {"$sum": "$carbon_emission_kg"},
+                "entries": {"$sum": 1}
+            }}
+        ]).to_list(None)
+    # Activities in cold storage, from their monthly rollups
+    async for archived in db.activity_archive.find(
+        {"generation": {"$gt": 0}}, {"_id": 0, "organization_id": 1, "month": 1, "summary.by_category": 1}
+    ):
+        for category, entry in archived["summary"]["by_category"].items():
+            rows.append({
+                "_id": {"org": archived["organization_id"], "month": archived["month"], "category": category},
+                "emissions_kg": entry["emissions"], "entries": entry["count"]
+            })
+    values: Dict[Tuple[str, str, str], List[float]] = {}
+    for row in rows:
+        key = row["_id"]
+        for category in (key["category"], TOTAL):
+            entry = values.setdefault((key["org"], key["month"], category), [0.0, 0])
+            entry[0] += row["emissions_kg"]
+            entry[1] += row["entries"]
+    await db.benchmark_values.delete_many({})
+    if values:
+        await db.benchmark_values.insert_many([
+            {"organization_id": org_id, "month": month, "category": category, "emissions_kg": kg, "entries": entries}
+            for (org_id, month, category), (kg, entries) in values.items()
+        ])
+    months = sorted({month for _, month, _ in values})
+    if months:
+        await db.benchmark_months.bulk_write([
+            UpdateOne({"month": month}, {"$inc": {"version": 1}}, upsert=True) for month in months
+        ], ordered=False)
+
+    latest = await db.energy_data.aggregate([
+        {"$sort": {"organization_id": 1, "date": -1}},
+        {"$group": {"_id": "$organization_id", "num_people": {"$first": "$num_people"}, "date": {"$first": "$date"}}}
+    ]).to_list(None)
+    if latest:
+        await db.organizations.bulk_write([
+            UpdateOne({"id": row["_id"]}, {"$set": {"staff_count": row["num_people"], "staff_count_date": row["date"]}})
+            for row in latest
+        ], ordered=False)
+    logger.info(f"Benchmark values rebuilt: {len(values)} org-month-category rows over {len(months)} months")
+    return {"values": len(values), "months": len(months), "organizations_with_staff": len(latest)}
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        print(await rebuild_values(client[os.environ['DB_NAME']]))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
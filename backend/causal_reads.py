@@ -0,0 +1,109 @@
+"""Causally consistent reads on secondaries.
+
+`CausalDatabase` wraps a Motor database (normally `analytics_db`, which reads
+from secondaries). Every read through it is sent with readConcern
+`afterClusterTime` set to a given operation time. Whichever secondary serves
+the read first waits until it has applied that point of the oplog. So when
+the time comes from a primary read made after a write, every read sees that
+write. This holds even though the reads are routed to different secondaries.
+
+Each read runs in its own causally consistent session, advanced to the
+operation time. A session must not be used by concurrent operations, and the
+analytics code gathers several reads at once. Only the read methods are
+wrapped. Anything else goes straight to the underlying collection.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class CausalDatabase:
+    def __init__(self, database, cluster_time: Dict[str, Any], operation_time):
+        self._database = database
+        self._cluster_time = cluster_time
+        self._operation_time = operation_time
+
+    async def start_session(self):
+        session = await self._database.client.start_session(causal_consistency=True)
+        session.advance_cluster_time(self._cluster_time)
+        session.advance_operation_time(self._operation_time)
+        return session
+
+    def __getitem__(self, name: str) -> "CausalCollection":
+        return CausalCollection(self, self._database[name])
+
+    def __getattr__(self, name: str) -> "CausalCollection":
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class CausalCollection:
+    def __init__(self, reads: CausalDatabase, collection):
+        self._reads = reads
+        self._collection = collection
+
+    def find(self, *args, **kwargs) -> "CausalCursor":
+        return CausalCursor(self._reads, self._collection.find, args, kwargs)
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> "CausalCursor":
+        return CausalCursor(self._reads, self._collection.aggregate, (pipeline,), kwargs)
+
+    async def _run(self, method, args, kwargs):
+        async with await self._reads.start_session() as session:
+            return await method(*args, session=session, **kwargs)
+
+    async def find_one(self, *args, **kwargs):
+        return await self._run(self._collection.find_one, args, kwargs)
+
+    async def count_documents(self, *args, **kwargs) -> int:
+        return await self._run(self._collection.count_documents, args, kwargs)
+
+    async def distinct(self, *args, **kwargs) -> list:
+        return await self._run(self._collection.distinct, args, kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._collection, name)
+
+
+class CausalCursor:
+    """A find/aggregate cursor opened in its own session when it is first read.
+
+    Chained modifiers (sort, limit, ...) are recorded and applied then.
+    """
+
+    def __init__(self, reads: CausalDatabase, open_cursor, args: Tuple, kwargs: Dict[str, Any]):
+        self._reads = reads
+        self._open_cursor = open_cursor
+        self._args = args
+        self._kwargs = kwargs
+        self._modifiers: List[Tuple[str, Tuple, Dict[str, Any]]] = []
+
+    def _modify(self, name: str, *args, **kwargs) -> "CausalCursor":
+        self._modifiers.append((name, args, kwargs))
+        return self
+
+    def sort(self, *args, **kwargs) -> "CausalCursor":
+        return self._modify("sort", *args, **kwargs)
+
+    def limit(self, *args, **kwargs) -> "CausalCursor":
+        return self._modify("limit", *args, **kwargs)
+
+    def skip(self, *args, **kwargs) -> "CausalCursor":
+        return self._modify("skip", *args, **kwargs)
+
+    def batch_size(self, *args, **kwargs) -> "CausalCursor":
+        return self._modify("batch_size", *args, **kwargs)
+
+    def _cursor(self, session):
+        cursor = self._open_cursor(*self._args, session=session, **self._kwargs)
+        for name, args, kwargs in self._modifiers:
+            cursor = getattr(cursor, name)(*args, **kwargs)
+        return cursor
+
+    async def to_list(self, length: Optional[int]) -> list:
+        async with await self._reads.start_session() as session:
+            return await self._cursor(session).to_list(length)
+
+    async def __aiter__(self):
+        async with await self._reads.start_session() as session:
+            async for doc in self._cursor(session):
+                yield doc
@@ -0,0 +1,358 @@
+"""Cold storage for old activities: compressed monthly archives plus rollups.
+
+Dashboards mostly look at the last 12 months, yet `activities` and its
+indexes keep every activity ever recorded. `python cold_storage.py` moves an
+organization's activities out of `activities` once their month is older than
+ARCHIVE_AFTER_MONTHS. Each month is stored as:
+
+    activity_archive        {organization_id, month, generation, archived_at,
+                             summary: {emissions, cost, count, first_date, last_date,
+                                       by_category: {category: {emissions, cost, count}}}}
+    activity_archive_parts  {organization_id, month, generation, part, rows, blob}
+
+`blob` is a zstd-compressed Parquet file of up to PART_ROWS activities.
+Documents round-trip losslessly: `details` and any unknown fields travel as
+JSON. The `summary` rollup answers totals, per-category and per-month
+figures without opening any blob. Blobs are read only for months a date
+range cuts through, for trend samples, and for exports and history.
+
+Moving a month never loses or double-counts rows. New parts are written
+under the next generation and recorded as `pending`. Then the hot rows are
+deleted, and only then does the generation become current. Before
+encoding, the move claims its hot rows by setting `archiving`, and the
+delete endpoint skips claimed rows. So a row is either deleted by a user
+(and subtracted from the benchmarks) or archived, never both. An interrupted
+move is rolled forward by the next run: the pending parts are complete, so
+it deletes any hot rows they contain and commits. Activities that arrive
+later for an archived month (backdated entries) stay hot until the next run
+merges them into a new generation. Readers only see committed generations.
+Each organization's `data_version` is bumped after its months move, so no
+cached response computed mid-move survives.
+
+Archived activities are read-only: they can no longer be deleted by id or
+found by text search.
+
+    python cold_storage.py                        # archive months older than ARCHIVE_AFTER_MONTHS (default 24)
+    python cold_storage.py --older-than-months 36 --org-id ORG
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import Binary
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+logger = logging.getLogger("ecopulse.cold_storage")
+
+# Parquet columns; `details` and `extra` (any other fields) hold JSON
+COLUMNS = {
+    "id": "string", "activity_category": "string", "activity_type": "string", "description": "string",
+    "date": "string", "carbon_emission_kg": "float64", "cost": "float64", "created_at": "string",
+    "created_by": "string", "details": "string", "extra": "string",
+}
+KNOWN_FIELDS = set(COLUMNS) - {"extra"}
+# Not kept in the archive: the org is the archive's, search_text is derived from details for hot
+# search, and archiving only marks hot rows claimed by a move
+DROPPED_FIELDS = ("_id", "organization_id", "search_text", "archiving")
+PART_ROWS = 50_000
+DELETE_BATCH = 5_000
+
+
+def next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def month_range(month: str) -> Dict[str, str]:
+    return {"$gte": f"{month}-01", "$lt": f"{next_month(month)}-01"}
+
+
+def within(month: str, start: Optional[str], end: Optional[str]) -> bool:
+    """Whether every date of `month` falls in [start, end)."""
+    return (start is None or f"{month}-01" >= start) and (end is None or f"{next_month(month)}-01" <= end)
+
+
+def overlaps(month: str, start: Optional[str], end: Optional[str]) -> bool:
+    return (start is None or f"{next_month(month)}-01" > start) and (end is None or f"{month}-01" < end)
+
+
+# ---------------------------------------------------------------- encoding
+
+def encode_rows(rows: List[Dict[str, Any]]) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns: Dict[str, list] = {name: [] for name in COLUMNS}
+    for row in rows:
+        for name in KNOWN_FIELDS:
+            value = row.get(name)
+            columns[name].append(json.dumps(value) if name == "details" and value is not None else value)
+        extra = {k: v for k, v in row.items() if k not in KNOWN_FIELDS and k not in DROPPED_FIELDS}
+        columns["extra"].append(json.dumps(extra, default=str) if extra else None)
+    schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in COLUMNS.items()])
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.table(columns, schema=schema), sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
+
+
+def decode_rows(blob: bytes, org_id: str) -> List[Dict[str, Any]]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = []
+    for row in pq.read_table(pa.BufferReader(blob)).to_pylist():
+        extra = row.pop("extra")
+        if row["details"] is not None:
+            row["details"] = json.loads(row["details"])
+        row["organization_id"] = org_id
+        if extra:
+            row.update(json.loads(extra))
+        rows.append(row)
+    return rows
+
+
+def rollup(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The month's summary, stored next to its parts."""
+    by_category: Dict[str, Dict[str, float]] = {}
+    for row in rows:
+        entry = by_category.setdefault(row.get("activity_category") or "other", {"emissions": 0.0, "cost": 0.0, "count": 0})
+        entry["emissions"] += row.get("carbon_emission_kg") or 0
+        entry["cost"] += row.get("cost") or 0
+        entry["count"] += 1
+    dates = [row["date"] for row in rows if row.get("date")]
+    return {
+        "emissions": sum(e["emissions"] for e in by_category.values()),
+        "cost": sum(e["cost"] for e in by_category.values()),
+        "count": len(rows),
+        "first_date": min(dates, default=""),
+        "last_date": max(dates, default=""),
+        "by_category": by_category,
+    }
+
+
+# ---------------------------------------------------------------- reads
+
+async def archived_months(db, org_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                          newest_first: bool = False) -> List[Dict[str, Any]]:
+    """Committed archive months of the organization overlapping [start, end)."""
+    query: Dict[str, Any] = {"organization_id": org_id, "generation": {"$gt": 0}}
+    if start or end:
+        query["month"] = {**({"$gte": start[:7]} if start else {}), **({"$lt": next_month(end[:7])} if end else {})}
+    months = await db.activity_archive.find(
+        query, {"_id": 0, "month": 1, "generation": 1, "summary": 1}
+    ).sort("month", -1 if newest_first else 1).to_list(None)
+    return [m for m in months if overlaps(m["month"], start, end)]
+
+
+async def load_rows(db, org_id: str, month: str, generation: int) -> List[Dict[str, Any]]:
+    parts = await db.activity_archive_parts.find(
+        {"organization_id": org_id, "month": month, "generation": generation}, {"_id": 0, "blob": 1}
+    ).sort("part", 1).to_list(None)
+    rows: List[Dict[str, Any]] = []
+    for part in parts:
+        rows += await asyncio.to_thread(decode_rows, part["blob"], org_id)
+    return rows
+
+
+async def iter_rows(db, org_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                    newest_first: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """Archived activities dated in [start, end), by date (one month in memory at a time)."""
+    for month in await archived_months(db, org_id, start, end, newest_first):
+        rows = [
+            row for row in await load_rows(db, org_id, month["month"], month["generation"])
+            if (start is None or row["date"] >= start) and (end is None or row["date"] < end)
+        ]
+        rows.sort(key=lambda row: (row["date"], row.get("id") or ""), reverse=newest_first)
+        for row in rows:
+            yield row
+
+
+async def archived_summary(db, org_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """Totals, per-category and per-month emissions of the archived activities dated in [start, end).
+
+    Months wholly inside the range come from their rollup; only months the range cuts through are read.
+    """
+    summary: Dict[str, Any] = {
+        "emissions": 0.0, "cost": 0.0, "count": 0, "first_date": "", "last_date": "",
+        "by_category": {}, "by_month": {}
+    }
+    for month in await archived_months(db, org_id, start, end):
+        if within(month["month"], start, end):
+            rolled = month["summary"]
+        else:
+            rolled = rollup([
+                row for row in await load_rows(db, org_id, month["month"], month["generation"])
+                if (start is None or row["date"] >= start) and (end is None or row["date"] < end)
+            ])
+        if not rolled["count"]:
+            continue
+        summary["emissions"] += rolled["emissions"]
+        summary["cost"] += rolled["cost"]
+        summary["count"] += rolled["count"]
+        summary["first_date"] = min(filter(None, (summary["first_date"], rolled["first_date"])), default="")
+        summary["last_date"] = max(summary["last_date"], rolled["last_date"])
+        for category, entry in rolled["by_category"].items():
+            summary["by_category"][category] = summary["by_category"].get(category, 0) + entry["emissions"]
+        summary["by_month"][month["month"]] = summary["by_month"].get(month["month"], 0) + rolled["emissions"]
+    return summary
+
+
+async def newest(db, org_id: str, limit: int, start: Optional[str] = None, end: Optional[str] = None) -> List[Tuple[str, float]]:
+    """(date, emissions) of the newest `limit` archived activities in [start, end), newest first."""
+    rows: List[Tuple[str, float]] = []
+    async for row in iter_rows(db, org_id, start, end, newest_first=True):
+        rows.append((row["date"], row.get("carbon_emission_kg") or 0))
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+async def totals_by_org(db) -> Dict[str, Dict[str, float]]:
+    """Archived emissions and activity count per organization, from the rollups."""
+    rows = await db.activity_archive.aggregate([
+        {"$match": {"generation": {"$gt": 0}}},
+        {"$group": {"_id": "$organization_id", "emissions": {"$sum": "$summary.emissions"}, "count": {"$sum": "$summary.count"}}}
+    ]).to_list(None)
+    return {row["_id"]: {"emissions": row["emissions"], "count": row["count"]} for row in rows}
+
+
+# ---------------------------------------------------------------- archiving
+
+async def _delete_hot(db, org_id: str, ids: List[str]):
+    for i in range(0, len(ids), DELETE_BATCH):
+        await db.activities.delete_many({"organization_id": org_id, "id": {"$in": ids[i:i + DELETE_BATCH]}})
+
+
+async def _commit(db, org_id: str, month: str, pending: Dict[str, Any]):
+    generation = pending["generation"]
+    await db.activity_archive.update_one(
+        {"organization_id": org_id, "month": month, "pending.generation": generation},
+        {"$set": {"generation": generation, "summary": pending["summary"], "archived_at": time.time()},
+         "$unset": {"pending": ""}}
+    )
+    await db.activity_archive_parts.delete_many(
+        {"organization_id": org_id, "month": month, "generation": {"$ne": generation}}
+    )
+
+
+async def recover(db, doc: Dict[str, Any]):
+    """Roll an interrupted move forward: its pending parts are complete."""
+    org_id, month, pending = doc["organization_id"], doc["month"], doc["pending"]
+    rows = await load_rows(db, org_id, month, pending["generation"])
+    await _delete_hot(db, org_id, [row["id"] for row in rows])
+    await _commit(db, org_id, month, pending)
+    logger.info(f"Recovered archive move of {org_id} {month} (generation {pending['generation']})")
+
+
+async def archive_month(db, org_id: str, month: str) -> int:
+    """Move the organization's hot activities of `month` into its archive; returns the rows moved."""
+    doc = await db.activity_archive.find_one({"organization_id": org_id, "month": month}, {"_id": 0})
+    if doc and doc.get("pending"):
+        await recover(db, doc)
+        doc = await db.activity_archive.find_one({"organization_id": org_id, "month": month}, {"_id": 0})
+    generation = (doc or {}).get("generation", 0)
+    new_generation = generation + 1
+    query = {"organization_id": org_id, "date": month_range(month)}
+    # Claim the rows first: a user delete racing the move would otherwise remove
+    # a row (and its benchmark value) that still gets archived
+    await db.activities.update_many(query, {"$set": {"archiving": new_generation}})
+    hot = await db.activities.find(
+        {**query, "archiving": new_generation}, {"_id": 0}
+    ).batch_size(5000).to_list(None)
+    if not hot:
+        return 0
+    rows = (await load_rows(db, org_id, month, generation) if generation else []) + hot
+    rows.sort(key=lambda row: (row["date"], row.get("id") or ""))
+
+    # Leftovers of a move interrupted before it was recorded as pending
+    await db.activity_archive_parts.delete_many({"organization_id": org_id, "month": month, "generation": new_generation})
+    for part, offset in enumerate(range(0, len(rows), PART_ROWS)):
+        chunk = rows[offset:offset + PART_ROWS]
+        blob = await asyncio.to_thread(encode_rows, chunk)
+        await db.activity_archive_parts.insert_one({
+            "organization_id": org_id, "month": month, "generation": new_generation,
+            "part": part, "rows": len(chunk), "blob": Binary(blob)
+        })
+    pending = {"generation": new_generation, "summary": rollup(rows)}
+    await db.activity_archive.update_one(
+        {"organization_id": org_id, "month": month},
+        {"$set": {"pending": pending}, "$setOnInsert": {"generation": 0}},
+        upsert=True
+    )
+    await _delete_hot(db, org_id, [row["id"] for row in hot])
+    await _commit(db, org_id, month, pending)
+    return len(hot)
+
+
+def cutoff_month(older_than_months: int, today: Optional[datetime] = None) -> str:
+    """First month kept hot: months before it are archived."""
+    today = today or datetime.now(timezone.utc)
+    index = today.year * 12 + today.month - 1 - older_than_months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+async def run(db, older_than_months: int, org_id: Optional[str] = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    for doc in await db.activity_archive.find(
+        {"pending": {"$exists": True}, **({"organization_id": org_id} if org_id else {})}, {"_id": 0}
+    ).to_list(None):
+        await recover(db, doc)
+
+    cutoff = cutoff_month(older_than_months)
+    match: Dict[str, Any] = {"date": {"$lt": f"{cutoff}-01"}}
+    if org_id:
+        match["organization_id"] = org_id
+    groups = await db.activities.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"org": "$organization_id", "month": {"$substr": ["$date", 0, 7]}}}},
+        {"$sort": {"_id.org": 1, "_id.month": 1}}
+    ]).to_list(None)
+    moved, orgs = 0, set()
+    for group in groups:
+        org, month = group["_id"]["org"], group["_id"]["month"]
+        count = await archive_month(db, org, month)
+        if count:
+            moved += count
+            orgs.add(org)
+    for group in groups:
+        # A Parquet export (columnar.py) that ran mid-move may have missed rows
+        await db.analytics_partitions.update_one(
+            {"organization_id": group["_id"]["org"], "collection": "activities", "month": group["_id"]["month"]},
+            {"$inc": {"version": 1}, "$set": {"dirty": True}}
+        )
+    for org in orgs:
+        # Responses cached while rows were moving are keyed by the old version
+        await db.organizations.update_one({"id": org}, {"$inc": {"data_version": 1}})
+    stats = {
+        "cutoff_month": cutoff, "months": len(groups), "activities": moved, "organizations": len(orgs),
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+    logger.info(f"Cold storage: {stats}")
+    return stats
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    parser = argparse.ArgumentParser(description="Move old activities into compressed monthly archives")
+    parser.add_argument("--older-than-months", type=int, default=int(os.environ.get("ARCHIVE_AFTER_MONTHS", "24")))
+    parser.add_argument("--org-id", help="only this organization")
+    args = parser.parse_args()
+    if args.older_than_months < 1:
+        raise SystemExit("--older-than-months must be at least 1")
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        print(await run(client[os.environ['DB_NAME']], args.older_than_months, args.org_id))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,381 @@
+"""Columnar analytics tier: Parquet snapshots of activities and energy entries, queried with DuckDB.
+
+The export (`python columnar.py`, run from cron) writes one Parquet file per
+organization, month and collection. Files are Hive-partitioned:
+
+    {root}/activities/organization_id={org}/month={YYYY-MM}/data.parquet
+    {root}/energy_data/organization_id={org}/month={YYYY-MM}/data.parquet
+
+Only changed partitions are rewritten. Every activity or energy mutation
+marks its partition dirty in `analytics_partitions` via `mark_dirty` (called
+from `bump_data_version` before the data version moves). An export run
+rewrites the dirty partitions and then records the data version it covered
+as the organization's `parquet_version`. Activity partitions include the
+month's activities in cold storage (cold_storage.py).
+
+`ColumnarStore` answers the dashboard, insight and report summaries (same
+shapes as analytics.py) and the leaderboard totals from these files with an
+embedded DuckDB. Scans are columnar and multi-threaded, and only the
+partitions of the organization and period are opened. An organization's
+summaries come from the snapshot only while its `parquet_version` covers its
+`data_version`. Organizations with newer writes read from MongoDB until the
+next export, so cached responses never go stale. The cross-organization
+leaderboard reads the snapshot as of the last export.
+
+The snapshot directory must be shared by the exporter and every API worker.
+DuckDB and pyarrow are imported on first use.
+
+    python columnar.py              # export dirty partitions
+    python columnar.py --full       # re-export everything (first run, or repair)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+import cold_storage
+from analytics import TREND_SAMPLE, goal_summary
+
+logger = logging.getLogger("ecopulse.columnar")
+
+# Columns kept per collection, with their Arrow types (organization_id and month are partition keys)
+SCHEMAS = {
+    "activities": {
+        "id": "string", "activity_category": "string", "activity_type": "string", "date": "string",
+        "carbon_emission_kg": "float64", "cost": "float64",
+    },
+    "energy_data": {
+        "id": "string", "date": "string", "electricity_kwh": "float64", "carbon_emission_kg": "float64",
+        "num_people": "float64",
+    },
+}
+TRACKED_EVENTS = {"activity_created": "activities", "activity_deleted": "activities", "energy_created": "energy_data"}
+FILE_NAME = "data.parquet"
+# Rewritten after every export run; its mtime tells readers the snapshot changed
+MARKER_NAME = "_export.json"
+SAFE_KEY = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+async def mark_dirty(db, org_id: str, event: Optional[str], data: Any):
+    """Flag the partition an activity or energy mutation touched (other events are ignored)."""
+    collection = TRACKED_EVENTS.get(event)
+    if collection is None:
+        return
+    await db.analytics_partitions.update_one(
+        {"organization_id": org_id, "collection": collection, "month": data["date"][:7]},
+        {"$inc": {"version": 1}, "$set": {"dirty": True}},
+        upsert=True
+    )
+
+
+def _next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def partition_path(root: Path, collection: str, org_id: str, month: str) -> Path:
+    if not SAFE_KEY.match(org_id):
+        raise ValueError(f"Unsafe organization id for a partition path: {org_id!r}")
+    return root / collection / f"organization_id={org_id}" / f"month={month}" / FILE_NAME
+
+
+async def export_partition(db, root: Path, collection: str, org_id: str, month: str) -> int:
+    """Rewrite one partition file from MongoDB; returns its row count (0 removes the file)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = SCHEMAS[collection]
+    rows = await db[collection].find(
+        {"organization_id": org_id, "date": {"$gte": f"{month}-01", "$lt": f"{_next_month(month)}-01"}},
+        {"_id": 0, **{name: 1 for name in columns}}
+    ).batch_size(5000).to_list(None)
+    if collection == "activities":
+        # Plus the month's activities in cold storage
+        for archived in await cold_storage.archived_months(db, org_id, f"{month}-01", f"{_next_month(month)}-01"):
+            rows += [
+                {name: row.get(name) for name in columns}
+                for row in await cold_storage.load_rows(db, org_id, archived["month"], archived["generation"])
+            ]
+    path = partition_path(root, collection, org_id, month)
+    if not rows:
+        if path.exists():
+            path.unlink()
+        return 0
+    schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in columns.items()])
+    table = pa.Table.from_pylist(rows, schema=schema)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+    await asyncio.to_thread(pq.write_table, table, partial, compression="zstd")
+    # Atomic swap: readers see the old file or the new one, never a partial write
+    os.replace(partial, path)
+    return len(rows)
+
+
+async def export(db, root: str, full: bool = False, org_id: Optional[str] = None) -> Dict[str, Any]:
+    """Rewrite dirty partitions (all partitions with `full`) and advance each
+    exported organization's `parquet_version`."""
+    started = time.perf_counter()
+    root_path = Path(root)
+    org_filter = {"id": org_id} if org_id else {}
+    if full:
+        await _mark_all(db, root_path, org_id)
+    # Read versions before listing dirty partitions: every write counted in them
+    # has already marked its partition (see bump_data_version)
+    orgs = await db.organizations.find(
+        org_filter, {"_id": 0, "id": 1, "data_version": 1, "parquet_version": 1}
+    ).to_list(None)
+    dirty_filter: Dict[str, Any] = {"dirty": True}
+    if org_id:
+        dirty_filter["organization_id"] = org_id
+    dirty = await db.analytics_partitions.find(
+        dirty_filter, {"_id": 1, "organization_id": 1, "collection": 1, "month": 1, "version": 1}
+    ).to_list(None)
+
+    rows = 0
+    for partition in dirty:
+        rows += await export_partition(db, root_path, partition["collection"], partition["organization_id"], partition["month"])
+        # Stays dirty if written again meanwhile
+        await db.analytics_partitions.update_one(
+            {"_id": partition["_id"], "version": partition["version"]}, {"$set": {"dirty": False}}
+        )
+
+    advanced = [
+        UpdateOne({"id": org["id"]}, {"$max": {"parquet_version": org.get("data_version", 0)}})
+        for org in orgs if org.get("data_version", 0) > org.get("parquet_version", -1)
+    ]
+    if advanced:
+        await db.organizations.bulk_write(advanced, ordered=False)
+    stats = {
+        "partitions": len(dirty), "rows": rows, "organizations_advanced": len(advanced),
+        "seconds": round(time.perf_counter() - started, 2)
+    }
+    root_path.mkdir(parents=True, exist_ok=True)
+    marker = root_path / MARKER_NAME
+    marker.with_suffix(".partial").write_text(json.dumps({"exported_at": time.time(), **stats}))
+    os.replace(marker.with_suffix(".partial"), marker)
+    logger.info(f"Parquet export: {stats}")
+    return stats
+
+
+async def _mark_all(db, root: Path, org_id: Optional[str] = None):
+    """Mark every partition with data dirty, and drop files of partitions that no longer have any."""
+    match = {"organization_id": org_id} if org_id else {}
+    present = set()
+    for collection in SCHEMAS:
+        groups = await db[collection].aggregate([
+            {"$match": match},
+            {"$group": {"_id": {"org": "$organization_id", "month": {"$substr": ["$date", 0, 7]}}}}
+        ]).to_list(None)
+        for group in groups:
+            present.add((collection, group["_id"]["org"], group["_id"]["month"]))
+    for archived in await db.activity_archive.find(
+        {**match, "generation": {"$gt": 0}}, {"_id": 0, "organization_id": 1, "month": 1}
+    ).to_list(None):
+        present.add(("activities", archived["organization_id"], archived["month"]))
+    if present:
+        await db.analytics_partitions.bulk_write([
+            UpdateOne(
+                {"organization_id": org, "collection": collection, "month": month},
+                {"$inc": {"version": 1}, "$set": {"dirty": True}},
+                upsert=True
+            )
+            for collection, org, month in present
+        ], ordered=False)
+    for collection in SCHEMAS:
+        for path in (root / collection).glob(f"organization_id={org_id or '*'}/month=*/{FILE_NAME}"):
+            org, month = path.parent.parent.name.split("=", 1)[1], path.parent.name.split("=", 1)[1]
+            if (collection, org, month) not in present:
+                path.unlink()
+
+
+def _months_overlap(month: str, start: Optional[str], end: Optional[str]) -> bool:
+    return (start is None or month >= start[:7]) and (end is None or f"{month}-01" < end)
+
+
+class ColumnarStore:
+    """DuckDB over the Parquet snapshot; one in-memory database per process."""
+
+    def __init__(self, root: str, threads: Optional[int] = None, memory_limit: Optional[str] = None):
+        self.root = Path(root)
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self._connection = None
+        self.queries = 0
+        # (window, marker mtime) -> leaderboard totals of that snapshot
+        self._leaderboard: Optional[Tuple[Tuple[int, int], Dict[str, Dict[str, float]]]] = None
+
+    def _cursor(self):
+        if self._connection is None:
+            import duckdb
+
+            connection = duckdb.connect(":memory:")
+            if self.threads:
+                connection.execute(f"SET threads = {int(self.threads)}")
+            if self.memory_limit:
+                connection.execute(f"SET memory_limit = '{self.memory_limit}'")
+            self._connection = connection
+        # A cursor per query: the connection is shared by the worker threads
+        return self._connection.cursor()
+
+    def files(self, collection: str, org_id: Optional[str] = None,
+              start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """Partition files of an organization (all organizations without `org_id`) overlapping [start, end)."""
+        if org_id is not None and not SAFE_KEY.match(org_id):
+            return []
+        org_dirs = f"organization_id={org_id}" if org_id else "organization_id=*"
+        return sorted(
+            str(path) for path in (self.root / collection).glob(f"{org_dirs}/month=*/{FILE_NAME}")
+            if _months_overlap(path.parent.name.split("=", 1)[1], start, end)
+        )
+
+    def _run(self, queries: Iterable[Tuple[str, list]]) -> List[list]:
+        cursor = self._cursor()
+        try:
+            results = []
+            for sql, params in queries:
+                results.append(cursor.execute(sql, params).fetchall())
+                self.queries += 1
+            return results
+        finally:
+            cursor.close()
+
+    async def query(self, queries: List[Tuple[str, list]]) -> List[list]:
+        """Run the statements in a worker thread (DuckDB releases the GIL while scanning)."""
+        return await asyncio.to_thread(self._run, queries)
+
+    async def covers(self, db, org_id: str) -> bool:
+        """Whether the snapshot includes the organization's latest writes."""
+        org = await db.organizations.find_one({"id": org_id}, {"_id": 0, "data_version": 1, "parquet_version": 1})
+        return org is not None and org.get("parquet_version", -1) >= org.get("data_version", 0)
+
+    @staticmethod
+    def _source(files: List[str], start: Optional[str], end: Optional[str]) -> Tuple[str, list]:
+        conditions, params = [], [files]
+        if start:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end:
+            conditions.append("date < ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"(SELECT * FROM read_parquet(?, hive_partitioning = true){where})", params
+
+    async def activity_summary(self, org_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+        files = self.files("activities", org_id, start, end)
+        summary = {
+            "emissions": 0, "cost": 0, "count": 0, "first_date": "", "last_date": "",
+            "by_category": {}, "by_month": {}, "recent_emissions": []
+        }
+        if not files:
+            return summary
+        source, params = self._source(files, start, end)
+        totals, by_category, by_month, recent = await self.query([
+            (f"SELECT sum(carbon_emission_kg), sum(coalesce(cost, 0)), count(*), min(date), max(date) FROM {source}", params),
+            (f"SELECT activity_category, sum(carbon_emission_kg) FROM {source} GROUP BY 1", params),
+            (f"SELECT month, sum(carbon_emission_kg) FROM {source} GROUP BY 1", params),
+            (f"SELECT carbon_emission_kg FROM {source} ORDER BY date DESC LIMIT {TREND_SAMPLE}", params),
+        ])
+        emissions, cost, count, first_date, last_date = totals[0]
+        if not count:
+            return summary
+        return {
+            "emissions": emissions or 0,
+            "cost": cost or 0,
+            "count": count,
+            "first_date": first_date or "",
+            "last_date": last_date or "",
+            "by_category": {category or "other": kg for category, kg in by_category},
+            "by_month": {str(month): kg for month, kg in by_month if month},
+            # Newest first, by activity date
+            "recent_emissions": [kg or 0 for (kg,) in recent]
+        }
+
+    async def energy_summary(self, org_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+        files = self.files("energy_data", org_id, start, end)
+        if not files:
+            return {"emissions": 0, "count": 0, "by_month": {}}
+        source, params = self._source(files, start, end)
+        totals, by_month = await self.query([
+            (f"SELECT sum(carbon_emission_kg), count(*) FROM {source}", params),
+            (f"SELECT month, sum(carbon_emission_kg) FROM {source} GROUP BY 1", params),
+        ])
+        emissions, count = totals[0]
+        return {
+            "emissions": emissions or 0,
+            "count": count,
+            "by_month": {str(month): kg for month, kg in by_month if month}
+        }
+
+    async def org_summary(self, db, org_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+        """Same shape as analytics.org_summary; goals still come from MongoDB."""
+        activity, energy, goals = await asyncio.gather(
+            self.activity_summary(org_id, start, end), self.energy_summary(org_id, start, end), goal_summary(db, org_id)
+        )
+        return {"activity": activity, "energy": energy, "goals": goals}
+
+    def _snapshot_id(self) -> int:
+        try:
+            return (self.root / MARKER_NAME).stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    async def leaderboard_totals(self, window: int) -> Dict[str, Dict[str, float]]:
+        """Per organization: total activity emissions, activity count, and the emissions
+        of its newest `window` activities and of the `window` before them.
+
+        A scan of every organization's files, so the result is kept until the next export.
+        """
+        key = (window, self._snapshot_id())
+        if self._leaderboard is not None and self._leaderboard[0] == key:
+            return self._leaderboard[1]
+        files = self.files("activities")
+        totals: Dict[str, Dict[str, float]] = {}
+        if files:
+            # max_by with a count keeps the newest rows per group (date, then id) without sorting the scan
+            (rows,) = await self.query([(
+                "SELECT organization_id, sum(carbon_emission_kg), count(*), "
+                "max_by(carbon_emission_kg, date || id, ?) "
+                "FROM read_parquet(?, hive_partitioning = true) GROUP BY organization_id",
+                [2 * window, files]
+            )])
+            for org, total, count, newest in rows:
+                newest = [kg or 0 for kg in newest or []]
+                totals[str(org)] = {
+                    "emissions": total or 0, "count": count,
+                    "recent": sum(newest[:window]), "older": sum(newest[window:2 * window])
+                }
+        self._leaderboard = (key, totals)
+        return totals
+
+    def status(self) -> Dict[str, Any]:
+        return {"root": str(self.root), "threads": self.threads, "loaded": self._connection is not None, "queries": self.queries}
+
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    parser = argparse.ArgumentParser(description="Export activities and energy entries to the Parquet analytics snapshot")
+    parser.add_argument("--root", default=os.environ.get("ANALYTICS_PARQUET_DIR"), help="snapshot directory (ANALYTICS_PARQUET_DIR)")
+    parser.add_argument("--full", action="store_true", help="re-export every partition")
+    parser.add_argument("--org-id", help="only this organization")
+    args = parser.parse_args()
+    if not args.root:
+        raise SystemExit("Set ANALYTICS_PARQUET_DIR or pass --root")
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        print(await export(client[os.environ['DB_NAME']], args.root, full=args.full, org_id=args.org_id))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""Emission factors (kg CO2) shared by the API, batch jobs and data tools."""
+
+EMISSION_FACTORS = {
+    # Travel (per km per passenger)
+    "travel": {
+        "petrol_car": 0.21,
+        "diesel_car": 0.27,
+        "electric_car": 0.05,
+        "hybrid_car": 0.12,
+        "motorcycle": 0.10,
+        "bus": 0.089,
+        "train": 0.041,
+        "flight_domestic": 0.255,
+        "flight_international": 0.195,
+        "bicycle": 0,
+        "walking": 0
+    },
+    # Events (per attendee per hour)
+    "events": {
+        "indoor_conference": 2.5,
+        "outdoor_event": 1.2,
+        "virtual_meeting": 0.05,
+        "workshop": 1.8,
+        "training_session": 1.5,
+        "fundraiser": 3.0,
+        "community_gathering": 1.0
+    },
+    # Infrastructure (per kWh)
+    "infrastructure": {
+        "electricity": 0.5,  # kg CO2 per kWh
+        "generator_diesel": 2.68,
+        "solar_panel": 0.02,
+        "air_conditioning": 0.8,  # additional factor per hour
+        "heating": 0.6,
+        "lighting": 0.4,
+        "computers": 0.3,
+        "servers": 0.5
+    },
+    # Marketing (per unit)
+    "marketing": {
+        "digital_campaign": 0.02,  # per impression
+        "email_marketing": 0.004,  # per email
+        "social_media_post": 0.01,
+        "printed_brochure": 0.05,  # per page
+        "printed_banner": 2.5,
+        "video_production": 50,  # per minute
+        "website_hosting": 0.3  # per day
+    },
+    # Office Operations (per unit)
+    "office": {
+        "phone_call": 0.01,  # per minute
+        "internet_usage": 0.05,  # per GB
+        "paper_usage": 0.005,  # per sheet
+        "courier_local": 1.5,  # per package
+        "courier_national": 5.0,
+        "courier_international": 15.0,
+        "water_consumption": 0.0003  # per liter
+    },
+    # Staff Welfare (per unit)
+    "staff_welfare": {
+        # Health & Wellness
+        "gym_membership": 5.0,  # per month per person
+        "health_checkup": 3.0,  # per checkup
+        "medical_insurance_admin": 1.0,  # per month per person
+        "wellness_program": 2.0,  # per session
+        # Recreation
+        "team_outing_local": 15.0,  # per person
+        "team_outing_travel": 50.0,  # per person
+        "staff_party": 8.0,  # per person
+        "gifts_physical": 2.0,  # per gift
+        "gifts_digital": 0.1,  # per gift
+        # Uniforms & Safety
+        "uniform_cotton": 10.0,  # per piece
+        "uniform_synthetic": 15.0,
+        "safety_equipment": 5.0,  # per item
+        "ppe_disposable": 0.5  # per item
+    }
+}
+
+# Event add-ons (kg CO2 per attendee)
+EVENT_CATERING_KG = 2.5  # ~2.5 kg per meal
+EVENT_TRAVEL_KG = 5  # estimated travel emission per attendee
+
+# Uncertainty of the factors above (uncertainty.py): relative half-width of the
+# 95% interval, drawn lognormal with the factor as mean. "default" covers the
+# category's other factors. A factor's error is shared by every entry using it.
+FACTOR_UNCERTAINTY = {
+    "travel": {"default": 0.15, "electric_car": 0.3, "flight_domestic": 0.3, "flight_international": 0.3},
+    "events": {"default": 0.4, "catering": 0.5, "attendee_travel": 0.8},
+    "infrastructure": {"default": 0.2, "electricity": 0.1, "generator_diesel": 0.05, "solar_panel": 0.5},
+    "marketing": {"default": 0.6},
+    "office": {"default": 0.4},
+    "staff_welfare": {"default": 0.5},
+}
+# Uncertainty of recorded quantities (distance, attendees, kWh, ...), independent per entry
+ACTIVITY_DATA_UNCERTAINTY = {
+    "travel": 0.1,
+    "events": 0.15,
+    "infrastructure": 0.15,
+    "marketing": 0.05,
+    "office": 0.1,
+    "staff_welfare": 0.05,
+    "energy": 0.02,  # metered
+}
+
+# Trees saved factor (average tree absorbs ~22kg CO2 per year)
+TREES_ABSORPTION_RATE = 22  # kg CO2 per tree per year
@@ -0,0 +1,274 @@
+"""Bucketed storage for high-resolution energy meter readings.
+
+`energy_data` holds one manually entered document per day, together with the
+occupancy drivers the forecast uses. Meter readings arrive far more often:
+every 10 minutes like the `energydata_complete.csv` source data, or every
+minute from smart meters (see meter_ingest.py). Stored one document per
+reading, a month of one site would be ~4,300-43,000 rows. Here they are kept
+as one bucket per (organization, site, day) instead:
+
+    energy_buckets  {organization_id, site_id, day, month,
+                     slots: [minute of day, ...], kwh: [...], temp_c: [...],     # raw readings
+                     hourly_kwh: [24], hourly_count: [24], hourly_temp_c: [24],
+                     kwh_total, carbon_emission_kg, count, temp_c_sum, temp_c_count, rev}
+    energy_monthly  {organization_id, site_id, month, kwh_total, carbon_emission_kg, count, days,
+                     temp_c_sum, temp_c_count, rev}
+
+Each reading is the energy used in the interval starting at its timestamp.
+
+Every write recomputes the hourly and daily rollups of the buckets it
+touched, plus the monthly rollups of their months. A chart query then reads
+one small projection per day (hourly, daily) or one document per month,
+never the raw arrays unless raw resolution is requested.
+
+Writes are idempotent per minute: re-sending a reading overwrites it. A bucket
+is replaced as a whole under an optimistic `rev` check, so concurrent writers
+to the same site-day retry instead of losing readings. A monthly rollup's
+`rev` is the sum of its buckets' revs, and only a higher sum may replace
+it. Bucket revs only grow, so a refresh that missed a concurrent write
+cannot overwrite one that saw it.
+
+New readings are also scored for anomalies against the site's hour-of-week
+baseline (anomaly.py); anomalies are recorded in `alerts` and passed to
+`on_alert`. Detection errors are logged and never fail an ingest whose
+readings are already stored.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+import anomaly
+from emission_factors import EMISSION_FACTORS
+
+logger = logging.getLogger("ecopulse.energy_series")
+
+ELECTRICITY_FACTOR = EMISSION_FACTORS["infrastructure"]["electricity"]
+RESOLUTIONS = ("raw", "hourly", "daily", "monthly")
+MAX_WRITE_RETRIES = 5
+
+RAW_FIELDS = {"_id": 0, "day": 1, "slots": 1, "kwh": 1, "temp_c": 1}
+HOURLY_FIELDS = {"_id": 0, "day": 1, "hourly_kwh": 1, "hourly_count": 1, "hourly_temp_c": 1}
+DAILY_FIELDS = {
+    "_id": 0, "day": 1, "kwh_total": 1, "carbon_emission_kg": 1, "count": 1, "temp_c_sum": 1, "temp_c_count": 1
+}
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ISO timestamp -> naive UTC. Naive input is taken as UTC."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def group_by_day(readings: Iterable[Dict[str, Any]]) -> Dict[str, Dict[int, Tuple[float, Optional[float]]]]:
+    """{day: {minute of day: (kwh, temp_c)}}; a later reading in the same minute wins."""
+    by_day: Dict[str, Dict[int, Tuple[float, Optional[float]]]] = defaultdict(dict)
+    for reading in readings:
+        ts = parse_timestamp(reading["timestamp"])
+        slot = ts.hour * 60 + ts.minute
+        temp = reading.get("outdoor_temp_celsius")
+        by_day[ts.date().isoformat()][slot] = (float(reading["kwh"]), None if temp is None else float(temp))
+    return by_day
+
+
+def bucket_rollups(readings: Dict[int, Tuple[float, Optional[float]]]) -> Dict[str, Any]:
+    """Raw arrays plus hourly and daily rollups for one site-day."""
+    slots = sorted(readings)
+    hourly_kwh = [0.0] * 24
+    hourly_count = [0] * 24
+    hourly_temp_sum = [0.0] * 24
+    hourly_temp_count = [0] * 24
+    for slot in slots:
+        kwh, temp = readings[slot]
+        hour = slot // 60
+        hourly_kwh[hour] += kwh
+        hourly_count[hour] += 1
+        if temp is not None:
+            hourly_temp_sum[hour] += temp
+            hourly_temp_count[hour] += 1
+    return {
+        "slots": slots,
+        "kwh": [readings[s][0] for s in slots],
+        "temp_c": [readings[s][1] for s in slots],
+        "hourly_kwh": [round(v, 4) for v in hourly_kwh],
+        "hourly_count": hourly_count,
+        "hourly_temp_c": [
+            round(total / n, 2) if n else None for total, n in zip(hourly_temp_sum, hourly_temp_count)
+        ],
+        "kwh_total": round(sum(hourly_kwh), 4),
+        "carbon_emission_kg": round(sum(hourly_kwh) * ELECTRICITY_FACTOR, 4),
+        "count": len(slots),
+        "temp_c_sum": round(sum(hourly_temp_sum), 4),
+        "temp_c_count": sum(hourly_temp_count),
+    }
+
+
+async def _merge_bucket(db, org_id: str, site_id: str, day: str, new: Dict[int, Tuple[float, Optional[float]]]):
+    key = {"organization_id": org_id, "site_id": site_id, "day": day}
+    for _ in range(MAX_WRITE_RETRIES):
+        existing = await db.energy_buckets.find_one(key, {"_id": 0, "slots": 1, "kwh": 1, "temp_c": 1, "rev": 1})
+        readings = {}
+        if existing:
+            readings = {s: (k, t) for s, k, t in zip(existing["slots"], existing["kwh"], existing["temp_c"])}
+        readings.update(new)
+        rev = existing["rev"] + 1 if existing else 1
+        doc = {
+            **key,
+            "month": day[:7],
+            **bucket_rollups(readings),
+            "rev": rev,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+        if existing is None:
+            try:
+                await db.energy_buckets.insert_one(doc)
+                return
+            except DuplicateKeyError:
+                continue
+        result = await db.energy_buckets.replace_one({**key, "rev": existing["rev"]}, doc)
+        if result.matched_count:
+            return
+    raise RuntimeError(f"Energy bucket {site_id}/{day} kept changing; gave up after {MAX_WRITE_RETRIES} attempts")
+
+
+async def refresh_monthly(db, org_id: str, site_id: str, month: str):
+    rows = await db.energy_buckets.aggregate([
+        {"$match": {"organization_id": org_id, "site_id": site_id, "month": month}},
+        {"$group": {
+            "_id": None,
+            "kwh_total": {"$sum": "$kwh_total"},
+            "carbon_emission_kg": {"$sum": "$carbon_emission_kg"},
+            "count": {"$sum": "$count"},
+            "days": {"$sum": 1},
+            "temp_c_sum": {"$sum": "$temp_c_sum"},
+            "temp_c_count": {"$sum": "$temp_c_count"},
+            "rev": {"$sum": "$rev"}
+        }}
+    ]).to_list(1)
+    key = {"organization_id": org_id, "site_id": site_id, "month": month}
+    if not rows:
+        await db.energy_monthly.delete_one(key)
+        return
+    totals = {k: v for k, v in rows[0].items() if k != "_id"}
+    totals["kwh_total"] = round(totals["kwh_total"], 4)
+    totals["carbon_emission_kg"] = round(totals["carbon_emission_kg"], 4)
+    try:
+        await db.energy_monthly.replace_one(
+            {**key, "$or": [{"rev": {"$lt": totals["rev"]}}, {"rev": {"$exists": False}}]},
+            {**key, **totals},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        pass  # A refresh that saw newer buckets already stored the month
+
+
+async def ingest_readings(
+    db, org_id: str, site_id: str, readings: Iterable[Dict[str, Any]],
+    on_alert: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, int]:
+    """Store meter readings ({timestamp, kwh, outdoor_temp_celsius?}) and refresh rollups."""
+    return await ingest_grouped(db, org_id, site_id, group_by_day(readings), on_alert)
+
+
+async def ingest_grouped(
+    db, org_id: str, site_id: str, by_day: Dict[str, Dict[int, Tuple[float, Optional[float]]]],
+    on_alert: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, int]:
+    """Like `ingest_readings` for readings already grouped as {day: {minute: (kwh, temp_c)}}."""
+    await asyncio.gather(*(_merge_bucket(db, org_id, site_id, day, slots) for day, slots in by_day.items()))
+    months = sorted({day[:7] for day in by_day})
+    await asyncio.gather(*(refresh_monthly(db, org_id, site_id, month) for month in months))
+    try:
+        _, alerts = await anomaly.detect(db, org_id, site_id, "meter", [
+            (datetime.fromisoformat(day) + timedelta(minutes=minute), {"kwh": kwh}, None)
+            for day, slots in by_day.items()
+            for minute, (kwh, _) in slots.items()
+        ])
+    except Exception as e:
+        logger.error(f"Anomaly scoring for {org_id}/{site_id} failed: {e}")
+        alerts = []
+    if on_alert is not None:
+        for alert in alerts:
+            on_alert(alert)
+    return {
+        "readings": sum(len(slots) for slots in by_day.values()),
+        "buckets": len(by_day),
+        "months": len(months),
+        "alerts": len(alerts)
+    }
+
+
+def pick_resolution(start: datetime, end: datetime) -> str:
+    span = end - start
+    if span <= timedelta(days=2):
+        return "raw"
+    if span <= timedelta(days=31):
+        return "hourly"
+    if span <= timedelta(days=731):
+        return "daily"
+    return "monthly"
+
+
+def _mean(total: float, count: int) -> Optional[float]:
+    return round(total / count, 2) if count else None
+
+
+async def get_series(
+    db, org_id: str, site_id: str, start: datetime, end: datetime, resolution: str = "auto"
+) -> Dict[str, Any]:
+    """Readings in [start, end) (naive UTC) at the requested resolution."""
+    if resolution == "auto":
+        resolution = pick_resolution(start, end)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)} or auto")
+
+    points: List[Dict[str, Any]] = []
+    if resolution == "monthly":
+        docs = await db.energy_monthly.find(
+            {"organization_id": org_id, "site_id": site_id,
+             "month": {"$gte": start.strftime("%Y-%m"), "$lte": (end - timedelta(microseconds=1)).strftime("%Y-%m")}},
+            {"_id": 0}
+        ).sort("month", 1).to_list(None)
+        for doc in docs:
+            points.append({
+                "timestamp": doc["month"], "kwh": doc["kwh_total"],
+                "carbon_emission_kg": doc["carbon_emission_kg"], "count": doc["count"],
+                "outdoor_temp_celsius": _mean(doc["temp_c_sum"], doc["temp_c_count"])
+            })
+        return {"resolution": resolution, "documents_read": len(docs), "points": points}
+
+    fields = {"raw": RAW_FIELDS, "hourly": HOURLY_FIELDS, "daily": DAILY_FIELDS}[resolution]
+    last_day = (end - timedelta(microseconds=1)).date().isoformat()
+    docs = await db.energy_buckets.find(
+        {"organization_id": org_id, "site_id": site_id, "day": {"$gte": start.date().isoformat(), "$lte": last_day}},
+        fields
+    ).sort("day", 1).to_list(None)
+
+    for doc in docs:
+        day_start = datetime.combine(date.fromisoformat(doc["day"]), datetime.min.time())
+        if resolution == "daily":
+            # Whole days: a day partly inside the range is reported in full
+            points.append({
+                "timestamp": doc["day"], "kwh": doc["kwh_total"],
+                "carbon_emission_kg": doc["carbon_emission_kg"], "count": doc["count"],
+                "outdoor_temp_celsius": _mean(doc["temp_c_sum"], doc["temp_c_count"])
+            })
+        elif resolution == "hourly":
+            for hour in range(24):
+                ts = day_start + timedelta(hours=hour)
+                if doc["hourly_count"][hour] and start <= ts < end:
+                    points.append({
+                        "timestamp": ts.isoformat(), "kwh": doc["hourly_kwh"][hour],
+                        "count": doc["hourly_count"][hour], "outdoor_temp_celsius": doc["hourly_temp_c"][hour]
+                    })
+        else:
+            for slot, kwh, temp in zip(doc["slots"], doc["kwh"], doc["temp_c"]):
+                ts = day_start + timedelta(minutes=slot)
+                if start <= ts < end:
+                    points.append({"timestamp": ts.isoformat(), "kwh": kwh, "outdoor_temp_celsius": temp})
+    return {"resolution": resolution, "documents_read": len(docs), "points": points}
@@ -0,0 +1,41 @@
+"""Fast JSON responses for list endpoints.
+
+Routes that return lists of Mongo documents used to build a Pydantic model
+per document. FastAPI then dumped, re-validated and serialized each of them
+again through `response_model`. For documents the app wrote itself, that
+work proves nothing. The fast path does two things instead:
+
+* projects exactly the response model's fields in the query, so nothing
+  outside the schema (e.g. `_id`, internal bookkeeping) ever reaches the client
+* encodes the projected documents with orjson in one call and returns a
+  `Response`, which FastAPI passes through untouched
+
+The route keeps `response_model=...`, so the OpenAPI schema stays the same.
+Without orjson installed, the encoder falls back to the standard library.
+"""
+import json
+from typing import Any, Dict, Type
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used instead
+    orjson = None
+
+
+def projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Mongo projection selecting exactly the fields of `model`."""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # OPT_NON_STR_KEYS: aggregation results can carry int keys (e.g. years)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    return Response(content=dumps(content), status_code=status_code, media_type="application/json")
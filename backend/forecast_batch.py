@@ -0,0 +1,189 @@
+"""Fleet-wide energy forecast precomputation.
+
+Streams `energy_data` for every organization (sorted by organization and
+date, so only one organization is buffered at a time), packs organizations
+into padded chunks and fits them together with `forecasting.forecast_batch`
+in a process pool. Results are upserted into the `forecasts` collection,
+which `/api/energy/forecast` serves directly while they are fresh.
+
+Run nightly, e.g. from cron:
+
+    0 2 * * * cd /app/backend && python forecast_batch.py --incremental
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from forecasting import DEFAULT_HORIZON_DAYS, DRIVERS, MIN_DATA_POINTS, forecast_batch, prepare_series, stack_series
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger("forecast_batch")
+
+# Readings per organization fed to the model (matches the endpoint's lookback)
+HISTORY_LIMIT = 365
+DEFAULT_CHUNK_SIZE = 256
+
+ENERGY_FIELDS = {"_id": 0, "organization_id": 1, "date": 1, "electricity_kwh": 1, **{d: 1 for d in DRIVERS}}
+
+
+def forecast_document(org_id: str, result: Dict[str, Any], data_updated_at: str) -> Dict[str, Any]:
+    """Shape stored in the `forecasts` collection, one per organization."""
+    return {
+        "organization_id": org_id,
+        "result": result,
+        "data_updated_at": data_updated_at,
+        "generated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+def _forecast_chunk(series: List[Dict[str, Any]], horizon_days: int) -> List[Optional[Dict[str, Any]]]:
+    # Runs in a worker process
+    return forecast_batch(stack_series(series), horizon_days)
+
+
+async def _data_updated_at(db, incremental: bool) -> Dict[str, str]:
+    """Newest energy `created_at` per organization, limited to organizations whose
+    stored forecast predates it when `incremental` is set."""
+    latest = await db.energy_data.aggregate([
+        {"$group": {"_id": "$organization_id", "data_updated_at": {"$max": "$created_at"}}}
+    ]).to_list(None)
+    stored: Dict[str, str] = {}
+    if incremental:
+        stored = {
+            f["organization_id"]: f["data_updated_at"]
+            async for f in db.forecasts.find({}, {"_id": 0, "organization_id": 1, "data_updated_at": 1})
+        }
+    return {
+        row["_id"]: row["data_updated_at"]
+        for row in latest
+        if stored.get(row["_id"], "") < row["data_updated_at"]
+    }
+
+
+async def run_batch(
+    db,
+    incremental: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: Optional[int] = None,
+    horizon_days: int = DEFAULT_HORIZON_DAYS
+) -> Dict[str, Any]:
+    """Recompute forecasts for all (or, incrementally, only changed) organizations."""
+    started = time.perf_counter()
+    updated_at = await _data_updated_at(db, incremental)
+    query: Dict[str, Any] = {}
+    if incremental:
+        if not updated_at:
+            logger.info("Forecast batch: no organizations with new energy data")
+            return {"organizations": 0, "skipped": 0, "readings": 0, "elapsed_seconds": 0.0, "orgs_per_second": 0.0}
+        query = {"organization_id": {"$in": list(updated_at)}}
+
+    loop = asyncio.get_running_loop()
+    pool = ProcessPoolExecutor(max_workers=workers)
+    in_flight = asyncio.Semaphore((workers or os.cpu_count() or 1) * 2)
+    pending: List[asyncio.Task] = []
+    totals = {"organizations": 0, "skipped": 0, "readings": 0}
+
+    async def flush(org_ids: List[str], series: List[Dict[str, Any]], updated: List[str]):
+        async with in_flight:
+            results = await loop.run_in_executor(pool, _forecast_chunk, series, horizon_days)
+        ops = [
+            UpdateOne({"organization_id": org_id}, {"$set": forecast_document(org_id, result, data_updated_at)}, upsert=True)
+            for org_id, result, data_updated_at in zip(org_ids, results, updated)
+            if result is not None
+        ]
+        totals["organizations"] += len(ops)
+        totals["skipped"] += len(org_ids) - len(ops)
+        if ops:
+            await db.forecasts.bulk_write(ops, ordered=False)
+
+    chunk_orgs: List[str] = []
+    chunk_series: List[Dict[str, Any]] = []
+    chunk_updated: List[str] = []
+    current_org: Optional[str] = None
+    history: deque = deque(maxlen=HISTORY_LIMIT)
+
+    def close_org():
+        if current_org is None:
+            return
+        if len(history) < MIN_DATA_POINTS:
+            totals["skipped"] += 1
+            return
+        chunk_orgs.append(current_org)
+        chunk_series.append(prepare_series(history))
+        chunk_updated.append(updated_at.get(current_org, ""))
+
+    try:
+        cursor = db.energy_data.find(query, ENERGY_FIELDS).sort([("organization_id", 1), ("date", 1)]).batch_size(5000)
+        async for reading in cursor:
+            totals["readings"] += 1
+            if reading["organization_id"] != current_org:
+                close_org()
+                current_org = reading["organization_id"]
+                history = deque(maxlen=HISTORY_LIMIT)
+                if len(chunk_orgs) >= chunk_size:
+                    # Bound the number of dispatched-but-unfinished chunks
+                    await in_flight.acquire()
+                    in_flight.release()
+                    pending.append(asyncio.create_task(flush(chunk_orgs, chunk_series, chunk_updated)))
+                    chunk_orgs, chunk_series, chunk_updated = [], [], []
+            history.append(reading)
+        close_org()
+        if chunk_orgs:
+            pending.append(asyncio.create_task(flush(chunk_orgs, chunk_series, chunk_updated)))
+        await asyncio.gather(*pending)
+    finally:
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        **totals,
+        "incremental": incremental,
+        "elapsed_seconds": round(elapsed, 3),
+        "orgs_per_second": round(totals["organizations"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "finished_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.forecast_runs.insert_one(dict(summary))
+    logger.info(
+        "Forecast batch: %d organizations (%d skipped) from %d readings in %.2fs (%.1f orgs/s)",
+        summary["organizations"], summary["skipped"], summary["readings"], elapsed, summary["orgs_per_second"]
+    )
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Precompute energy forecasts for every organization")
+    parser.add_argument("--incremental", action="store_true", help="only organizations with new energy data")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="organizations fitted per batch")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--horizon-days", type=int, default=DEFAULT_HORIZON_DAYS)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        await run_batch(
+            client[os.environ['DB_NAME']],
+            incremental=args.incremental,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            horizon_days=args.horizon_days
+        )
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,195 @@
+"""Statistical energy forecasting for EcoPulse.
+
+Daily electricity use is modelled as an additive decomposition
+
+    kWh = level + trend * t + weekday_effect + drivers @ beta + noise
+
+where weekday_effect is the only seasonal component (one dummy per weekday;
+a year of daily readings is too short to separate annual seasonality from
+the temperature driver), and the drivers are occupancy (`num_people`), running systems
+(`num_systems`), AC usage (`ac_hours`) and outdoor temperature. The model is
+fitted with ridge-regularised least squares via the normal equations, which
+batch cleanly across organizations: every function below works on a stack of
+series padded to a common length with a 0/1 mask, so one organization is
+simply a batch of one. Results are deterministic for a given input, which
+makes them safe to cache and precompute.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DRIVERS = ["num_people", "num_systems", "ac_hours", "outdoor_temp_celsius"]
+MIN_DATA_POINTS = 3
+# Fewer readings than model features: the forecast is returned but flagged as
+# insufficient (the ridge penalty, not the data, determines most coefficients)
+SUFFICIENT_DATA_POINTS = 12
+DEFAULT_HORIZON_DAYS = 30
+# Recent days whose average driver values are assumed for the forecast horizon
+DRIVER_LOOKBACK_DAYS = 28
+RIDGE_LAMBDA = 1.0
+Z_80 = 1.2816
+Z_95 = 1.96
+
+# intercept + trend + 6 weekday dummies (Monday is the reference day) + drivers
+_N_FEATURES = 2 + 6 + len(DRIVERS)
+
+
+def prepare_series(records: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Convert energy documents (any order) into date-sorted column arrays."""
+    dates = np.array([r["date"][:10] for r in records], dtype="datetime64[D]")
+    order = np.argsort(dates, kind="stable")
+    kwh = np.array([r["electricity_kwh"] for r in records], dtype=np.float64)
+    drivers = np.array([[r[d] for d in DRIVERS] for r in records], dtype=np.float64).reshape(-1, len(DRIVERS))
+    return {"dates": dates[order], "kwh": kwh[order], "drivers": drivers[order]}
+
+
+def stack_series(series: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Pad prepared series to one length so a batch can be fitted together."""
+    batch = len(series)
+    length = max((len(s["kwh"]) for s in series), default=0)
+    days = np.zeros((batch, length), dtype=np.int64)
+    kwh = np.zeros((batch, length))
+    drivers = np.zeros((batch, length, len(DRIVERS)))
+    mask = np.zeros((batch, length))
+    for i, s in enumerate(series):
+        n = len(s["kwh"])
+        days[i, :n] = s["dates"].astype(np.int64)
+        kwh[i, :n] = s["kwh"]
+        drivers[i, :n] = s["drivers"]
+        mask[i, :n] = 1.0
+    return {"days": days, "kwh": kwh, "drivers": drivers, "mask": mask}
+
+
+def _design(t: np.ndarray, weekday: np.ndarray, drivers_z: np.ndarray) -> np.ndarray:
+    ones = np.ones(t.shape + (1,))
+    weekday_dummies = (weekday[..., None] == np.arange(1, 7)).astype(np.float64)
+    return np.concatenate([ones, t[..., None], weekday_dummies, drivers_z], axis=-1)
+
+
+def _masked_mean(values: np.ndarray, mask: np.ndarray, count: np.ndarray) -> np.ndarray:
+    if values.ndim == mask.ndim + 1:
+        return (values * mask[..., None]).sum(axis=1) / count[:, None]
+    return (values * mask).sum(axis=1) / count
+
+
+def forecast_batch(stacked: Dict[str, np.ndarray], horizon_days: int = DEFAULT_HORIZON_DAYS) -> List[Optional[Dict[str, Any]]]:
+    """Fit and forecast every series in a stacked batch.
+
+    Returns one result per series, or None for series with fewer than
+    MIN_DATA_POINTS readings.
+    """
+    days, kwh, drivers, mask = stacked["days"], stacked["kwh"], stacked["drivers"], stacked["mask"]
+    batch, length = kwh.shape
+    if batch == 0 or length == 0:
+        return [None] * batch
+
+    count = mask.sum(axis=1)
+    safe_count = np.maximum(count, 1.0)
+    last_index = np.maximum(count.astype(np.int64) - 1, 0)
+    rows = np.arange(batch)
+
+    # Time is measured in days from each series' last reading and scaled to years
+    # so the trend coefficient is comparable to the other standardised columns.
+    last_day = days[rows, last_index]
+    t = (days - last_day[:, None]) / 365.0
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday; Monday == 0
+
+    driver_mean = _masked_mean(drivers, mask, safe_count)
+    driver_centered = (drivers - driver_mean[:, None, :]) * mask[..., None]
+    driver_std = np.sqrt((driver_centered ** 2).sum(axis=1) / safe_count[:, None])
+    driver_std = np.where(driver_std > 1e-9, driver_std, 1.0)
+    drivers_z = driver_centered / driver_std[:, None, :]
+
+    design = _design(t, weekday, drivers_z) * mask[..., None]
+    target = kwh * mask
+
+    penalty = np.full(_N_FEATURES, RIDGE_LAMBDA)
+    penalty[0] = 0.0  # never shrink the level
+    gram = np.einsum("bnp,bnq->bpq", design, design)
+    regularised = gram + np.diag(penalty)[None]
+    coef = np.linalg.solve(regularised, np.einsum("bnp,bn->bp", design, target)[..., None])[..., 0]
+
+    fitted = np.einsum("bnp,bp->bn", design, coef)
+    residuals = (target - fitted) * mask
+    sse = (residuals ** 2).sum(axis=1)
+    effective_params = np.trace(np.linalg.solve(regularised, gram), axis1=1, axis2=2)
+    dof = np.maximum(count - effective_params, 1.0)
+    sigma2 = sse / dof
+
+    mean_kwh = _masked_mean(kwh, mask, safe_count)
+    sst = (((kwh - mean_kwh[:, None]) * mask) ** 2).sum(axis=1)
+    r_squared = np.where(sst > 0, 1.0 - sse / np.where(sst > 0, sst, 1.0), 0.0)
+
+    # Future drivers: the average of the most recent readings of each series
+    position = np.arange(length)[None, :]
+    recent = mask * (position > (count[:, None] - 1 - DRIVER_LOOKBACK_DAYS))
+    recent_drivers = _masked_mean(drivers, recent, np.maximum(recent.sum(axis=1), 1.0))
+    recent_z = (recent_drivers - driver_mean) / driver_std
+
+    step = np.arange(1, horizon_days + 1)
+    future_days = last_day[:, None] + step[None, :]
+    future_design = _design(
+        np.broadcast_to(step / 365.0, (batch, horizon_days)),
+        (future_days + 3) % 7,
+        np.broadcast_to(recent_z[:, None, :], (batch, horizon_days, len(DRIVERS)))
+    )
+    daily = np.maximum(np.einsum("bhp,bp->bh", future_design, coef), 0.0)
+    total = daily.sum(axis=1)
+
+    # Interval for the horizon total: independent daily noise plus parameter uncertainty
+    summed_row = future_design.sum(axis=1)
+    param_var = sigma2 * np.einsum("bp,bp->b", summed_row, np.linalg.solve(regularised, summed_row[..., None])[..., 0])
+    total_std = np.sqrt(horizon_days * sigma2 + np.maximum(param_var, 0.0))
+
+    results: List[Optional[Dict[str, Any]]] = []
+    for i in range(batch):
+        n = int(count[i])
+        if n < MIN_DATA_POINTS:
+            results.append(None)
+            continue
+        relative_width = (Z_95 * total_std[i]) / total[i] if total[i] > 0 else np.inf
+        if n >= 60 and relative_width < 0.15:
+            confidence = "high"
+        elif n >= 12 and relative_width < 0.35:
+            confidence = "medium"
+        else:
+            confidence = "low"
+        start_day = np.datetime64(int(last_day[i]) + 1, "D")
+        results.append({
+            "historical_average_kwh": round(float(mean_kwh[i]), 2),
+            "monthly_forecast_kwh": round(float(total[i]), 2),
+            "interval_80": [round(float(max(total[i] - Z_80 * total_std[i], 0.0)), 2),
+                            round(float(total[i] + Z_80 * total_std[i]), 2)],
+            "interval_95": [round(float(max(total[i] - Z_95 * total_std[i], 0.0)), 2),
+                            round(float(total[i] + Z_95 * total_std[i]), 2)],
+            "confidence": confidence,
+            "horizon_days": horizon_days,
+            "horizon_start": str(start_day),
+            "daily_forecast_kwh": [round(float(v), 2) for v in daily[i]],
+            "factors": {
+                "avg_people": round(float(driver_mean[i, 0]), 1),
+                "avg_systems": round(float(driver_mean[i, 1]), 1),
+                "avg_ac_hours": round(float(driver_mean[i, 2]), 1),
+                "avg_temp_celsius": round(float(driver_mean[i, 3]), 1)
+            },
+            "model": {
+                "method": "ridge_trend_weekday_drivers",
+                "r_squared": round(float(r_squared[i]), 3),
+                "residual_std_kwh": round(float(np.sqrt(sigma2[i])), 3),
+                "trend_kwh_per_day": round(float(coef[i, 1] / 365.0), 4),
+                # kWh/day change for a one-unit change in each driver
+                "driver_effects": {
+                    d: round(float(coef[i, 8 + j] / driver_std[i, j]), 4) for j, d in enumerate(DRIVERS)
+                }
+            },
+            "data_points": n,
+            "sufficient_data": n >= SUFFICIENT_DATA_POINTS
+        })
+    return results
+
+
+def forecast_energy(records: Sequence[Dict[str, Any]], horizon_days: int = DEFAULT_HORIZON_DAYS) -> Optional[Dict[str, Any]]:
+    """Forecast one organization's electricity use over the next `horizon_days`."""
+    if len(records) < MIN_DATA_POINTS:
+        return None
+    return forecast_batch(stack_series([prepare_series(records)]), horizon_days)[0]
@@ -0,0 +1,41 @@
+"""Production entry point: `gunicorn -c gunicorn.conf.py server:app` (from backend/).
+
+The app is imported once in the master (`preload_app`), which then runs
+`prefork_warm_up()`: indexes are created once instead of by every worker,
+and model code paths are exercised. Workers fork from the warm master and
+share its imported modules copy-on-write. Each worker opens its own Mongo
+pool at startup, after the fork.
+
+Per-process state (response cache, metrics, profiles) stays per worker unless
+`RESPONSE_CACHE_URL` points at Redis. Scrape `/metrics` per worker or run
+with a single worker when exact totals matter.
+"""
+import asyncio
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Forecast and report requests can legitimately run for a while
+timeout = int(os.environ.get("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically so slow leaks cannot accumulate
+max_requests = int(os.environ.get("MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+accesslog = "-"
+
+
+def when_ready(server):
+    import server as app_module
+
+    server.log.info("Warming up before forking %d workers", workers)
+    try:
+        asyncio.run(app_module.prefork_warm_up())
+    except Exception as e:
+        # Workers then create indexes themselves at startup
+        server.log.warning("Pre-fork warm-up failed: %s", e)
+        return
+    app_module.prefork_warmed = True
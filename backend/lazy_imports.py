@@ -0,0 +1,47 @@
+"""Deferred imports for heavy subsystems that few requests need.
+
+The LLM client (emergentintegrations and the provider SDKs behind it) and
+the NumPy forecasting stack make up most of the backend's import time. Only
+the insights and forecast endpoints use them, so `server.py` wraps them in
+`LazyModule`. Nothing is imported at startup. A background warm-up task
+loads them right after boot, and any request that gets there first imports
+them through `await load()`, which runs the import in a worker thread so the
+event loop keeps serving.
+
+`backend_import_budget.py` fails when server.py's import time exceeds the
+budget, or when one of these modules is imported at startup again.
+"""
+import asyncio
+import importlib
+import threading
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        self.name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def get(self):
+        """Import now (blocking) if needed and return the module."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self.name)
+        return self._module
+
+    async def load(self):
+        """Like `get()`, but a first-time import runs off the event loop."""
+        if self._module is not None:
+            return self._module
+        return await asyncio.to_thread(self.get)
+
+    def override(self, module):
+        """Use `module` in place of the real import (load tests, local stubs)."""
+        self._module = module
@@ -0,0 +1,237 @@
+"""Server-sent dashboard updates, computed once per organization and fanned out.
+
+Without push, every open dashboard refetches `/dashboard/stats` to stay
+current, and N staff watching one organization repeat the same aggregation
+N times. `LiveDashboard` instead keeps one snapshot per organization that
+has subscribers in this process:
+
+* Mutations call `notify()` (via `bump_data_version` in server.py). The
+  item event ("activity_created", ...) is published straight away. A
+  refresh of the organization's snapshot is scheduled, debounced so that a
+  burst of writes costs one recomputation. The refresh publishes only the
+  top-level stats and goals that changed.
+* Writes handled by other workers are picked up by one poll of the
+  subscribed organizations' `data_version`s every `poll_interval` seconds.
+  That is a single query per process, however many connections are open.
+* Each event is encoded once, and the same bytes are queued to every
+  subscriber.
+* Per-connection queues are bounded. A subscriber whose queue fills up is
+  dropped: it gets a final "resync" event and its stream ends. EventSource
+  reconnects and starts again from a fresh snapshot. A slow client never
+  holds memory or delays the others.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from fast_json import dumps as json_dumps
+
+logger = logging.getLogger("ecopulse.live_updates")
+
+# (data_version, {"stats": {...}, "goals": [{"id": ..., ...}, ...]})
+Snapshot = Tuple[int, Dict[str, Any]]
+
+
+class TooManySubscribers(Exception):
+    """This process already serves `max_subscribers` streams."""
+
+
+def encode_event(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + json_dumps(data) + b"\n\n"
+
+
+def diff_snapshots(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Top-level stats and goals of `new` that differ from `old`."""
+    changes: Dict[str, Any] = {}
+    old_stats = old.get("stats", {})
+    stats = {k: v for k, v in new["stats"].items() if old_stats.get(k) != v}
+    if stats:
+        changes["stats"] = stats
+    old_goals = {g["id"]: g for g in old.get("goals", [])}
+    new_goals = {g["id"]: g for g in new["goals"]}
+    goals = [g for goal_id, g in new_goals.items() if old_goals.get(goal_id) != g]
+    if goals:
+        changes["goals"] = goals
+    removed = [goal_id for goal_id in old_goals if goal_id not in new_goals]
+    if removed:
+        changes["goals_removed"] = removed
+    return changes
+
+
+class Subscriber:
+    def __init__(self, org_id: str, max_queue: int):
+        self.org_id = org_id
+        # None marks the end of the stream
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(max_queue)
+
+
+class LiveDashboard:
+    def __init__(
+        self,
+        snapshot: Callable[[str], Awaitable[Snapshot]],
+        versions: Callable[[List[str]], Awaitable[Dict[str, int]]],
+        max_queue: int = 64,
+        max_subscribers: int = 1000,
+        debounce: float = 0.25,
+        poll_interval: float = 2.0
+    ):
+        self.snapshot = snapshot
+        self.versions = versions
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._state: Dict[str, Snapshot] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._dirty: Set[str] = set()
+        self._poller: Optional[asyncio.Task] = None
+        self.stats = {"published": 0, "refreshes": 0, "dropped_slow": 0, "rejected": 0}
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    async def subscribe(self, org_id: str) -> Subscriber:
+        """Register a stream; its first event is the organization's current snapshot."""
+        if self.subscriber_count >= self.max_subscribers:
+            self.stats["rejected"] += 1
+            raise TooManySubscribers(f"{self.max_subscribers} live streams already open")
+        subscriber = Subscriber(org_id, self.max_queue)
+        self._subscribers.setdefault(org_id, set()).add(subscriber)
+        self._ensure_poller()
+        try:
+            async with self._lock(org_id):
+                if org_id not in self._state:
+                    self._state[org_id] = await self.snapshot(org_id)
+                    self.stats["refreshes"] += 1
+                version, data = self._state[org_id]
+                subscriber.queue.put_nowait(encode_event("snapshot", {"version": version, **data}))
+        except BaseException:
+            self.unsubscribe(subscriber)
+            raise
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subs = self._subscribers.get(subscriber.org_id)
+        if subs is None:
+            return
+        subs.discard(subscriber)
+        if not subs:
+            # Nobody is watching: stop tracking the organization
+            del self._subscribers[subscriber.org_id]
+            self._state.pop(subscriber.org_id, None)
+            self._locks.pop(subscriber.org_id, None)
+
+    def publish(self, org_id: str, event: str, data: Any):
+        """Queue one event for every subscriber of `org_id`, dropping those that fell behind."""
+        subs = self._subscribers.get(org_id)
+        if not subs:
+            return
+        message = encode_event(event, data)
+        for subscriber in list(subs):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+        self.stats["published"] += 1
+
+    def notify(self, org_id: str, event: Optional[str] = None, data: Any = None):
+        """An organization's data changed: publish `event` and refresh its snapshot soon."""
+        if org_id not in self._subscribers:
+            return
+        if event is not None:
+            self.publish(org_id, event, data)
+        self._schedule_refresh(org_id)
+
+    def _drop(self, subscriber: Subscriber):
+        self.unsubscribe(subscriber)
+        self.stats["dropped_slow"] += 1
+        self._end(subscriber, encode_event("resync", {"reason": "client too slow"}))
+
+    @staticmethod
+    def _end(subscriber: Subscriber, final: Optional[bytes] = None):
+        queue = subscriber.queue
+        while not queue.empty():
+            queue.get_nowait()
+        if final is not None:
+            queue.put_nowait(final)
+        queue.put_nowait(None)
+
+    def _lock(self, org_id: str) -> asyncio.Lock:
+        lock = self._locks.get(org_id)
+        if lock is None:
+            lock = self._locks[org_id] = asyncio.Lock()
+        return lock
+
+    def _schedule_refresh(self, org_id: str):
+        task = self._refreshing.get(org_id)
+        if task is not None and not task.done():
+            self._dirty.add(org_id)
+            return
+        task = asyncio.create_task(self._refresh(org_id))
+        self._refreshing[org_id] = task
+        task.add_done_callback(lambda done: self._refresh_done(org_id, done))
+
+    def _refresh_done(self, org_id: str, task: asyncio.Task):
+        # Runs a loop iteration after the task finished: a newer refresh may already be registered
+        if self._refreshing.get(org_id) is task:
+            del self._refreshing[org_id]
+
+    async def _refresh(self, org_id: str):
+        await asyncio.sleep(self.debounce)
+        while org_id in self._subscribers:
+            self._dirty.discard(org_id)
+            try:
+                await self._refresh_once(org_id)
+            except Exception as e:
+                logger.error(f"Live dashboard refresh for {org_id} failed: {e}")
+            if org_id not in self._dirty:
+                break
+
+    async def _refresh_once(self, org_id: str):
+        async with self._lock(org_id):
+            if org_id not in self._subscribers:
+                return
+            version, data = await self.snapshot(org_id)
+            self.stats["refreshes"] += 1
+            previous = self._state.get(org_id)
+            if previous is not None and version <= previous[0]:
+                return
+            self._state[org_id] = (version, data)
+            changes = diff_snapshots(previous[1] if previous else {}, data)
+            if changes:
+                self.publish(org_id, "stats", {"version": version, **changes})
+
+    def _ensure_poller(self):
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        while self._subscribers:
+            await asyncio.sleep(self.poll_interval)
+            org_ids = list(self._subscribers)
+            if not org_ids:
+                break
+            try:
+                versions = await self.versions(org_ids)
+            except Exception as e:
+                logger.warning(f"Live dashboard version poll failed: {e}")
+                continue
+            for org_id, version in versions.items():
+                state = self._state.get(org_id)
+                if state is not None and version > state[0]:
+                    self._schedule_refresh(org_id)
+
+    def status(self) -> Dict[str, Any]:
+        return {**self.stats, "subscribers": self.subscriber_count, "organizations": len(self._subscribers)}
+
+    async def close(self):
+        for task in [self._poller, *self._refreshing.values()]:
+            if task is not None:
+                task.cancel()
+        self._poller = None
+        for subscriber in [s for subs in self._subscribers.values() for s in subs]:
+            self.unsubscribe(subscriber)
+            self._end(subscriber)
@@ -0,0 +1,298 @@
+"""High-rate meter ingestion: bulk validation, coalescing and batched flushes.
+
+Smart meters push a reading a minute per device. Writing each one to its
+site-day bucket would cost a read-modify-write per reading. Instead:
+
+* `parse_ndjson` decodes a chunk of NDJSON lines. It then validates
+  timestamps and values and computes carbon for the whole chunk with NumPy
+  array operations rather than per-reading Python.
+* `MeterIngestBuffer` coalesces readings in memory per (organization, site,
+  day, minute); a re-sent minute replaces the pending value. It flushes to
+  `energy_series.ingest_grouped` when `max_batch` readings are pending or
+  every `flush_interval` seconds, whichever comes first. Each flush writes
+  every site-day bucket once, however many readings it received.
+* Backpressure: pending plus in-flight readings are capped at `max_pending`.
+  When storage falls behind, `add()` waits. The streaming endpoint then stops
+  reading the request body, which slows senders down at the TCP level. After
+  `max_wait` seconds it raises `IngestOverloaded` and the endpoint answers 503.
+
+Readings are acknowledged once buffered. A crash loses at most one flush
+interval of readings, which senders cover by retrying unacknowledged
+batches; re-sent minutes are idempotent.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # optional, stdlib json is used instead
+    import json
+    _loads = json.loads
+
+from energy_series import ELECTRICITY_FACTOR, ingest_grouped, parse_timestamp
+
+logger = logging.getLogger("ecopulse.meter_ingest")
+
+# A single reading above this is a unit error (Wh sent as kWh), not consumption
+MAX_KWH_PER_READING = 10_000.0
+# Clocks drift; readings further ahead than this are rejected
+MAX_FUTURE_SKEW = timedelta(hours=1)
+MAX_ERRORS_REPORTED = 20
+
+
+class IngestOverloaded(Exception):
+    """The buffer stayed full for longer than `max_wait`."""
+
+
+def _has_offset(timestamp: str) -> bool:
+    time_part = timestamp[10:]
+    return "+" in time_part or "-" in time_part
+
+
+def _to_datetime64(timestamps: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse ISO timestamps to naive-UTC datetime64[m]; returns (values, ok mask)."""
+    values = np.full(len(timestamps), np.datetime64("NaT"), dtype="datetime64[m]")
+    ok = np.zeros(len(timestamps), dtype=bool)
+    plain_index: List[int] = []
+    plain: List[str] = []
+    for i, ts in enumerate(timestamps):
+        if not isinstance(ts, str) or len(ts) < 10:
+            continue
+        if ts.endswith("Z"):
+            ts = ts[:-1]
+        if _has_offset(ts):
+            # Rare: numpy has no timezone support, so convert these one by one
+            try:
+                values[i] = np.datetime64(parse_timestamp(ts), "m")
+                ok[i] = True
+            except ValueError:
+                pass
+        else:
+            plain_index.append(i)
+            plain.append(ts)
+    if plain:
+        try:
+            values[plain_index] = np.array(plain, dtype="datetime64[s]").astype("datetime64[m]")
+            ok[plain_index] = True
+        except ValueError:
+            # At least one malformed string: find which ones
+            for i, ts in zip(plain_index, plain):
+                try:
+                    values[i] = np.datetime64(ts, "s").astype("datetime64[m]")
+                    ok[i] = True
+                except ValueError:
+                    pass
+    return values, ok
+
+
+def _to_float(values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Floats with NaN for missing or non-numeric values; returns (array, is-number mask)."""
+    try:
+        # numpy would read JSON true/false as 1.0/0.0
+        if any(isinstance(v, bool) for v in values):
+            raise TypeError("boolean value")
+        array = np.array([np.nan if v is None else v for v in values], dtype=float)
+    except (TypeError, ValueError):
+        array = np.full(len(values), np.nan)
+        for i, v in enumerate(values):
+            try:
+                array[i] = np.nan if v is None or isinstance(v, bool) else float(v)
+            except (TypeError, ValueError):
+                pass
+    return array, np.isfinite(array)
+
+
+def parse_ndjson(lines: List[bytes], first_line: int = 1, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Validate a chunk of `{"timestamp", "kwh", "outdoor_temp_celsius"?, "site_id"?}` lines.
+
+    Returns columnar arrays of the accepted readings (site_ids, days, minutes,
+    kwh, temp_c, carbon_kg) plus the rejected count and the first errors.
+    """
+    errors: List[Dict[str, Any]] = []
+    rejected = 0
+    line_numbers: List[int] = []
+    timestamps: List[Any] = []
+    kwh_raw: List[Any] = []
+    temp_raw: List[Any] = []
+    sites: List[str] = []
+    for offset, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            record = _loads(line)
+            timestamps.append(record["timestamp"])
+            kwh_raw.append(record["kwh"])
+            temp_raw.append(record.get("outdoor_temp_celsius"))
+            sites.append(str(record.get("site_id") or "main"))
+            line_numbers.append(first_line + offset)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            rejected += 1
+            if len(errors) < MAX_ERRORS_REPORTED:
+                errors.append({"line": first_line + offset, "error": f"invalid record: {e}"})
+
+    ts, ts_ok = _to_datetime64(timestamps)
+    kwh, kwh_ok = _to_float(kwh_raw)
+    temp, _ = _to_float(temp_raw)
+    latest = np.datetime64((now or datetime.now(timezone.utc).replace(tzinfo=None)) + MAX_FUTURE_SKEW, "m")
+    valid = ts_ok & kwh_ok & (kwh >= 0) & (kwh <= MAX_KWH_PER_READING) & (ts <= latest)
+
+    if not valid.all():
+        for i in np.flatnonzero(~valid):
+            rejected += 1
+            if len(errors) < MAX_ERRORS_REPORTED:
+                reason = ("invalid timestamp" if not ts_ok[i] else
+                          "timestamp in the future" if ts[i] > latest else
+                          f"kwh must be a number between 0 and {MAX_KWH_PER_READING:g}")
+                errors.append({"line": line_numbers[i], "error": reason})
+        errors.sort(key=lambda e: e["line"])
+
+    ts = ts[valid]
+    days = ts.astype("datetime64[D]")
+    kwh = kwh[valid]
+    return {
+        "site_ids": [s for s, ok in zip(sites, valid) if ok],
+        "days": days.astype(str).tolist(),
+        "minutes": (ts - days).astype(int).tolist(),
+        "kwh": kwh.tolist(),
+        # NaN (missing temperature) -> None
+        "temp_c": [None if t != t else t for t in temp[valid].tolist()],
+        "carbon_kg": kwh * ELECTRICITY_FACTOR,
+        "rejected": rejected,
+        "errors": errors,
+    }
+
+
+# (organization_id, site_id) -> {day: {minute: (kwh, temp_c)}}
+Pending = Dict[Tuple[str, str], Dict[str, Dict[int, Tuple[float, Optional[float]]]]]
+
+
+class MeterIngestBuffer:
+    def __init__(
+        self,
+        db,
+        max_batch: int = 20_000,
+        max_pending: int = 200_000,
+        flush_interval: float = 2.0,
+        max_wait: float = 10.0,
+        write_concurrency: int = 8,
+        on_alert: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ):
+        self.db = db
+        self.on_alert = on_alert  # (org_id, alert) for each anomaly found on flush
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_wait = max_wait
+        self._pending: Pending = {}
+        self._pending_count = 0
+        self._in_flight = 0
+        self._space = asyncio.Condition()
+        self._flush_lock = asyncio.Lock()
+        self._writers = asyncio.Semaphore(write_concurrency)
+        self._ticker: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()  # flushes started by add()
+        self.stats = {"received": 0, "flushed": 0, "flushes": 0, "buckets_written": 0,
+                      "failed_flushes": 0, "last_flush_ms": 0.0}
+
+    def _ensure_ticker(self):
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.create_task(self._tick())
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending_count:
+                await self.flush()
+
+    async def add(self, org_id: str, batch: Dict[str, Any]):
+        """Buffer a parsed batch, waiting (up to `max_wait`) for room first."""
+        size = len(batch["kwh"])
+        if not size:
+            return
+        self._ensure_ticker()
+        async with self._space:
+            try:
+                await asyncio.wait_for(
+                    self._space.wait_for(lambda: self._pending_count + self._in_flight < self.max_pending),
+                    timeout=self.max_wait
+                )
+            except asyncio.TimeoutError:
+                raise IngestOverloaded(f"{self._pending_count + self._in_flight} readings waiting for storage")
+            for site_id, day, minute, kwh, temp in zip(
+                batch["site_ids"], batch["days"], batch["minutes"], batch["kwh"], batch["temp_c"]
+            ):
+                minutes = self._pending.setdefault((org_id, site_id), {}).setdefault(day, {})
+                if minute not in minutes:
+                    self._pending_count += 1
+                minutes[minute] = (kwh, temp)
+            self.stats["received"] += size
+        if self._pending_count >= self.max_batch and not self._flush_lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task):
+        self._flushes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Meter flush failed: {task.exception()!r}")
+
+    async def flush(self):
+        async with self._flush_lock:
+            async with self._space:
+                pending, count = self._pending, self._pending_count
+                self._pending, self._pending_count = {}, 0
+                self._in_flight += count
+            if not count:
+                return
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(self._write(org_id, site_id, days) for (org_id, site_id), days in pending.items()),
+                return_exceptions=True
+            )
+            failed = 0
+            async with self._space:
+                for ((org_id, site_id), days), result in zip(pending.items(), results):
+                    if isinstance(result, Exception):
+                        failed += 1
+                        logger.error(f"Meter flush for {org_id}/{site_id} failed: {result}")
+                        self._requeue(org_id, site_id, days)
+                    else:
+                        self.stats["buckets_written"] += result["buckets"]
+                        self.stats["flushed"] += result["readings"]
+                self._in_flight -= count
+                self._space.notify_all()
+            self.stats["flushes"] += 1
+            self.stats["failed_flushes"] += 1 if failed else 0
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def _write(self, org_id: str, site_id: str, days):
+        async with self._writers:
+            on_alert = (lambda alert: self.on_alert(org_id, alert)) if self.on_alert else None
+            return await ingest_grouped(self.db, org_id, site_id, days, on_alert)
+
+    def _requeue(self, org_id: str, site_id: str, days):
+        # Keep readings that arrived since the failed flush; they are newer
+        target = self._pending.setdefault((org_id, site_id), {})
+        for day, minutes in days.items():
+            pending_minutes = target.setdefault(day, {})
+            for minute, value in minutes.items():
+                if minute not in pending_minutes:
+                    pending_minutes[minute] = value
+                    self._pending_count += 1
+
+    def status(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": self._pending_count, "in_flight": self._in_flight,
+                "max_pending": self.max_pending}
+
+    async def close(self):
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
@@ -0,0 +1,385 @@
+"""Request-level performance instrumentation for the EcoPulse API.
+
+* `MetricsMiddleware` (pure ASGI) records per-route latency and response-size
+  histograms and logs slow requests with a phase breakdown.
+* `MongoCommandListener` times every MongoDB command through pymongo command
+  monitoring.
+* `MongoPoolListener` measures how long requests wait to check a connection
+  out of the pool, which is the signal for sizing workers against the DB.
+* `llm_timer()` times LLM calls.
+* `TimedRoute` times the endpoint function itself, so request time can be
+  split into database, LLM, application code and framework work (request
+  validation plus response serialization).
+
+Histograms are plain lists mutated only on the event loop thread, so no locks
+are needed. Mongo timings arrive on Motor's executor threads; they are
+appended to a deque (atomic under the GIL) and folded into the histograms on
+the loop thread. `render_prometheus()` produces the text exposition format.
+"""
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+logger = logging.getLogger("ecopulse.metrics")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, value_fn):
+        self.name = name
+        self.documentation = documentation
+        self.value_fn = value_fn
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.value_fn()}"]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route, method and status.", ["route", "method", "status"])
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "End-to-end request latency.", ["route", "method"], LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size.", ["route", "method"], SIZE_BUCKETS)
+REQUEST_PHASE = Histogram(
+    "http_request_phase_seconds", "Request time split into db, llm, app and framework phases.",
+    ["route", "phase"], LATENCY_BUCKETS
+)
+MONGO_COMMAND = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round-trip time.", ["command", "outcome"], LATENCY_BUCKETS
+)
+MONGO_POOL_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool.",
+    ["outcome"], LATENCY_BUCKETS
+)
+LLM_CALL = Histogram("llm_call_duration_seconds", "LLM request latency.", ["outcome"], LATENCY_BUCKETS)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total", "Requests refused by admission control.", ["route", "reason"]
+)
+
+
+class RequestTimings:
+    __slots__ = ("db", "llm", "handler", "received")
+
+    def __init__(self):
+        self.received = time.perf_counter()
+        self.db: List[float] = []  # appended from executor threads
+        self.llm = 0.0
+        self.handler: Optional[float] = None
+
+
+_current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "ecopulse_request_timings", default=None
+)
+
+# (command, outcome, seconds) tuples produced on Motor's executor threads
+_mongo_events: deque = deque(maxlen=100_000)
+
+
+# (outcome, seconds) pool checkouts, drained like the command events
+_pool_events: deque = deque(maxlen=100_000)
+# Most recent checkout waits, kept for the health endpoint's percentiles
+_recent_pool_waits: deque = deque(maxlen=1000)
+
+
+def _drain_mongo_events():
+    while True:
+        try:
+            command, outcome, seconds = _mongo_events.popleft()
+        except IndexError:
+            break
+        MONGO_COMMAND.observe(seconds, command, outcome)
+    while True:
+        try:
+            outcome, seconds = _pool_events.popleft()
+        except IndexError:
+            return
+        MONGO_POOL_WAIT.observe(seconds, outcome)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Pass to the Mongo client via `event_listeners=[...]`."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.command_name, "ok", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self._record(event.command_name, "error", event.duration_micros / 1e6)
+
+    @staticmethod
+    def _record(command: str, outcome: str, seconds: float):
+        _mongo_events.append((command, outcome, seconds))
+        # Motor copies the caller's context onto its executor threads
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.db.append(seconds)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Pass to the Mongo client via `event_listeners=[...]` next to `MongoCommandListener`.
+
+    A checkout starts and finishes on the same (Motor executor) thread, so the
+    start time is kept thread-local.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        # Counters are updated from several executor threads
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.open_connections = 0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._adjust("in_use", 1)
+        self._record("ok")
+
+    def connection_check_out_failed(self, event):
+        # event.reason is "timeout" (waitQueueTimeoutMS hit), "poolClosed" or "connectionError"
+        self._record(event.reason)
+
+    def connection_checked_in(self, event):
+        self._adjust("in_use", -1)
+
+    def connection_created(self, event):
+        self._adjust("open_connections", 1)
+
+    def connection_closed(self, event):
+        self._adjust("open_connections", -1)
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def _adjust(self, attribute: str, delta: int):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + delta)
+
+    def _record(self, outcome: str):
+        started = getattr(self._local, "started", None)
+        if started is None:
+            return
+        self._local.started = None
+        seconds = time.perf_counter() - started
+        _pool_events.append((outcome, seconds))
+        _recent_pool_waits.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        """Connections in use and checkout wait percentiles over the recent window."""
+        waits = sorted(_recent_pool_waits)
+
+        def pct(q: float) -> float:
+            return round(waits[min(int(q * len(waits)), len(waits) - 1)] * 1000, 3) if waits else 0.0
+
+        return {
+            "connections_in_use": self.in_use,
+            "connections_open": self.open_connections,
+            "checkouts_sampled": len(waits),
+            "checkout_wait_p50_ms": pct(0.5),
+            "checkout_wait_p95_ms": pct(0.95),
+            "checkout_wait_max_ms": round(waits[-1] * 1000, 3) if waits else 0.0,
+        }
+
+
+POOL_LISTENER = MongoPoolListener()
+
+_COLLECTORS = [
+    REQUESTS, REQUEST_LATENCY, RESPONSE_SIZE, REQUEST_PHASE, MONGO_COMMAND, MONGO_POOL_WAIT, LLM_CALL,
+    ADMISSION_REJECTIONS,
+    Gauge("mongo_pool_connections_in_use", "Connections currently checked out.", lambda: POOL_LISTENER.in_use),
+    Gauge("mongo_pool_connections_open", "Open pool connections.", lambda: POOL_LISTENER.open_connections),
+]
+
+
+@contextmanager
+def llm_timer():
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - started
+        LLM_CALL.observe(elapsed, outcome)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.llm += elapsed
+
+
+def request_age() -> float:
+    """Seconds since the current request was received (0 outside a request)."""
+    timings = _current_timings.get()
+    return time.perf_counter() - timings.received if timings is not None else 0.0
+
+
+def _timed_endpoint(endpoint):
+    if not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings = _current_timings.get()
+            if timings is not None:
+                timings.handler = time.perf_counter() - started
+
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """Route class that times the endpoint body separately from FastAPI's
+    request validation and response serialization."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+class MetricsMiddleware:
+    def __init__(self, app, slow_request_ms: float = 1000.0):
+        self.app = app
+        self.slow_request_seconds = slow_request_ms / 1000.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+        response = {"status": 500, "size": 0, "stream": False}
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["stream"] = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_timings.reset(token)
+            self._record(scope, timings, elapsed, response["status"], response["size"], response["stream"])
+
+    def _record(self, scope, timings: RequestTimings, elapsed: float, status: int, size: int, stream: bool = False):
+        route = scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        method = scope["method"]
+        REQUESTS.inc(path, method, str(status))
+        REQUEST_LATENCY.observe(elapsed, path, method)
+        RESPONSE_SIZE.observe(size, path, method)
+
+        phases = {"db": sum(timings.db), "llm": timings.llm}
+        if timings.handler is not None:
+            # Concurrent awaits can overlap, so clamp rather than go negative
+            phases["app"] = max(timings.handler - phases["db"] - phases["llm"], 0.0)
+            phases["framework"] = max(elapsed - timings.handler, 0.0)
+        for phase, seconds in phases.items():
+            REQUEST_PHASE.observe(seconds, path, phase)
+        _drain_mongo_events()
+
+        # Event streams stay open by design; their duration is not latency
+        if elapsed >= self.slow_request_seconds and not stream:
+            breakdown = ", ".join(f"{phase} {seconds * 1000:.1f}ms" for phase, seconds in phases.items())
+            logger.warning(
+                "Slow request %s %s -> %d in %.1fms (%s; %d db commands, %d bytes)",
+                method, path, status, elapsed * 1000, breakdown, len(timings.db), size
+            )
+
+
+def render_prometheus() -> str:
+    _drain_mongo_events()
+    lines: List[str] = []
+    for collector in _COLLECTORS:
+        lines.extend(collector.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,516 @@
+"""Budgeted selection of sustainability initiatives.
+
+Given a catalog of initiatives (cost, CO2 reduction and savings per year,
+lifetime, prerequisites), a budget and a planning horizon, `optimize` picks
+the subset with the highest objective value whose total cost fits the budget
+and which contains the prerequisites of everything it contains. Two exact
+solvers:
+
+* Dynamic programming, when every initiative requires at most one other
+  (the prerequisites form a forest) and the budget, in units of the costs'
+  common divisor, fits MAX_DP_CELLS. Initiatives are visited in DFS order of
+  the forest. Each step is one NumPy row over every budget level at once:
+  either take the initiative and continue into its dependents, or skip its
+  whole subtree. The cost is O(n x budget cells). The first row is also the
+  efficient frontier, the best value at every budget.
+* Branch and bound otherwise, pruned by the LP relaxation. At the root the
+  LP is solved exactly: a few max-flow (minimum cut) solves price the budget
+  and give the value each initiative passes up to pay for its prerequisites.
+  With those values moved, a fractional knapsack computed with NumPy over the
+  undecided initiatives equals the LP bound; below the root, edges with a
+  decided end are dropped, so the bound tightens as the search goes deeper.
+  The search goes depth first in order of the moved values per cost. It
+  starts from the better of two greedy portfolios, one from scratch and one
+  from the LP's within-budget closure; each repeatedly adds the initiative
+  whose value per cost, counted together with its missing prerequisites, is
+  best (all candidates are scored at once with one product against the
+  prerequisite-closure matrix). The search stops after MAX_NODES or
+  MAX_SEARCH_SECONDS and then reports `optimal: False` with the gap to the
+  root bound.
+
+Objectives, over `min(horizon, lifetime)` years of each initiative:
+"co2" (tonnes reduced), "net_savings" (savings minus cost) and
+"carbon_value" (net savings plus tonnes x `carbon_price`).
+"""
+import math
+import time
+from functools import reduce
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+OBJECTIVES = ("co2", "net_savings", "carbon_value")
+MAX_INITIATIVES = 500
+MAX_DP_CELLS = 200_000
+# Initiatives x budget cells of take/skip decisions kept for the walk back (one byte each)
+MAX_DP_TABLE = 50_000_000
+MAX_NODES = 200_000
+MAX_SEARCH_SECONDS = 0.8
+# Max-flow solves when pricing the budget for the LP bound
+MAX_LP_ITERATIONS = 50
+FRONTIER_POINTS = 50
+
+# Starting catalog for the Streamlit planner (costs in ₹, CO2 in tonnes/year)
+DEFAULT_CATALOG = [
+    {"id": "led", "name": "LED Lighting Upgrade", "cost": 150000, "co2_t_per_year": 3.2,
+     "annual_savings": 90000, "lifetime_years": 10, "requires": []},
+    {"id": "hybrid", "name": "Hybrid Program Delivery", "cost": 80000, "co2_t_per_year": 2.1,
+     "annual_savings": 70000, "lifetime_years": 5, "requires": []},
+    {"id": "solar", "name": "Solar Installation", "cost": 400000, "co2_t_per_year": 6.8,
+     "annual_savings": 120000, "lifetime_years": 20, "requires": ["audit"]},
+    {"id": "audit", "name": "Energy Audit", "cost": 30000, "co2_t_per_year": 0.3,
+     "annual_savings": 10000, "lifetime_years": 3, "requires": []},
+    {"id": "hvac", "name": "HVAC Scheduling and Controls", "cost": 120000, "co2_t_per_year": 4.1,
+     "annual_savings": 65000, "lifetime_years": 8, "requires": ["audit"]},
+    {"id": "battery", "name": "Battery Storage for Solar", "cost": 250000, "co2_t_per_year": 1.9,
+     "annual_savings": 40000, "lifetime_years": 10, "requires": ["solar"]},
+    {"id": "ev_fleet", "name": "Electric Field Vehicles", "cost": 600000, "co2_t_per_year": 7.5,
+     "annual_savings": 95000, "lifetime_years": 8, "requires": []},
+    {"id": "telepresence", "name": "Telepresence for Donor Meetings", "cost": 60000, "co2_t_per_year": 1.4,
+     "annual_savings": 45000, "lifetime_years": 5, "requires": ["hybrid"]},
+]
+
+
+def _parents(catalog: Sequence[Dict[str, Any]]) -> List[List[int]]:
+    index = {}
+    for i, item in enumerate(catalog):
+        if item["id"] in index:
+            raise ValueError(f"Duplicate initiative id {item['id']!r}")
+        index[item["id"]] = i
+    parents = []
+    for item in catalog:
+        try:
+            parents.append(sorted({index[r] for r in item.get("requires") or []}))
+        except KeyError as e:
+            raise ValueError(f"{item['id']!r} requires unknown initiative {e.args[0]!r}")
+    # Reject cycles (iterative DFS with colours)
+    state = [0] * len(catalog)
+    for start in range(len(catalog)):
+        stack = [(start, iter(parents[start]))] if state[start] == 0 else []
+        if stack:
+            state[start] = 1
+        while stack:
+            node, children = stack[-1]
+            nxt = next(children, None)
+            if nxt is None:
+                state[node] = 2
+                stack.pop()
+            elif state[nxt] == 1:
+                raise ValueError(f"Prerequisites of {catalog[nxt]['id']!r} form a cycle")
+            elif state[nxt] == 0:
+                state[nxt] = 1
+                stack.append((nxt, iter(parents[nxt])))
+    return parents
+
+
+def _closure(edges: List[List[int]]) -> List[List[int]]:
+    """All nodes reachable from each node (ancestors for parent edges, descendants for child edges)."""
+    closure: List[Optional[List[int]]] = [None] * len(edges)
+
+    def visit(i: int) -> List[int]:
+        if closure[i] is None:
+            found = set()
+            stack = list(edges[i])
+            while stack:
+                j = stack.pop()
+                if j not in found:
+                    found.add(j)
+                    stack.extend(edges[j])
+            closure[i] = sorted(found)
+        return closure[i]
+
+    return [visit(i) for i in range(len(edges))]
+
+
+def initiative_values(catalog: Sequence[Dict[str, Any]], horizon_years: float) -> Dict[str, np.ndarray]:
+    cost = np.array([float(item["cost"]) for item in catalog])
+    co2_per_year = np.array([float(item.get("co2_t_per_year") or 0) for item in catalog])
+    savings_per_year = np.array([float(item.get("annual_savings") or 0) for item in catalog])
+    lifetime = np.array([float(item.get("lifetime_years") or horizon_years) for item in catalog])
+    years = np.minimum(lifetime, horizon_years)
+    return {
+        "cost": cost,
+        "co2_per_year": co2_per_year,
+        "savings_per_year": savings_per_year,
+        "co2": co2_per_year * years,
+        "savings": savings_per_year * years,
+    }
+
+
+def objective_values(values: Dict[str, np.ndarray], objective: str, carbon_price: float) -> np.ndarray:
+    if objective == "co2":
+        return values["co2"]
+    if objective == "net_savings":
+        return values["savings"] - values["cost"]
+    if objective == "carbon_value":
+        return values["savings"] - values["cost"] + carbon_price * values["co2"]
+    raise ValueError(f"objective must be one of {', '.join(OBJECTIVES)}")
+
+
+def _solve_dp(value: np.ndarray, cost_units: np.ndarray, cells: int, parent: List[int], unit: int):
+    n = len(value)
+    children: List[List[int]] = [[] for _ in range(n)]
+    roots = []
+    for i, p in enumerate(parent):
+        (children[p] if p >= 0 else roots).append(i)
+    # Pre-order positions; end[pos] is the position after that initiative's subtree
+    order: List[int] = []
+    position = [0] * n
+    end = [0] * n
+    stack = [(r, False) for r in reversed(roots)]
+    while stack:
+        i, done = stack.pop()
+        if done:
+            end[position[i]] = len(order)
+            continue
+        position[i] = len(order)
+        order.append(i)
+        stack.append((i, True))
+        stack.extend((c, False) for c in reversed(children[i]))
+
+    # A row is needed by the position before it and by every subtree ending at it
+    last_use = list(range(-1, n))
+    for pos in range(n):
+        last_use[end[pos]] = min(last_use[end[pos]], pos)
+    rows: Dict[int, np.ndarray] = {n: np.zeros(cells)}
+    take = np.zeros((n, cells), dtype=bool)
+    for pos in range(n - 1, -1, -1):
+        i = order[pos]
+        c = int(cost_units[i])
+        skip_row = rows[end[pos]]
+        taken = np.full(cells, -np.inf)
+        if c < cells:
+            taken[c:] = rows[pos + 1][:cells - c] + value[i]
+        take[pos] = taken > skip_row
+        rows[pos] = np.where(take[pos], taken, skip_row)
+        for q in [q for q in rows if q > pos and last_use[q] >= pos]:
+            del rows[q]
+
+    # Walk the decisions back from the full budget
+    selected = []
+    pos, budget = 0, cells - 1
+    while pos < n:
+        if take[pos, budget]:
+            i = order[pos]
+            selected.append(i)
+            budget -= int(cost_units[i])
+            pos += 1
+        else:
+            pos = end[pos]
+    frontier_cells = np.unique(np.linspace(0, cells - 1, min(cells, FRONTIER_POINTS)).astype(int))
+    frontier = [{"budget": int(b) * unit, "value": float(rows[0][b])} for b in frontier_cells]
+    return sorted(selected), frontier
+
+
+def _greedy(value: np.ndarray, cost: np.ndarray, budget: float, ancestors: List[List[int]],
+            start: Sequence[int] = ()) -> List[int]:
+    n = len(value)
+    closure = np.eye(n, dtype=bool)
+    for i, found in enumerate(ancestors):
+        closure[i, found] = True
+    closure = closure.astype(float)
+    taken = np.zeros(n, dtype=bool)
+    taken[list(start)] = True
+    spent = float(cost[taken].sum())
+    while True:
+        # Each candidate's extra cost and value, with the prerequisites it would add
+        open_ = ~taken
+        extra_cost = closure @ (cost * open_)
+        extra_value = closure @ (value * open_)
+        feasible = open_ & (extra_value > 0) & (spent + extra_cost <= budget + 1e-9)
+        if not feasible.any():
+            return list(np.flatnonzero(taken))
+        density = np.where(extra_cost > 0, extra_value / np.where(extra_cost > 0, extra_cost, 1), np.inf)
+        i = int(np.argmax(np.where(feasible, density, -np.inf)))
+        spent += float(extra_cost[i])
+        taken |= closure[i] > 0
+
+
+def _max_closure(gain: List[float], parents: List[List[int]]):
+    """Highest-gain set of initiatives that contains the prerequisites of its members.
+
+    A minimum cut (Dinic's max flow) between the positive gains and the
+    negative ones, with an uncuttable edge from each initiative to each of its
+    prerequisites. Returns the set and, per prerequisite edge, the flow over it:
+    the gain each initiative passes up to pay for that prerequisite.
+    """
+    n = len(gain)
+    source, sink = n, n + 1
+    scale = max((abs(g) for g in gain), default=0.0)
+    eps = 1e-12 * max(scale, 1.0)
+    infinite = sum(abs(g) for g in gain) + 1.0
+    head: List[List[int]] = [[] for _ in range(n + 2)]
+    to: List[int] = []
+    cap: List[float] = []
+
+    def edge(a: int, b: int, capacity: float) -> int:
+        head[a].append(len(to))
+        to.append(b)
+        cap.append(capacity)
+        head[b].append(len(to))
+        to.append(a)
+        cap.append(0.0)
+        return len(to) - 2
+
+    for i, g in enumerate(gain):
+        if g > eps:
+            edge(source, i, g)
+        elif g < -eps:
+            edge(i, sink, -g)
+    prerequisite_edges = [[edge(i, p, infinite) for p in ps] for i, ps in enumerate(parents)]
+
+    def levels() -> List[int]:
+        level = [-1] * (n + 2)
+        level[source] = 0
+        queue = [source]
+        for a in queue:
+            for e in head[a]:
+                if cap[e] > eps and level[to[e]] < 0:
+                    level[to[e]] = level[a] + 1
+                    queue.append(to[e])
+        return level
+
+    while True:
+        level = levels()
+        if level[sink] < 0:
+            break
+        cursor = [0] * (n + 2)
+        while True:
+            # Depth first along increasing levels, retreating from dead ends
+            path: List[int] = []
+            a = source
+            while a != sink:
+                edges = head[a]
+                while cursor[a] < len(edges):
+                    e = edges[cursor[a]]
+                    if cap[e] > eps and level[to[e]] == level[a] + 1:
+                        break
+                    cursor[a] += 1
+                if cursor[a] == len(edges):
+                    if not path:
+                        break
+                    level[a] = -1
+                    a = to[path.pop() ^ 1]
+                    cursor[a] += 1
+                    continue
+                path.append(edges[cursor[a]])
+                a = to[edges[cursor[a]]]
+            if a != sink:
+                break
+            pushed = min(cap[e] for e in path)
+            for e in path:
+                cap[e] -= pushed
+                cap[e ^ 1] += pushed
+
+    reachable = levels()
+    closure = [i for i in range(n) if reachable[i] >= 0]
+    flows = [[cap[e ^ 1] for e in edges] for edges in prerequisite_edges]
+    return closure, flows
+
+
+def _lp_flows(value: np.ndarray, cost: np.ndarray, budget: float, parents: List[List[int]]):
+    """Value each initiative passes up to its prerequisites in the LP relaxation's optimum.
+
+    The LP relaxation (fractional selections, a dependent at most as selected
+    as each prerequisite) equals the minimum over prices lambda >= 0 of
+    lambda * budget plus the best closure of value - lambda * cost. That
+    function is convex and piecewise linear in lambda; the minimum is found
+    by intersecting the lines of an over-budget and a within-budget closure
+    until no closure lies above the intersection. Also returns the last
+    within-budget closure, a feasible portfolio.
+    """
+    closure, flows = _max_closure(value.tolist(), parents)
+    if float(cost[closure].sum()) <= budget:
+        return flows, closure
+    high = (float(value[closure].sum()), float(cost[closure].sum()))  # over budget
+    low = (0.0, 0.0)                                                    # the empty selection
+    feasible: List[int] = []
+    for _ in range(MAX_LP_ITERATIONS):
+        price = (high[0] - low[0]) / (high[1] - low[1])
+        closure, flows = _max_closure((value - price * cost).tolist(), parents)
+        found = (float(value[closure].sum()), float(cost[closure].sum()))
+        if found[0] - price * found[1] <= high[0] - price * high[1] + 1e-9 * max(abs(high[0]), 1.0):
+            break
+        if found[1] > budget:
+            high = found
+        else:
+            low, feasible = found, closure
+    return flows, feasible
+
+
+def _solve_branch_and_bound(value: np.ndarray, cost: np.ndarray, budget: float, parents: List[List[int]]):
+    n = len(value)
+    ancestors = _closure(parents)
+    children: List[List[int]] = [[] for _ in range(n)]
+    for i, ps in enumerate(parents):
+        for p in ps:
+            children[p].append(i)
+    descendants = _closure(children)
+
+    # Value passed up prerequisite edges in the root LP optimum. Any selection with a
+    # dependent also has its prerequisites, so moving value up never lowers a selection's
+    # value, and the fractional knapsack over the moved values is an upper bound that
+    # respects prerequisites: the LP bound at the root. Below it, edges with a decided end
+    # are dropped, so the bound tightens as initiatives are taken or excluded.
+    flows, within_budget = _lp_flows(value, cost, budget, parents)
+    edge_child = np.array([i for i, ps in enumerate(parents) for _ in ps], dtype=np.int64)
+    edge_parent = np.array([p for ps in parents for p in ps], dtype=np.int64)
+    edge_flow = np.array([f for fs in flows for f in fs])
+    status = np.zeros(n, dtype=np.int8)      # 0 undecided, 1 taken, -1 excluded
+    state = {"spent": 0.0, "value": 0.0}
+
+    def moved_values() -> np.ndarray:
+        undecided = status == 0
+        live = undecided[edge_child] & undecided[edge_parent]
+        moved = (np.bincount(edge_parent[live], edge_flow[live], minlength=n)
+                 - np.bincount(edge_child[live], edge_flow[live], minlength=n))
+        return np.where(undecided, value + moved, 0.0)
+
+    def bound(remaining: float) -> float:
+        gains = moved_values()
+        free = np.flatnonzero(gains > 0)
+        costs, gains = cost[free], gains[free]
+        density = np.where(costs > 0, gains / np.where(costs > 0, costs, 1), np.inf)
+        by_density = np.argsort(-density, kind="stable")
+        costs, gains = costs[by_density], gains[by_density]
+        cumulative = np.cumsum(costs)
+        fits = int(np.searchsorted(cumulative, remaining, side="right"))
+        total = gains[:fits].sum()
+        if fits < len(costs) and costs[fits] > 0:
+            used = cumulative[fits - 1] if fits else 0.0
+            total += gains[fits] * (remaining - used) / costs[fits]
+        return state["value"] + float(total)
+
+    # Branch in order of LP value per cost
+    moved = moved_values()
+    density = np.where(cost > 0, moved / np.where(cost > 0, cost, 1), np.where(moved > 0, np.inf, -np.inf))
+    order = np.argsort(-density, kind="stable").tolist()
+
+    # Start from the better of the greedy portfolio and the LP's within-budget closure, filled up greedily
+    greedy = max(_greedy(value, cost, budget, ancestors), _greedy(value, cost, budget, ancestors, within_budget),
+                 key=lambda selection: float(value[selection].sum()))
+    best = {"value": float(value[greedy].sum()), "selection": greedy, "nodes": 0, "complete": True}
+    deadline = time.perf_counter() + MAX_SEARCH_SECONDS
+
+    def set_status(items: List[int], to: int) -> List[int]:
+        changed = [j for j in items if status[j] == 0]
+        status[changed] = to
+        return changed
+
+    def search(k: int):
+        if not best["complete"]:
+            return
+        if best["nodes"] >= MAX_NODES or (best["nodes"] % 256 == 0 and time.perf_counter() > deadline):
+            best["complete"] = False
+            return
+        best["nodes"] += 1
+        while k < n and status[order[k]] != 0:
+            k += 1
+        if k == n or bound(budget - state["spent"]) <= best["value"] + 1e-9:
+            if state["value"] > best["value"] + 1e-9:
+                best["value"] = state["value"]
+                best["selection"] = np.flatnonzero(status == 1).tolist()
+            return
+        i = order[k]
+        # A non-positive initiative is only worth taking as a prerequisite. The LP order can reach
+        # one before its dependents, so it is branched on too unless nothing depends on it.
+        if (value[i] > 0 or descendants[i]) and all(status[a] != -1 for a in ancestors[i]):
+            needed = [j for j in ancestors[i] + [i] if status[j] == 0]
+            extra = float(cost[needed].sum())
+            if state["spent"] + extra <= budget + 1e-9:
+                set_status(needed, 1)
+                gained = float(value[needed].sum())
+                state["spent"] += extra
+                state["value"] += gained
+                search(k + 1)
+                state["spent"] -= extra
+                state["value"] -= gained
+                status[needed] = 0
+        # Skip: its dependents become impossible too
+        changed = set_status([i] + descendants[i], -1)
+        search(k + 1)
+        status[changed] = 0
+
+    root_bound = bound(budget)
+    search(0)
+    return sorted(best["selection"]), best["nodes"], best["complete"], root_bound
+
+
+def optimize(
+    catalog: Sequence[Dict[str, Any]],
+    budget: float,
+    horizon_years: float = 5,
+    objective: str = "co2",
+    carbon_price: float = 0.0
+) -> Dict[str, Any]:
+    """Best portfolio of `catalog` within `budget` (see module docstring)."""
+    if len(catalog) > MAX_INITIATIVES:
+        raise ValueError(f"At most {MAX_INITIATIVES} initiatives can be optimized at once")
+    if budget < 0 or horizon_years <= 0:
+        raise ValueError("budget must be >= 0 and horizon_years > 0")
+    if any(float(item["cost"]) < 0 for item in catalog):
+        raise ValueError("Initiative costs must be >= 0")
+    started = time.perf_counter()
+    parents = _parents(catalog)
+    values = initiative_values(catalog, horizon_years)
+    value = objective_values(values, objective, carbon_price)
+    cost = values["cost"]
+
+    # DP needs whole-unit costs and a prerequisite forest
+    whole = bool(np.all(cost == np.round(cost)))
+    unit = reduce(math.gcd, (int(c) for c in cost if c > 0), 0) or 1
+    cells = int(budget // unit) + 1
+    forest = all(len(p) <= 1 for p in parents)
+    if whole and forest and cells <= MAX_DP_CELLS and len(catalog) * cells <= MAX_DP_TABLE:
+        selected, frontier = _solve_dp(value, (cost // unit).astype(np.int64), cells,
+                                       [p[0] if p else -1 for p in parents], unit)
+        method, optimal, nodes, gap = "dynamic_programming", True, None, 0.0
+    else:
+        selected, nodes, optimal, root_bound = _solve_branch_and_bound(value, cost, float(budget), parents)
+        frontier = None
+        method = "branch_and_bound"
+        gap = 0.0 if optimal else max(root_bound - float(value[selected].sum()), 0.0)
+
+    chosen = np.zeros(len(catalog), dtype=bool)
+    chosen[selected] = True
+    total_cost = float(cost[chosen].sum())
+    annual_savings = float(values["savings_per_year"][chosen].sum())
+    initiatives = []
+    for i, item in enumerate(catalog):
+        c, s, t = float(cost[i]), float(values["savings_per_year"][i]), float(values["co2_per_year"][i])
+        initiatives.append({
+            "id": item["id"],
+            "name": item.get("name") or item["id"],
+            "selected": bool(chosen[i]),
+            "cost": c,
+            "co2_t_per_year": t,
+            "annual_savings": s,
+            "objective_value": round(float(value[i]), 4),
+            "roi": round(s / c, 3) if c else None,
+            "payback_years": round(c / s, 2) if s > 0 else None,
+            "cost_per_tonne": round(c / float(values["co2"][i]), 2) if values["co2"][i] > 0 else None,
+        })
+    return {
+        "objective": objective,
+        "objective_value": round(float(value[chosen].sum()), 4),
+        "method": method,
+        "optimal": optimal,
+        "optimality_gap": round(gap, 4),
+        "nodes": nodes,
+        "solve_ms": round((time.perf_counter() - started) * 1000, 2),
+        "budget": float(budget),
+        "horizon_years": horizon_years,
+        "selected": [catalog[i]["id"] for i in selected],
+        "totals": {
+            "cost": round(total_cost, 2),
+            "budget_remaining": round(float(budget) - total_cost, 2),
+            "co2_t_per_year": round(float(values["co2_per_year"][chosen].sum()), 4),
+            "co2_t": round(float(values["co2"][chosen].sum()), 4),
+            "annual_savings": round(annual_savings, 2),
+            "savings": round(float(values["savings"][chosen].sum()), 2),
+            "net_savings": round(float(values["savings"][chosen].sum()) - total_cost, 2),
+            "payback_years": round(total_cost / annual_savings, 2) if annual_savings > 0 else None,
+        },
+        "initiatives": initiatives,
+        "frontier": frontier,
+    }
@@ -0,0 +1,230 @@
+"""Opt-in sampling profiler with collapsed-stack and speedscope export.
+
+`SamplingProfiler` runs a daemon thread that snapshots the stacks of every
+thread (`sys._current_frames()`) at a fixed interval. Sampling all threads
+matters for this app: CPU work on the event loop (bcrypt, JWT, aggregation
+loops, model inference) shows up under the loop thread, while Motor runs
+pymongo's blocking socket I/O on its executor threads, so database waits are
+visible there instead of as an idle loop.
+
+`ProfilingMiddleware` profiles individual requests, either when a request
+carries `X-Profile: 1` with the admin `X-Profile-Token`, or for a random
+fraction of requests. Only one request is profiled at a time and each
+profile is capped in duration, which bounds the overhead; profiles are
+written to a directory that keeps only the newest files.
+
+A request profile covers the request's wall-clock time, not the request
+alone. The sampler sees every thread, so concurrent requests' work on the
+event loop and executor threads lands in the same profile. Profile under
+low concurrency (or read the stacks with that in mind).
+
+This module has no backend dependencies so the Streamlit app can use it too.
+"""
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# (function, file) of the innermost frame of a thread that is parked waiting for work
+_IDLE_FRAMES = {("select", "selectors.py"), ("_worker", "thread.py")}
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, max_seconds: float = 30.0, include_idle: bool = False):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.include_idle = include_idle
+        self.samples: Counter = Counter()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ecopulse-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self.samples
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        started = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                thread_name = names.get(thread_id, f"thread-{thread_id}")
+                # Threads parked waiting for work (idle pool workers, the loop's
+                # selector, pymongo's background monitors) are noise unless requested
+                if not self.include_idle and (
+                    (frame.f_code.co_name, os.path.basename(frame.f_code.co_filename)) in _IDLE_FRAMES
+                    or thread_name.startswith("pymongo_")
+                ):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(thread_name)
+                self.samples[tuple(reversed(stack))] += 1
+            if time.perf_counter() - started >= self.max_seconds:
+                break
+        self.duration = time.perf_counter() - started
+
+
+def to_collapsed(samples: Counter) -> str:
+    """Brendan Gregg's folded format, readable by flamegraph.pl and speedscope."""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in samples.most_common())
+
+
+def to_speedscope(samples: Counter, name: str, interval: float) -> Dict:
+    frames: List[Dict] = []
+    index: Dict[str, int] = {}
+    profile_samples: List[List[int]] = []
+    weights: List[float] = []
+    for stack, count in samples.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                match = re.match(r"(.*) \((.*):(\d+)\)$", frame)
+                if match:
+                    frames.append({"name": match.group(1), "file": match.group(2), "line": int(match.group(3))})
+                else:
+                    frames.append({"name": frame})
+            ids.append(index[frame])
+        profile_samples.append(ids)
+        weights.append(count * interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": profile_samples,
+            "weights": weights
+        }],
+        "name": name,
+        "exporter": "ecopulse-profiling"
+    }
+
+
+class ProfileStore:
+    """Writes profiles to `directory`, keeping only the newest `max_profiles`."""
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def new_id(self, label: str) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", label).strip("-")[:60] or "profile"
+        return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{slug}-{uuid.uuid4().hex[:6]}"
+
+    def save(self, profile_id: str, samples: Counter, interval: float):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{profile_id}.collapsed.txt").write_text(to_collapsed(samples))
+        (self.directory / f"{profile_id}.speedscope.json").write_text(
+            json.dumps(to_speedscope(samples, profile_id, interval))
+        )
+        self._rotate()
+
+    def list(self) -> List[str]:
+        if not self.directory.exists():
+            return []
+        files = sorted(self.directory.glob("*.collapsed.txt"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [p.name[:-len(".collapsed.txt")] for p in files]
+
+    def path(self, profile_id: str, fmt: str) -> Optional[Path]:
+        suffix = {"collapsed": ".collapsed.txt", "speedscope": ".speedscope.json"}.get(fmt)
+        if suffix is None or "/" in profile_id or profile_id.startswith("."):
+            return None
+        candidate = self.directory / f"{profile_id}{suffix}"
+        return candidate if candidate.exists() else None
+
+    def _rotate(self):
+        for profile_id in self.list()[self.max_profiles:]:
+            for suffix in (".collapsed.txt", ".speedscope.json"):
+                try:
+                    (self.directory / f"{profile_id}{suffix}").unlink()
+                except FileNotFoundError:
+                    pass
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval: float = 0.005,
+        max_seconds: float = 30.0
+    ):
+        self.app = app
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._active = False
+
+    def _requested(self, scope) -> bool:
+        if self.token:
+            headers = dict(scope.get("headers") or [])
+            if headers.get(b"x-profile") == b"1" and hmac.compare_digest(
+                headers.get(b"x-profile-token", b""), self.token.encode()
+            ):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        profile_id = self.store.new_id(f"{scope['method']} {scope['path']}")
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler(self.interval, self.max_seconds).start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            samples = profiler.stop()
+            self._active = False
+            await asyncio.to_thread(self.store.save, profile_id, samples, self.interval)
@@ -0,0 +1,120 @@
+"""Mergeable t-digest for percentile lookups over many organizations.
+
+A digest summarises any number of values in a few hundred centroids (mean,
+weight): about `compression` / 2 * ln(n) of them, around 600 for 200k
+values at the default compression. Centroids near the median absorb many values and
+centroids near the tails stay small, so extreme percentiles stay accurate.
+Two digests merge into one that describes the union of their values. That
+lets monthly peer distributions be combined into any trailing window
+without revisiting the underlying data.
+
+After `compress()`, `cdf()` and `quantile()` are binary searches over the
+centroid centres: O(log k) for k centroids, whatever the number of values.
+"""
+import math
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class TDigest:
+    def __init__(self, compression: float = 100.0):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: List[tuple] = []
+        # Cumulative weight at each centroid's centre, rebuilt by compress()
+        self._centres: List[float] = []
+
+    def add(self, value: float, weight: float = 1.0):
+        self._buffer.append((value, weight))
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self.compress()
+
+    def update(self, values: Iterable[float]):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """Fold `other`'s centroids into this digest."""
+        other.compress()
+        self._buffer.extend(zip(other.means, other.weights))
+        if other.total:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.compress()
+        return self
+
+    def compress(self):
+        if not self._buffer and len(self._centres) == len(self.means):
+            return
+        points = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in points)
+        means: List[float] = []
+        weights: List[float] = []
+        cumulative = 0.0
+        for mean, weight in points:
+            if weights:
+                # Size limit for a centroid around quantile q: 4 N q (1 - q) / compression
+                q = (cumulative + (weights[-1] + weight) / 2) / total
+                if weights[-1] + weight <= max(4 * total * q * (1 - q) / self.compression, 1.0):
+                    merged = weights[-1] + weight
+                    means[-1] += (mean - means[-1]) * weight / merged
+                    weights[-1] = merged
+                    continue
+                cumulative += weights[-1]
+            means.append(mean)
+            weights.append(weight)
+        self.means, self.weights, self.total = means, weights, total
+        self._centres = []
+        running = 0.0
+        for weight in weights:
+            self._centres.append(running + weight / 2)
+            running += weight
+
+    def cdf(self, value: float) -> float:
+        """Fraction of the summarised values below `value` (interpolated)."""
+        self.compress()
+        if not self.total or value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        i = bisect_right(self.means, value)
+        # Interpolate between neighbouring centroid centres (min and max bound the ends)
+        left_x, left_c = (self.means[i - 1], self._centres[i - 1]) if i > 0 else (self.min, 0.0)
+        right_x, right_c = (self.means[i], self._centres[i]) if i < len(self.means) else (self.max, self.total)
+        if right_x <= left_x:
+            return right_c / self.total
+        return (left_c + (right_c - left_c) * (value - left_x) / (right_x - left_x)) / self.total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value below which a fraction `q` of the summarised values falls."""
+        self.compress()
+        if not self.total:
+            return None
+        target = min(max(q, 0.0), 1.0) * self.total
+        i = bisect_left(self._centres, target)
+        left_x, left_c = (self.means[i - 1], self._centres[i - 1]) if i > 0 else (self.min, 0.0)
+        right_x, right_c = (self.means[i], self._centres[i]) if i < len(self.means) else (self.max, self.total)
+        if right_c <= left_c:
+            return right_x
+        return left_x + (right_x - left_x) * (target - left_c) / (right_c - left_c)
+
+    def to_dict(self) -> Dict[str, Any]:
+        self.compress()
+        return {"compression": self.compression, "means": self.means, "weights": self.weights,
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TDigest":
+        digest = cls(data["compression"])
+        digest._buffer = list(zip(data["means"], data["weights"]))
+        if data["means"]:
+            digest.min, digest.max = data["min"], data["max"]
+        digest.compress()
+        return digest
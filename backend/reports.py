@@ -0,0 +1,474 @@
+"""Formatted sustainability reports (PDF and XLSX), rendered in the background.
+
+A report is identified by organization, data version, format and period
+(dates [start, end)). An artifact therefore stays valid until the
+organization's data changes. `ReportRenderer.request` returns the report's
+job:
+
+* a finished artifact is served straight from the report directory;
+* otherwise a `report_jobs` document is claimed (one per key, shared by all
+  workers) and the job runs in the background. It computes the JSON report,
+  streams the organization's activities and energy entries from the database
+  into NDJSON spool files, and renders the document from them in a process
+  pool. Meanwhile the API answers 202 with a poll URL.
+
+No rendering step holds all rows in memory. The XLSX writer runs in
+constant-memory mode (each row goes to disk as it is written) and adds
+native Excel charts. The PDF has the summary, charts and the largest
+activities, picked from the stream with a bounded heap. Artifacts of older
+data versions are removed once a newer one is done.
+
+The report directory must be shared by every worker serving the API.
+"""
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import cold_storage
+from analytics import org_match
+
+logger = logging.getLogger("ecopulse.reports")
+
+FORMATS = {
+    "pdf": "application/pdf",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# A queued or running job not updated for this long was lost (worker restart) and is retried
+STALE_SECONDS = 600
+# How often a job's worker touches it while it waits for a slot or renders, well within STALE_SECONDS
+HEARTBEAT_SECONDS = 60
+# A failed job is reported as failed for this long before a request retries it
+FAILED_RETRY_SECONDS = 60
+SPOOL_BATCH = 5000
+PDF_TOP_ACTIVITIES = 50
+PDF_CHART_MONTHS = 24
+XLSX_MAX_ROWS = 1_048_575  # Excel's sheet limit, below the header row
+BRAND_COLOR = "#1A4D2E"
+
+ACTIVITY_COLUMNS: List[Tuple[str, str]] = [
+    ("date", "Date"), ("activity_category", "Category"), ("activity_type", "Type"),
+    ("description", "Description"), ("carbon_emission_kg", "Emissions (kg CO2)"), ("cost", "Cost"),
+]
+ENERGY_COLUMNS: List[Tuple[str, str]] = [
+    ("date", "Date"), ("electricity_kwh", "Electricity (kWh)"), ("num_people", "People"),
+    ("num_systems", "Systems"), ("ac_hours", "AC hours"), ("outdoor_temp_celsius", "Outdoor temp (C)"),
+    ("carbon_emission_kg", "Emissions (kg CO2)"),
+]
+SPOOLS = {"activities": ACTIVITY_COLUMNS, "energy": ENERGY_COLUMNS}
+
+
+def job_id(org_id: str, version: int, fmt: str, start: Optional[str], end: Optional[str]) -> str:
+    return hashlib.sha256(f"{org_id}:{version}:{fmt}:{start or ''}:{end or ''}".encode()).hexdigest()[:32]
+
+
+def filename(job: Dict[str, Any]) -> str:
+    period = f"{job['start'] or 'start'}-to-{job['end'] or 'latest'}"
+    return f"ecopulse-sustainability-report-{period}.{job['format']}"
+
+
+async def spool_rows(db, org_id: str, start: Optional[str], end: Optional[str], paths: Dict[str, Path]) -> Dict[str, int]:
+    """Stream the organization's rows, oldest first, into one NDJSON file per sheet.
+
+    Activities in cold storage come first (their months are the oldest), then the hot ones.
+    """
+    counts = {}
+    for name, collection in (("activities", db.activities), ("energy", db.energy_data)):
+        columns = [field for field, _ in SPOOLS[name]]
+        sources = [collection.find(
+            org_match(org_id, start, end), {"_id": 0, **{field: 1 for field in columns}}
+        ).sort("date", 1).batch_size(SPOOL_BATCH)]
+        if name == "activities":
+            sources.insert(0, cold_storage.iter_rows(db, org_id, start, end))
+        counts[name] = 0
+        with open(paths[name], "w", encoding="utf-8") as f:
+            lines = []
+            for source in sources:
+                async for doc in source:
+                    lines.append(json.dumps([doc.get(field) for field in columns], ensure_ascii=False))
+                    if len(lines) >= SPOOL_BATCH:
+                        f.write("\n".join(lines) + "\n")
+                        counts[name] += len(lines)
+                        lines.clear()
+            if lines:
+                f.write("\n".join(lines) + "\n")
+                counts[name] += len(lines)
+    return counts
+
+
+def _read_spool(path: str) -> Iterator[list]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _label(key: str) -> str:
+    return key.replace("_", " ").title()
+
+
+def render_xlsx(report: Dict[str, Any], spools: Dict[str, str], path: str):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    title = workbook.add_format({"bold": True, "font_size": 16, "font_color": BRAND_COLOR})
+    header = workbook.add_format({"bold": True, "font_color": "white", "bg_color": BRAND_COLOR})
+    bold = workbook.add_format({"bold": True})
+    number = workbook.add_format({"num_format": "#,##0.00"})
+
+    # Summary: rows strictly in order (constant-memory mode flushes each finished row)
+    sheet = workbook.add_worksheet("Summary")
+    sheet.set_column(0, 0, 32)
+    sheet.set_column(1, 1, 18)
+    sheet.write(0, 0, "EcoPulse Sustainability Report", title)
+    period = report["period"]
+    info = [
+        ("Organization", report["organization"]),
+        ("Period", f"{period['start'] or 'N/A'} to {period['end'] or 'N/A'}"),
+        ("Generated", report["report_date"]),
+        *((_label(k), v) for k, v in report["executive_summary"].items()),
+        ("Activity emissions (kg CO2)", report["emissions_breakdown"]["activity_emissions"]),
+        ("Energy emissions (kg CO2)", report["emissions_breakdown"]["energy_emissions"]),
+    ]
+    row = 2
+    for key, value in info:
+        sheet.write(row, 0, key, bold)
+        sheet.write(row, 1, value, number if isinstance(value, float) else None)
+        row += 1
+
+    tables = {}
+    for name, values in (
+        ("Category", report["emissions_breakdown"]["by_category"]),
+        ("Month", report["emissions_breakdown"]["by_month"]),
+    ):
+        row += 1
+        sheet.write_row(row, 0, [name, "Emissions (kg CO2)"], header)
+        first = row + 1
+        for key, value in values.items():
+            row += 1
+            sheet.write(row, 0, _label(key) if name == "Category" else key)
+            sheet.write_number(row, 1, value, number)
+        tables[name] = (first, row)
+        row += 1
+
+    row += 1
+    sheet.write_row(row, 0, ["Goal", "Progress (%)"], header)
+    for goal in report["goals_progress"]["goals"]:
+        row += 1
+        sheet.write(row, 0, goal["title"])
+        sheet.write_number(row, 1, goal["progress"], number)
+    row += 2
+    sheet.write(row, 0, "Recommendations", bold)
+    for recommendation in report["recommendations"]:
+        row += 1
+        sheet.write(row, 0, recommendation)
+
+    # Native charts over the tables above
+    first, last = tables["Category"]
+    if last >= first:
+        pie = workbook.add_chart({"type": "pie"})
+        pie.add_series({
+            "name": "Emissions by category",
+            "categories": ["Summary", first, 0, last, 0],
+            "values": ["Summary", first, 1, last, 1],
+            "data_labels": {"percentage": True},
+        })
+        pie.set_title({"name": "Emissions by category"})
+        sheet.insert_chart(2, 3, pie)
+    first, last = tables["Month"]
+    if last >= first:
+        columns = workbook.add_chart({"type": "column"})
+        columns.add_series({
+            "name": "kg CO2",
+            "categories": ["Summary", first, 0, last, 0],
+            "values": ["Summary", first, 1, last, 1],
+            "fill": {"color": BRAND_COLOR},
+        })
+        columns.set_title({"name": "Monthly activity emissions"})
+        columns.set_legend({"none": True})
+        sheet.insert_chart(18, 3, columns, {"x_scale": 1.5})
+
+    for name, columns in SPOOLS.items():
+        _write_rows(workbook, _label(name), columns, _read_spool(spools[name]), header, number)
+    workbook.close()
+
+
+def _write_rows(workbook, name: str, columns: List[Tuple[str, str]], rows: Iterator[list], header, number):
+    """Stream rows into `name`, continuing on "name (2)", ... past Excel's row limit."""
+    numeric = [i for i, (field, _) in enumerate(columns) if field not in ("date", "activity_category", "activity_type", "description")]
+    part, sheet, row = 0, None, 0
+    for values in rows:
+        if sheet is None or row > XLSX_MAX_ROWS:
+            part += 1
+            sheet, row = _data_sheet(workbook, name if part == 1 else f"{name} ({part})", columns, header, number, numeric), 1
+        sheet.write_row(row, 0, values)
+        row += 1
+    if sheet is None:
+        _data_sheet(workbook, name, columns, header, number, numeric)
+
+
+def _data_sheet(workbook, name: str, columns, header, number, numeric):
+    sheet = workbook.add_worksheet(name)
+    sheet.write_row(0, 0, [label for _, label in columns], header)
+    sheet.freeze_panes(1, 0)
+    for i, (field, _) in enumerate(columns):
+        sheet.set_column(i, i, 40 if field == "description" else 16, number if i in numeric else None)
+    return sheet
+
+
+def render_pdf(report: Dict[str, Any], spools: Dict[str, str], path: str):
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.charts.piecharts import Pie
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import KeepTogether, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    cell = ParagraphStyle("Cell", parent=styles["BodyText"], fontSize=8, leading=10)
+    brand = colors.HexColor(BRAND_COLOR)
+    table_style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), brand),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#F4F4F5")]),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ])
+
+    def table(rows, widths=None):
+        t = Table(rows, colWidths=widths, repeatRows=1)
+        t.setStyle(table_style)
+        return t
+
+    period = report["period"]
+    summary = report["executive_summary"]
+    breakdown = report["emissions_breakdown"]
+    story = [
+        Paragraph("EcoPulse Sustainability Report", styles["Title"]),
+        Paragraph(escape(f"{report['organization']} · {period['start'] or 'N/A'} to {period['end'] or 'N/A'}"), styles["Normal"]),
+        Paragraph(escape(f"Generated {report['report_date'][:10]}"), styles["Normal"]),
+        Spacer(1, 0.5 * cm),
+        Paragraph("Executive summary", styles["Heading2"]),
+        table([["Metric", "Value"]] + [[_label(k), f"{v:,}" if isinstance(v, (int, float)) else str(v)] for k, v in summary.items()]
+              + [["Activity emissions (kg CO2)", f"{breakdown['activity_emissions']:,}"],
+                 ["Energy emissions (kg CO2)", f"{breakdown['energy_emissions']:,}"]], [8 * cm, 6 * cm]),
+    ]
+
+    by_category = breakdown["by_category"]
+    if by_category:
+        drawing = Drawing(16 * cm, 8 * cm)
+        pie = Pie()
+        pie.x, pie.y, pie.width, pie.height = 5 * cm, 1 * cm, 6 * cm, 6 * cm
+        pie.data = [max(v, 0) for v in by_category.values()]
+        pie.labels = [_label(k) for k in by_category]
+        pie.sideLabels = True
+        pie.slices.fontName, pie.slices.fontSize = "Helvetica", 8
+        palette = [brand, colors.HexColor("#4F6F52"), colors.HexColor("#739072"), colors.HexColor("#86A789"),
+                   colors.HexColor("#B2C8BA"), colors.HexColor("#D2E3C8"), colors.HexColor("#F9E400")]
+        for i in range(len(pie.data)):
+            pie.slices[i].fillColor = palette[i % len(palette)]
+        drawing.add(pie)
+        story += [Spacer(1, 0.5 * cm), KeepTogether([Paragraph("Emissions by category", styles["Heading2"]), drawing]),
+                  table([["Category", "kg CO2"]] + [[_label(k), f"{v:,.2f}"] for k, v in by_category.items()], [8 * cm, 6 * cm])]
+
+    months = list(breakdown["by_month"].items())[-PDF_CHART_MONTHS:]
+    if months:
+        drawing = Drawing(16 * cm, 7 * cm)
+        chart = VerticalBarChart()
+        chart.x, chart.y, chart.width, chart.height = 1.5 * cm, 1.2 * cm, 14 * cm, 5.5 * cm
+        chart.data = [[v for _, v in months]]
+        chart.categoryAxis.categoryNames = [m for m, _ in months]
+        chart.categoryAxis.labels.angle = 45
+        chart.categoryAxis.labels.boxAnchor = "ne"
+        chart.categoryAxis.labels.fontName = chart.valueAxis.labels.fontName = "Helvetica"
+        chart.categoryAxis.labels.fontSize = chart.valueAxis.labels.fontSize = 7
+        chart.valueAxis.valueMin = 0
+        chart.bars[0].fillColor = brand
+        drawing.add(chart)
+        story += [Spacer(1, 0.5 * cm), KeepTogether([Paragraph("Monthly activity emissions", styles["Heading2"]), drawing])]
+
+    goals = report["goals_progress"]
+    story += [
+        Spacer(1, 0.5 * cm),
+        Paragraph("Goals", styles["Heading2"]),
+        Paragraph(f"{goals['active']} active, {goals['completed']} completed", styles["Normal"]),
+    ]
+    if goals["goals"]:
+        story.append(table([["Goal", "Progress"]] + [[Paragraph(escape(g["title"]), cell), f"{g['progress']:.0f}%"] for g in goals["goals"]], [11 * cm, 3 * cm]))
+
+    # Largest activities, picked from the stream without loading every row
+    fields = [field for field, _ in ACTIVITY_COLUMNS]
+    emissions, category, description = (fields.index(f) for f in ("carbon_emission_kg", "activity_category", "description"))
+    largest = heapq.nlargest(PDF_TOP_ACTIVITIES, _read_spool(spools["activities"]), key=lambda r: r[emissions] or 0)
+    if largest:
+        story += [
+            Spacer(1, 0.5 * cm),
+            Paragraph(f"Largest {len(largest)} activities", styles["Heading2"]),
+            table([["Date", "Category", "Description", "kg CO2"]] + [
+                [r[0], _label(r[category] or ""), Paragraph(escape(r[description] or ""), cell), f"{r[emissions] or 0:,.2f}"]
+                for r in largest
+            ], [2.2 * cm, 3 * cm, 8.8 * cm, 2.5 * cm]),
+            Paragraph("Every activity and energy entry is in the XLSX export.", styles["Italic"]),
+        ]
+
+    story += [Spacer(1, 0.5 * cm), Paragraph("Recommendations", styles["Heading2"])]
+    story += [Paragraph(escape(f"{i}. {r}"), styles["Normal"]) for i, r in enumerate(report["recommendations"], 1)]
+    SimpleDocTemplate(path, pagesize=A4, title="EcoPulse Sustainability Report",
+                      leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm).build(story)
+
+
+def render_report(fmt: str, report: Dict[str, Any], spools: Dict[str, str], path: str) -> int:
+    """Render in a pool process; returns the artifact size in bytes."""
+    (render_pdf if fmt == "pdf" else render_xlsx)(report, spools, path)
+    return os.path.getsize(path)
+
+
+class ReportRenderer:
+    def __init__(self, report_dir: str, workers: int = 2, stale_seconds: float = STALE_SECONDS):
+        self.report_dir = Path(report_dir)
+        self.workers = workers
+        self.stale_seconds = stale_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Spooling and rendering jobs of this process (the pool queues the rest)
+        self._slots = asyncio.Semaphore(workers * 2)
+        self._tasks = set()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking would copy the server's threads (Mongo monitors) mid-state
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def artifact_path(self, job: Dict[str, Any]) -> Path:
+        return self.report_dir / job["organization_id"] / f"{job['id']}.{job['format']}"
+
+    def ready(self, job: Optional[Dict[str, Any]]) -> bool:
+        return bool(job) and job["status"] == "done" and self.artifact_path(job).exists()
+
+    def lost(self, job: Dict[str, Any]) -> bool:
+        """Queued or running, but its worker stopped touching it (restart or crash)."""
+        return job["status"] in ("queued", "running") and time.time() - job["updated_at"] >= self.stale_seconds
+
+    async def request(
+        self, db, source_db, org_id: str, version: int, fmt: str, start: Optional[str], end: Optional[str],
+        compute_report: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """The job for this report, started in the background unless it is done or in progress.
+
+        Jobs live in `db`; rows are read from `source_db`.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        jid = job_id(org_id, version, fmt, start, end)
+        job = await db.report_jobs.find_one({"id": jid}, {"_id": 0})
+        now = time.time()
+        if self.ready(job):
+            return job
+        if job is None:
+            job = {
+                "id": jid, "organization_id": org_id, "data_version": version, "format": fmt,
+                "start": start, "end": end, "status": "queued", "error": None,
+                "created_at": datetime.now(timezone.utc).isoformat(), "updated_at": now,
+            }
+            result = await db.report_jobs.update_one({"id": jid}, {"$setOnInsert": job}, upsert=True)
+            if result.upserted_id is None:
+                # Another worker created it first
+                return await db.report_jobs.find_one({"id": jid}, {"_id": 0})
+        elif job["status"] in ("queued", "running") and not self.lost(job):
+            return job
+        elif job["status"] == "failed" and now - job["updated_at"] < FAILED_RETRY_SECONDS:
+            return job
+        else:
+            # Lost, failed a while ago, or its file is gone: claim the retry
+            result = await db.report_jobs.update_one(
+                {"id": jid, "updated_at": job["updated_at"]},
+                {"$set": {"status": "queued", "error": None, "updated_at": now}}
+            )
+            if not result.modified_count:
+                return await db.report_jobs.find_one({"id": jid}, {"_id": 0})
+            job = {**job, "status": "queued", "error": None, "updated_at": now}
+
+        task = asyncio.create_task(self._run(db, source_db, job, compute_report))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, db, source_db, job: Dict[str, Any], compute_report):
+        started = time.perf_counter()
+        path = self.artifact_path(job)
+        partial = path.with_name(f"{path.name}.partial")
+        spools = {name: path.with_name(f"{job['id']}.{name}.ndjson") for name in SPOOLS}
+        heartbeat = asyncio.create_task(self._heartbeat(db, job["id"]))
+        try:
+            async with self._slots:
+                await db.report_jobs.update_one({"id": job["id"]}, {"$set": {"status": "running", "updated_at": time.time()}})
+                path.parent.mkdir(parents=True, exist_ok=True)
+                report = await compute_report()
+                rows = await spool_rows(source_db, job["organization_id"], job["start"], job["end"], spools)
+                size = await asyncio.get_running_loop().run_in_executor(
+                    self._executor(), render_report, job["format"], report, {k: str(v) for k, v in spools.items()}, str(partial)
+                )
+                os.replace(partial, path)
+            render_ms = round((time.perf_counter() - started) * 1000, 1)
+            await db.report_jobs.update_one({"id": job["id"]}, {"$set": {
+                "status": "done", "size_bytes": size, "rows": rows, "render_ms": render_ms,
+                "filename": filename(job), "updated_at": time.time(),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+            }})
+            logger.info(f"Report {job['id']} ({job['format']}, {sum(rows.values())} rows) rendered in {render_ms}ms")
+            await self._prune(db, job)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A crashed render (e.g. out of memory) breaks the pool for good: start a new one next time
+                self._pool = None
+            logger.exception(f"Report {job['id']} failed")
+            await db.report_jobs.update_one(
+                {"id": job["id"]}, {"$set": {"status": "failed", "error": str(e) or type(e).__name__, "updated_at": time.time()}}
+            )
+        finally:
+            heartbeat.cancel()
+            for leftover in (partial, *spools.values()):
+                leftover.unlink(missing_ok=True)
+
+    async def _heartbeat(self, db, jid: str):
+        # Keeps a job that waits for a slot or renders for long from looking lost
+        while True:
+            await asyncio.sleep(min(HEARTBEAT_SECONDS, self.stale_seconds / 4))
+            try:
+                await db.report_jobs.update_one(
+                    {"id": jid, "status": {"$in": ["queued", "running"]}}, {"$set": {"updated_at": time.time()}}
+                )
+            except Exception as e:
+                logger.warning(f"Report {jid} heartbeat failed: {e}")
+
+    async def _prune(self, db, job: Dict[str, Any]):
+        """Remove artifacts of this report for older data versions."""
+        old = await db.report_jobs.find({
+            "organization_id": job["organization_id"], "format": job["format"],
+            "start": job["start"], "end": job["end"], "data_version": {"$lt": job["data_version"]}
+        }, {"_id": 0}).to_list(None)
+        for stale in old:
+            self.artifact_path(stale).unlink(missing_ok=True)
+        if old:
+            await db.report_jobs.delete_many({"id": {"$in": [stale["id"] for stale in old]}})
+
+    def status(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "jobs_in_progress": len(self._tasks)}
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
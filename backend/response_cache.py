@@ -0,0 +1,99 @@
+"""Versioned response cache for read-heavy endpoints.
+
+Every organization carries a `data_version` counter that each activity,
+energy or goal mutation increments. Cached bodies are keyed by
+(route, organization, version), so a write makes the old entries
+unreachable and nothing has to be invalidated explicitly. The ETag is
+derived from the same key. A client holding the current ETag therefore gets
+a 304 after a single version lookup, before any aggregation runs.
+
+`ResponseCache` is per process. With several workers, set
+`RESPONSE_CACHE_URL=redis://...` and `RedisResponseCache` shares bodies
+between all of them. Versioned keys need no invalidation; a TTL and Redis's
+own eviction bound the memory.
+"""
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger("ecopulse.response_cache")
+
+
+def make_etag(*parts) -> str:
+    # Weak: equal versions mean semantically equal payloads, not identical bytes
+    # (e.g. report timestamps differ between workers)
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ResponseCache:
+    """In-process LRU of serialized response bodies."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    async def set(self, key: str, body: bytes):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class RedisResponseCache:
+    """Response cache shared by all workers through Redis (`pip install redis`).
+
+    Redis errors are logged and treated as misses, so an unavailable cache
+    only costs recomputation.
+    """
+
+    def __init__(self, url: str, ttl_seconds: int = 3600, prefix: str = "ecopulse:response:"):
+        import redis.asyncio as redis  # optional dependency
+
+        self._errors = (redis.RedisError, OSError)
+        # Connections are opened lazily, i.e. in each worker after the fork
+        self._redis = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self._redis.get(self.prefix + key)
+        except self._errors as e:
+            logger.warning(f"Response cache get failed: {e}")
+            return None
+
+    async def set(self, key: str, body: bytes):
+        try:
+            await self._redis.set(self.prefix + key, body, ex=self.ttl_seconds)
+        except self._errors as e:
+            logger.warning(f"Response cache set failed: {e}")
+
+
+def make_response_cache(url: Optional[str], max_entries: int = 1024, ttl_seconds: int = 3600):
+    """Redis-backed cache when `url` is set, otherwise the in-process LRU."""
+    if url:
+        return RedisResponseCache(url, ttl_seconds=ttl_seconds)
+    return ResponseCache(max_entries=max_entries)
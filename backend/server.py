@@ -1,125 +1,174 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference
+import asyncio
+import hmac
 import os
+import json
 import logging
+import time
+from contextlib import asynccontextmanager, nullcontext
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import anomaly
+import benchmarks
+import cold_storage
+import columnar
+from activity_search import OLD_TEXT_INDEX_NAME, TEXT_INDEX, TEXT_INDEX_NAME, TEXT_WEIGHTS, search_activities, search_text
+from admission import AdmissionController, Overloaded, RateLimited, RoutePolicy, make_token_buckets, retry_after_header
+from causal_reads import CausalDatabase
+from analytics import merge_monthly, org_summary, reduction_percent as activity_reduction_percent
+from energy_series import get_series as get_energy_series, ingest_readings, parse_timestamp
+from emission_factors import EMISSION_FACTORS, EVENT_CATERING_KG, EVENT_TRAVEL_KG, TREES_ABSORPTION_RATE
+from fast_json import dumps as json_dumps, json_response, projection
+from lazy_imports import LazyModule
+from live_updates import LiveDashboard, TooManySubscribers
+from metrics import (
+    ADMISSION_REJECTIONS, POOL_LISTENER, MetricsMiddleware, MongoCommandListener, TimedRoute, llm_timer,
+    render_prometheus, request_age
+)
+from profiling import ProfileStore, ProfilingMiddleware
+from response_cache import etag_matches, make_etag, make_response_cache
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection (pool size is per process: size workers x MONGO_MAX_POOL_SIZE against the server)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ['MONGO_WAIT_QUEUE_TIMEOUT_MS']) if os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS') else None
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    event_listeners=[MongoCommandListener(), POOL_LISTENER]
+)
 db = client[os.environ['DB_NAME']]
 
+# Heavy analytic reads (dashboard, insights, report, leaderboard) go to secondaries when available
+ANALYTICS_READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+ANALYTICS_READ_PREFERENCE = os.environ.get('MONGO_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred')
+analytics_db = db if ANALYTICS_READ_PREFERENCE == "primary" else client.get_database(
+    os.environ['DB_NAME'], read_preference=ANALYTICS_READ_PREFERENCES[ANALYTICS_READ_PREFERENCE]
+)
+
 # JWT Configuration
 JWT_SECRET = os.environ['JWT_SECRET']
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
+# Tickets for the live dashboard stream, which EventSource passes in the URL
+STREAM_TICKET_PURPOSE = "dashboard_live"
+STREAM_TICKET_SECONDS = 60
 
 # LLM Configuration
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
 
+# Heavy subsystems, imported on first use or by the background warm-up (see lazy_imports.py)
+llm_chat = LazyModule("emergentintegrations.llm.chat")
+forecasting = LazyModule("forecasting")
+forecast_batch = LazyModule("forecast_batch")
+meter_ingest = LazyModule("meter_ingest")
+portfolio = LazyModule("portfolio")
+uncertainty = LazyModule("uncertainty")
+reports = LazyModule("reports")
+
+# Streaming meter ingestion (see meter_ingest.py)
+METER_FLUSH_BATCH = int(os.environ.get('METER_FLUSH_BATCH', '20000'))
+METER_MAX_PENDING = int(os.environ.get('METER_MAX_PENDING', '200000'))
+METER_FLUSH_INTERVAL_SECONDS = float(os.environ.get('METER_FLUSH_INTERVAL_SECONDS', '2'))
+METER_CHUNK_LINES = 5000
+
+# Live dashboard streams (see live_updates.py); limits are per process
+LIVE_MAX_SUBSCRIBERS = int(os.environ.get('LIVE_MAX_SUBSCRIBERS', '1000'))
+LIVE_QUEUE_SIZE = int(os.environ.get('LIVE_QUEUE_SIZE', '64'))
+LIVE_POLL_SECONDS = float(os.environ.get('LIVE_POLL_SECONDS', '2'))
+LIVE_HEARTBEAT_SECONDS = 15
+
+# Rendered PDF/XLSX reports (see reports.py); REPORT_DIR must be shared by all workers
+REPORT_DIR = os.environ.get('REPORT_DIR', str(ROOT_DIR / 'reports'))
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '2'))
+
+# Profiling Configuration (disabled unless a token or sample rate is set)
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+profile_store = ProfileStore(
+    os.environ.get('PROFILE_DIR', str(ROOT_DIR / 'profiles')),
+    max_profiles=int(os.environ.get('PROFILE_MAX_FILES', '50'))
+)
+
+# Response cache for per-organization read endpoints (in-process, or Redis shared by all workers)
+response_cache = make_response_cache(
+    os.environ.get('RESPONSE_CACHE_URL'),
+    max_entries=int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '1024')),
+    ttl_seconds=int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '3600'))
+)
+# The leaderboard spans all organizations, so no data version covers it: it is cached per period
+LEADERBOARD_CACHE_SECONDS = int(os.environ.get('LEADERBOARD_CACHE_SECONDS', '60'))
+
+# Columnar analytics tier (see columnar.py): Parquet snapshot exported by `python columnar.py`,
+# shared by all workers; unset keeps every analytic read on MongoDB
+ANALYTICS_PARQUET_DIR = os.environ.get('ANALYTICS_PARQUET_DIR')
+columnar_store = columnar.ColumnarStore(
+    ANALYTICS_PARQUET_DIR,
+    threads=int(os.environ['ANALYTICS_DUCKDB_THREADS']) if os.environ.get('ANALYTICS_DUCKDB_THREADS') else None,
+    memory_limit=os.environ.get('ANALYTICS_DUCKDB_MEMORY_LIMIT')
+) if ANALYTICS_PARQUET_DIR else None
+
+# Admission control for expensive routes (see admission.py): per-organization token
+# buckets (in-process, or Redis shared by all workers) and per-route concurrency limits
+admission = AdmissionController(
+    make_token_buckets(
+        os.environ.get('ADMISSION_REDIS_URL'),
+        rate=float(os.environ.get('ADMISSION_RATE_PER_SECOND', '0.5')),
+        burst=float(os.environ.get('ADMISSION_BURST', '30'))
+    ),
+    {
+        # route: tokens per request, requests running at once per worker
+        "insights/generate": RoutePolicy(cost=10, concurrency=4),
+        "energy/forecast": RoutePolicy(cost=5, concurrency=4),
+        "insights/report/export": RoutePolicy(cost=5, concurrency=4),
+        "emissions/uncertainty": RoutePolicy(cost=3, concurrency=4),
+        "planner/optimize": RoutePolicy(cost=3, concurrency=4),
+        "dashboard/leaderboard": RoutePolicy(cost=2, concurrency=8),
+    },
+    queue_budget=float(os.environ.get('ADMISSION_QUEUE_BUDGET_MS', '2000')) / 1000
+)
+
+# Peer benchmark sketches are rebuilt at most this often per month (see benchmarks.py)
+benchmark_sketches = benchmarks.BenchmarkSketches(
+    refresh_seconds=float(os.environ.get('BENCHMARK_REFRESH_SECONDS', '300'))
+)
+
+# Reporting Configuration (1 = January, 4 = April, ...)
+FISCAL_YEAR_START_MONTH = int(os.environ.get('FISCAL_YEAR_START_MONTH', '4'))
+
 # Create the main app
 app = FastAPI(title="EcoPulse NGO Sustainability Platform")
 
-# Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+# Create a router with the /api prefix (TimedRoute feeds the request metrics)
+api_router = APIRouter(prefix="/api", route_class=TimedRoute)
 
 # Security
 security = HTTPBearer()
 
-# ==================== EMISSION FACTORS (kg CO2) ====================
-EMISSION_FACTORS = {
-    # Travel (per km per passenger)
-    "travel": {
-        "petrol_car": 0.21,
-        "diesel_car": 0.27,
-        "electric_car": 0.05,
-        "hybrid_car": 0.12,
-        "motorcycle": 0.10,
-        "bus": 0.089,
-        "train": 0.041,
-        "flight_domestic": 0.255,
-        "flight_international": 0.195,
-        "bicycle": 0,
-        "walking": 0
-    },
-    # Events (per attendee per hour)
-    "events": {
-        "indoor_conference": 2.5,
-        "outdoor_event": 1.2,
-        "virtual_meeting": 0.05,
-        "workshop": 1.8,
-        "training_session": 1.5,
-        "fundraiser": 3.0,
-        "community_gathering": 1.0
-    },
-    # Infrastructure (per kWh)
-    "infrastructure": {
-        "electricity": 0.5,  # kg CO2 per kWh
-        "generator_diesel": 2.68,
-        "solar_panel": 0.02,
-        "air_conditioning": 0.8,  # additional factor per hour
-        "heating": 0.6,
-        "lighting": 0.4,
-        "computers": 0.3,
-        "servers": 0.5
-    },
-    # Marketing (per unit)
-    "marketing": {
-        "digital_campaign": 0.02,  # per impression
-        "email_marketing": 0.004,  # per email
-        "social_media_post": 0.01,
-        "printed_brochure": 0.05,  # per page
-        "printed_banner": 2.5,
-        "video_production": 50,  # per minute
-        "website_hosting": 0.3  # per day
-    },
-    # Office Operations (per unit)
-    "office": {
-        "phone_call": 0.01,  # per minute
-        "internet_usage": 0.05,  # per GB
-        "paper_usage": 0.005,  # per sheet
-        "courier_local": 1.5,  # per package
-        "courier_national": 5.0,
-        "courier_international": 15.0,
-        "water_consumption": 0.0003  # per liter
-    },
-    # Staff Welfare (per unit)
-    "staff_welfare": {
-        # Health & Wellness
-        "gym_membership": 5.0,  # per month per person
-        "health_checkup": 3.0,  # per checkup
-        "medical_insurance_admin": 1.0,  # per month per person
-        "wellness_program": 2.0,  # per session
-        # Recreation
-        "team_outing_local": 15.0,  # per person
-        "team_outing_travel": 50.0,  # per person
-        "staff_party": 8.0,  # per person
-        "gifts_physical": 2.0,  # per gift
-        "gifts_digital": 0.1,  # per gift
-        # Uniforms & Safety
-        "uniform_cotton": 10.0,  # per piece
-        "uniform_synthetic": 15.0,
-        "safety_equipment": 5.0,  # per item
-        "ppe_disposable": 0.5  # per item
-    }
-}
-
-# Trees saved factor (average tree absorbs ~22kg CO2 per year)
-TREES_ABSORPTION_RATE = 22  # kg CO2 per tree per year
-
 # ==================== PYDANTIC MODELS ====================
 
 class UserCreate(BaseModel):
@@ -242,6 +291,34 @@ class EnergyDataResponse(BaseModel):
     carbon_emission_kg: float
     notes: Optional[str]
     created_at: str
+    # z-scores of electricity_kwh / ac_hours against the org's baseline (see anomaly.py)
+    anomaly_z: Optional[Dict[str, float]] = None
+
+# Meter readings (up to one per minute, see energy_series.py)
+class EnergyReading(BaseModel):
+    timestamp: str
+    kwh: float
+    outdoor_temp_celsius: Optional[float] = None
+
+class EnergyReadingsBatch(BaseModel):
+    site_id: str = "main"
+    readings: List[EnergyReading] = Field(..., max_length=50000)
+
+# Anomaly alerts (see anomaly.py)
+class AlertResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    site_id: str
+    source: str
+    metric: str
+    timestamp: str
+    value: float
+    expected: float
+    z_score: float
+    direction: str
+    reference_id: Optional[str]
+    status: str
+    created_at: str
 
 # Goal Models
 class GoalCreate(BaseModel):
@@ -292,6 +369,24 @@ class LeaderboardEntry(BaseModel):
     reduction_percent: float
     rank: int
 
+# Investment planner (see portfolio.py)
+class Initiative(BaseModel):
+    id: str
+    name: Optional[str] = None
+    cost: float = Field(..., ge=0)
+    co2_t_per_year: float = 0
+    annual_savings: float = 0
+    lifetime_years: Optional[float] = Field(None, gt=0)
+    requires: List[str] = []
+
+class PortfolioRequest(BaseModel):
+    budget: float = Field(..., ge=0)
+    horizon_years: float = Field(5, gt=0, le=50)
+    objective: str = "co2"
+    carbon_price: float = 0
+    # Omitted: the default catalog
+    initiatives: Optional[List[Initiative]] = Field(None, max_length=500)
+
 # ==================== HELPER FUNCTIONS ====================
 
 def hash_password(password: str) -> str:
@@ -308,12 +403,25 @@ def create_token(user_id: str, org_id: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def create_stream_ticket(user_id: str, org_id: str) -> str:
+    """A short-lived token that only opens the live dashboard stream.
+
+    Unlike the access token it may appear in URLs (and so in access logs)."""
+    payload = {
+        "user_id": user_id,
+        "org_id": org_id,
+        "purpose": STREAM_TICKET_PURPOSE,
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=STREAM_TICKET_SECONDS)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def decode_token(token: str, purpose: Optional[str] = None) -> dict:
+    """Access token claims; with `purpose`, only a ticket issued for that purpose is accepted."""
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id = payload.get("user_id")
         org_id = payload.get("org_id")
-        if not user_id:
+        if not user_id or payload.get("purpose") != purpose:
             raise HTTPException(status_code=401, detail="Invalid token")
         return {"user_id": user_id, "org_id": org_id}
     except jwt.ExpiredSignatureError:
@@ -321,6 +429,44 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return decode_token(credentials.credentials)
+
+async def get_stream_user(request: Request, ticket: Optional[str] = None):
+    """Like `get_current_user`, but also accepts a stream ticket as `?ticket=`:
+    EventSource cannot send headers. Access tokens are never taken from the URL."""
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return decode_token(authorization[7:])
+    if not ticket:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return decode_token(ticket, purpose=STREAM_TICKET_PURPOSE)
+
+@asynccontextmanager
+async def admission_slot(route: str, org_id: str):
+    """Hold a slot of an expensive route once admission control lets the request in
+    (429 over the organization's rate, 503 when the route is overloaded)."""
+    try:
+        gate = await admission.admit(route, org_id, request_age())
+    except RateLimited as e:
+        ADMISSION_REJECTIONS.inc(route, "rate_limited")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": retry_after_header(e.retry_after)})
+    except Overloaded as e:
+        ADMISSION_REJECTIONS.inc(route, "overloaded")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": retry_after_header(e.retry_after)})
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        gate.release(time.perf_counter() - started)
+
+def admitted(route: str):
+    """Dependency for expensive routes that always do their work: the current user, inside `admission_slot`."""
+    async def dependency(current_user: dict = Depends(get_current_user)):
+        async with admission_slot(route, current_user["org_id"]):
+            yield current_user
+    return dependency
+
 def calculate_travel_emission(vehicle_type: str, distance_km: float, passengers: int) -> float:
     factor = EMISSION_FACTORS["travel"].get(vehicle_type, 0.21)
     return factor * distance_km / max(passengers, 1)
@@ -329,9 +475,9 @@ def calculate_event_emission(event_type: str, attendees: int, duration_hours: fl
     factor = EMISSION_FACTORS["events"].get(event_type, 1.5)
     base_emission = factor * attendees * duration_hours
     if has_catering:
-        base_emission += attendees * 2.5  # ~2.5 kg per meal
+        base_emission += attendees * EVENT_CATERING_KG
     if has_travel:
-        base_emission += attendees * 5  # estimated travel emission per attendee
+        base_emission += attendees * EVENT_TRAVEL_KG
     return base_emission
 
 def calculate_infrastructure_emission(equipment_type: str, usage_hours: float, power_rating_kw: float, quantity: int) -> float:
@@ -369,6 +515,202 @@ def calculate_sustainability_score(total_emissions: float, reduction_percent: fl
     score += min(goals_completed * 1, 5)
     return min(score, 100)
 
+# ==================== WINDOWED EMISSIONS QUERIES ====================
+# Windows are half-open [start, end) over the activity/energy `date` field
+# (ISO "YYYY-MM-DD" strings, so lexical order is chronological order).
+
+def rolling_window(days: int, end: Optional[datetime] = None) -> Dict[str, str]:
+    """Last `days` calendar days up to and including `end` (default: today, UTC)."""
+    end_day = (end or datetime.now(timezone.utc)).date()
+    start_day = end_day - timedelta(days=max(days, 1) - 1)
+    return {"start": start_day.isoformat(), "end": (end_day + timedelta(days=1)).isoformat()}
+
+def fiscal_year_window(fiscal_year: int, start_month: int = FISCAL_YEAR_START_MONTH) -> Dict[str, str]:
+    """Fiscal year named after the calendar year it starts in (FY2025 = Apr 2025 - Mar 2026 by default)."""
+    return {
+        "start": f"{fiscal_year:04d}-{start_month:02d}-01",
+        "end": f"{fiscal_year + 1:04d}-{start_month:02d}-01"
+    }
+
+async def _sum_emissions_in_window(collection, org_id: str, start: str, end: str) -> Dict[str, float]:
+    pipeline = [
+        {"$match": {"organization_id": org_id, "date": {"$gte": start, "$lt": end}}},
+        {"$group": {"_id": None, "emissions": {"$sum": "$carbon_emission_kg"}, "count": {"$sum": 1}}}
+    ]
+    result = await collection.aggregate(pipeline).to_list(1)
+    if not result:
+        return {"emissions": 0.0, "count": 0}
+    return {"emissions": result[0]["emissions"], "count": result[0]["count"]}
+
+async def emissions_in_window(
+    org_id: str, start: str, end: str, include_energy: bool = True, database=None
+) -> Dict[str, Any]:
+    """Server-side sum of an organization's emissions for the window [start, end)."""
+    database = db if database is None else database
+    activity = await _sum_emissions_in_window(database.activities, org_id, start, end)
+    archived = await cold_storage.archived_summary(database, org_id, start, end)
+    activity = {"emissions": activity["emissions"] + archived["emissions"], "count": activity["count"] + archived["count"]}
+    energy = {"emissions": 0.0, "count": 0}
+    if include_energy:
+        energy = await _sum_emissions_in_window(database.energy_data, org_id, start, end)
+    return {
+        "start": start,
+        "end": end,
+        "activity_emissions_kg": activity["emissions"],
+        "energy_emissions_kg": energy["emissions"],
+        "total_emissions_kg": activity["emissions"] + energy["emissions"],
+        "activity_count": activity["count"],
+        "energy_data_points": energy["count"]
+    }
+
+async def create_indexes(database=None):
+    database = db if database is None else database
+    # (organization_id, date) drives every windowed query; carrying carbon_emission_kg
+    # in the key lets the $match/$group above be answered from the index alone.
+    for collection in (database.activities, database.energy_data):
+        await collection.create_index(
+            [("organization_id", 1), ("date", 1), ("carbon_emission_kg", 1)],
+            name="org_date_emissions"
+        )
+    # Activity search (activity_search.py): the text index, and newest-first pages without a query.
+    # A collection has one text index, so the one over the details fields goes first.
+    if OLD_TEXT_INDEX_NAME in await database.activities.index_information():
+        await database.activities.drop_index(OLD_TEXT_INDEX_NAME)
+    await database.activities.create_index(
+        TEXT_INDEX, weights=TEXT_WEIGHTS, default_language="english", name=TEXT_INDEX_NAME
+    )
+    await database.activities.create_index([("organization_id", 1), ("date", 1), ("id", 1)], name="org_date_id")
+    await database.activities.create_index(
+        [("organization_id", 1), ("activity_category", 1), ("date", 1), ("id", 1)], name="org_category_date_id"
+    )
+    # Freshness check for precomputed forecasts
+    await database.energy_data.create_index([("organization_id", 1), ("created_at", -1)], name="org_created_at")
+    await database.forecasts.create_index("organization_id", unique=True, name="org_unique")
+    # One bucket per site-day and one rollup per site-month
+    await database.energy_buckets.create_index(
+        [("organization_id", 1), ("site_id", 1), ("day", 1)], unique=True, name="org_site_day"
+    )
+    await database.energy_buckets.create_index(
+        [("organization_id", 1), ("site_id", 1), ("month", 1)], name="org_site_month"
+    )
+    await database.energy_monthly.create_index(
+        [("organization_id", 1), ("site_id", 1), ("month", 1)], unique=True, name="org_site_month"
+    )
+    # Anomaly detector state, and at most one alert per reading and metric
+    await database.anomaly_state.create_index(
+        [("organization_id", 1), ("site_id", 1), ("source", 1), ("metric", 1)], unique=True, name="org_site_metric"
+    )
+    await database.alerts.create_index(
+        [("organization_id", 1), ("site_id", 1), ("source", 1), ("metric", 1), ("timestamp", 1)],
+        unique=True, name="reading_unique"
+    )
+    await database.alerts.create_index([("organization_id", 1), ("status", 1), ("timestamp", -1)], name="org_status_ts")
+    # Peer benchmark values per org-month-category, and per-month versions and sketches
+    await database.benchmark_values.create_index(
+        [("organization_id", 1), ("month", 1), ("category", 1)], unique=True, name="org_month_category"
+    )
+    await database.benchmark_values.create_index([("month", 1), ("category", 1)], name="month_category")
+    await database.benchmark_months.create_index("month", unique=True, name="month_unique")
+    await database.benchmark_sketches.create_index("month", unique=True, name="month_unique")
+    # One rendering job per report artifact (org, data version, format, period)
+    await database.report_jobs.create_index("id", unique=True, name="id_unique")
+    await database.report_jobs.create_index(
+        [("organization_id", 1), ("format", 1), ("start", 1), ("end", 1), ("data_version", 1)], name="org_report_version"
+    )
+    # Cold storage: one rollup document per archived org-month, its compressed parts by generation
+    await database.activity_archive.create_index(
+        [("organization_id", 1), ("month", 1)], unique=True, name="org_month_unique"
+    )
+    await database.activity_archive_parts.create_index(
+        [("organization_id", 1), ("month", 1), ("generation", 1), ("part", 1)], unique=True, name="org_month_part"
+    )
+    # Parquet snapshot partitions and the ones awaiting export
+    await database.analytics_partitions.create_index(
+        [("organization_id", 1), ("collection", 1), ("month", 1)], unique=True, name="org_collection_month"
+    )
+    await database.analytics_partitions.create_index("dirty", name="dirty")
+
+# ==================== RESPONSE CACHING ====================
+
+async def bump_data_version(org_id: str, event: Optional[str] = None, data: Any = None):
+    """Call after every activity, energy or goal mutation of an organization.
+
+    `event` and `data` describe the change to live dashboard subscribers, peer
+    benchmarks and the Parquet snapshot.
+    """
+    if columnar_store is not None:
+        # Before the version moves, so an export that sees the version sees the dirty partition
+        await columnar.mark_dirty(db, org_id, event, data)
+    await db.organizations.update_one({"id": org_id}, {"$inc": {"data_version": 1}})
+    try:
+        await benchmarks.record_event(db, org_id, event, data)
+    except Exception as e:
+        # The write already succeeded; `python benchmarks.py` repairs the values
+        logger.error(f"Benchmark update for {org_id} ({event}) failed: {e}")
+    live_dashboard.notify(org_id, event, data)
+
+async def get_data_version(org_id: str) -> int:
+    org = await db.organizations.find_one({"id": org_id}, {"_id": 0, "data_version": 1})
+    return (org or {}).get("data_version", 0)
+
+async def analytics_source(org_id: str):
+    """`analytics_db`, with every read waiting until its replica has applied the org's latest write.
+
+    The org is read on the primary in a causally consistent session, and later
+    reads carry that read's operationTime (see causal_reads.py). Anything
+    computed from them includes every write that preceded the call, so
+    responses cached under the data_version read before it are never stale.
+    """
+    if analytics_db is db:
+        return db
+    async with await client.start_session(causal_consistency=True) as session:
+        await db.organizations.find_one({"id": org_id}, {"_id": 1}, session=session)
+        if session.operation_time is None:
+            # Standalone server: no replicas to lag behind
+            return analytics_db
+        return CausalDatabase(analytics_db, session.cluster_time, session.operation_time)
+
+async def load_org_summary(database, org_id: str, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    """`org_summary`, from the Parquet snapshot when it includes the org's latest writes."""
+    if columnar_store is not None and await columnar_store.covers(database, org_id):
+        return await columnar_store.org_summary(database, org_id, start, end)
+    return await org_summary(database, org_id, start, end)
+
+def _json_response(body: bytes, etag: str, status_code: int = 200) -> Response:
+    return Response(
+        content=body if status_code != 304 else None,
+        status_code=status_code,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+    )
+
+async def cached_response(request: Request, key: Tuple, compute, admit: Optional[Tuple[str, str]] = None) -> Response:
+    """Serve `await compute()` under an ETag of `key`, from the response cache while it has it.
+
+    `admit`: (route, org_id) of an expensive route. Only a cache miss goes through
+    `admission_slot`; 304s and cache hits cost no tokens.
+    """
+    etag = make_etag(*key)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return _json_response(b"", etag, status_code=304)
+
+    cache_key = ":".join(str(part) for part in key)
+    body = await response_cache.get(cache_key)
+    if body is None:
+        async with admission_slot(*admit) if admit else nullcontext():
+            body = json_dumps(jsonable_encoder(await compute()))
+        await response_cache.set(cache_key, body)
+    return _json_response(body, etag)
+
+async def cached_org_response(request: Request, org_id: str, route: str, compute, admit: bool = False) -> Response:
+    """Serve `await compute(database)` for an organization, reusing it until the org's data changes."""
+    version = await get_data_version(org_id)
+
+    async def computed():
+        return await compute(await analytics_source(org_id))
+
+    return await cached_response(request, (route, org_id, version), computed, (route, org_id) if admit else None)
+
 # ==================== AUTH ENDPOINTS ====================
 
 @api_router.post("/auth/register", response_model=TokenResponse)
@@ -442,6 +784,17 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 
 # ==================== ACTIVITY ENDPOINTS ====================
 
+ACTIVITY_EVENT_FIELDS = ("id", "activity_category", "activity_type", "description", "date", "carbon_emission_kg")
+
+def activity_event(activity_doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: activity_doc[k] for k in ACTIVITY_EVENT_FIELDS}
+
+async def store_activity(activity_doc: Dict[str, Any]) -> ActivityResponse:
+    activity_doc["search_text"] = search_text(activity_doc["details"])
+    await db.activities.insert_one(activity_doc)
+    await bump_data_version(activity_doc["organization_id"], "activity_created", activity_event(activity_doc))
+    return ActivityResponse(**{k: v for k, v in activity_doc.items() if k != "_id"})
+
 @api_router.post("/activities/travel", response_model=ActivityResponse)
 async def create_travel_activity(data: TravelActivityCreate, current_user: dict = Depends(get_current_user)):
     carbon_emission = calculate_travel_emission(data.vehicle_type, data.distance_km, data.passengers)
@@ -464,8 +817,7 @@ async def create_travel_activity(data: TravelActivityCreate, current_user: dict
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": current_user["user_id"]
     }
-    await db.activities.insert_one(activity_doc)
-    return ActivityResponse(**{k: v for k, v in activity_doc.items() if k != "_id"})
+    return await store_activity(activity_doc)
 
 @api_router.post("/activities/events", response_model=ActivityResponse)
 async def create_event_activity(data: EventActivityCreate, current_user: dict = Depends(get_current_user)):
@@ -493,8 +845,7 @@ async def create_event_activity(data: EventActivityCreate, current_user: dict =
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": current_user["user_id"]
     }
-    await db.activities.insert_one(activity_doc)
-    return ActivityResponse(**{k: v for k, v in activity_doc.items() if k != "_id"})
+    return await store_activity(activity_doc)
 
 @api_router.post("/activities/infrastructure", response_model=ActivityResponse)
 async def create_infrastructure_activity(data: InfrastructureActivityCreate, current_user: dict = Depends(get_current_user)):
@@ -521,8 +872,7 @@ async def create_infrastructure_activity(data: InfrastructureActivityCreate, cur
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": current_user["user_id"]
     }
-    await db.activities.insert_one(activity_doc)
-    return ActivityResponse(**{k: v for k, v in activity_doc.items() if k != "_id"})
+    return await store_activity(activity_doc)
 
 @api_router.post("/activities/marketing", response_model=ActivityResponse)
 async def create_marketing_activity(data: MarketingActivityCreate, current_user: dict = Depends(get_current_user)):
@@ -546,8 +896,7 @@ async def create_marketing_activity(data: MarketingActivityCreate, current_user:
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": current_user["user_id"]
     }
-    await db.activities.insert_one(activity_doc)
-    return ActivityResponse(**{k: v for k, v in activity_doc.items() if k != "_id"})
+    return await store_activity(activity_doc)
 
 @api_router.post("/activities/office", response_model=ActivityResponse)
 async def create_office_activity(data: OfficeActivityCreate, current_user: dict = Depends(get_current_user)):
@@ -570,8 +919,7 @@ async def create_office_activity(data: OfficeActivityCreate, current_user: dict
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": current_user["user_id"]
     }
-    await db.activities.insert_one(activity_doc)
-    return ActivityResponse(**{k: v for k, v in activity_doc.items() if k != "_id"})
+    return await store_activity(activity_doc)
 
 @api_router.post("/activities/staff-welfare", response_model=ActivityResponse)
 async def create_staff_welfare_activity(data: StaffWelfareActivityCreate, current_user: dict = Depends(get_current_user)):
@@ -595,8 +943,7 @@ async def create_staff_welfare_activity(data: StaffWelfareActivityCreate, curren
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": current_user["user_id"]
     }
-    await db.activities.insert_one(activity_doc)
-    return ActivityResponse(**{k: v for k, v in activity_doc.items() if k != "_id"})
+    return await store_activity(activity_doc)
 
 @api_router.get("/activities", response_model=List[ActivityResponse])
 async def get_activities(
@@ -608,21 +955,71 @@ async def get_activities(
     if category:
         query["activity_category"] = category
     
-    activities = await db.activities.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
-    return [ActivityResponse(**a) for a in activities]
+    activities = await db.activities.find(
+        query, projection(ActivityResponse)
+    ).sort("created_at", -1).limit(limit).to_list(limit)
+    if len(activities) < limit:
+        # Older history continues in cold storage, newest month first
+        fields = projection(ActivityResponse)
+        async for row in cold_storage.iter_rows(db, current_user["org_id"], newest_first=True):
+            if category and row["activity_category"] != category:
+                continue
+            activities.append({k: row.get(k) for k in fields if k != "_id"})
+            if len(activities) >= limit:
+                break
+    return json_response(activities)
+
+@api_router.get("/activities/search")
+async def search_activities_endpoint(
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Activities matching `q` in their description or details, best first, dated in
+    [start, end). Pass `next_cursor` back as `cursor` for the next page."""
+    try:
+        page = await search_activities(
+            db, current_user["org_id"], projection(ActivityResponse), q, category, start, end, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(page)
 
 @api_router.delete("/activities/{activity_id}")
 async def delete_activity(activity_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.activities.delete_one({
-        "id": activity_id,
-        "organization_id": current_user["org_id"]
-    })
-    if result.deleted_count == 0:
+    deleted = await db.activities.find_one_and_delete(
+        # Rows claimed by a cold storage move are already on their way to the archive
+        {"id": activity_id, "organization_id": current_user["org_id"], "archiving": {"$exists": False}},
+        projection={"_id": 0, **{k: 1 for k in ACTIVITY_EVENT_FIELDS}}
+    )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Activity not found")
+    await bump_data_version(current_user["org_id"], "activity_deleted", activity_event(deleted))
     return {"message": "Activity deleted"}
 
 # ==================== ENERGY ENDPOINTS ====================
 
+async def score_energy_entry(org_id: str, energy_doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Score a daily entry against the org's baseline, setting `anomaly_z` on it; returns new alerts.
+
+    Detection problems are logged, never allowed to fail the write.
+    """
+    try:
+        ts = datetime.fromisoformat(energy_doc["date"][:10])
+        scores, alerts = await anomaly.detect(db, org_id, "main", "energy_data", [(
+            ts, {"electricity_kwh": energy_doc["electricity_kwh"], "ac_hours": energy_doc["ac_hours"]}, energy_doc["id"]
+        )])
+    except Exception as e:
+        logger.error(f"Anomaly scoring for {org_id} failed: {e}")
+        return []
+    if scores:
+        energy_doc["anomaly_z"] = scores[ts.isoformat()]
+    return alerts
+
 @api_router.post("/energy", response_model=EnergyDataResponse)
 async def create_energy_data(data: EnergyDataCreate, current_user: dict = Depends(get_current_user)):
     # Calculate carbon emission from electricity
@@ -642,110 +1039,236 @@ async def create_energy_data(data: EnergyDataCreate, current_user: dict = Depend
         "notes": data.notes,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
+    alerts = await score_energy_entry(current_user["org_id"], energy_doc)
     await db.energy_data.insert_one(energy_doc)
+    await bump_data_version(current_user["org_id"], "energy_created", {
+        k: energy_doc[k] for k in ("id", "date", "electricity_kwh", "num_people", "carbon_emission_kg")
+    })
+    for alert in alerts:
+        live_dashboard.publish(current_user["org_id"], "alert_created", alert)
     return EnergyDataResponse(**{k: v for k, v in energy_doc.items() if k != "_id"})
 
+@api_router.post("/energy/readings")
+async def create_energy_readings(batch: EnergyReadingsBatch, current_user: dict = Depends(get_current_user)):
+    try:
+        stored = await ingest_readings(
+            db, current_user["org_id"], batch.site_id, [r.model_dump() for r in batch.readings],
+            lambda alert: live_dashboard.publish(current_user["org_id"], "alert_created", alert)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid reading timestamp: {e}")
+    return {"site_id": batch.site_id, **stored}
+
+meter_buffer = None
+
+async def get_meter_buffer():
+    global meter_buffer
+    module = await meter_ingest.load()
+    if meter_buffer is None:
+        meter_buffer = module.MeterIngestBuffer(
+            db, max_batch=METER_FLUSH_BATCH, max_pending=METER_MAX_PENDING, flush_interval=METER_FLUSH_INTERVAL_SECONDS,
+            on_alert=lambda org_id, alert: live_dashboard.publish(org_id, "alert_created", alert)
+        )
+    return module, meter_buffer
+
+@api_router.post("/energy/readings/stream")
+async def stream_energy_readings(request: Request, flush: bool = False, current_user: dict = Depends(get_current_user)):
+    """NDJSON meter feed, one {"timestamp", "kwh", "outdoor_temp_celsius"?, "site_id"?} object per line.
+
+    Readings are acknowledged once buffered; pass `flush=true` to wait until they are stored.
+    """
+    module, buffer = await get_meter_buffer()
+    summary = {"accepted": 0, "rejected": 0, "carbon_emission_kg": 0.0, "errors": []}
+    next_line = 1
+    
+    async def submit(lines: List[bytes]):
+        nonlocal next_line
+        batch = module.parse_ndjson(lines, first_line=next_line)
+        next_line += len(lines)
+        await buffer.add(current_user["org_id"], batch)
+        summary["accepted"] += len(batch["kwh"])
+        summary["rejected"] += batch["rejected"]
+        summary["carbon_emission_kg"] += float(batch["carbon_kg"].sum())
+        summary["errors"].extend(batch["errors"][:module.MAX_ERRORS_REPORTED - len(summary["errors"])])
+    
+    pending: List[bytes] = []
+    tail = b""
+    try:
+        async for data in request.stream():
+            lines = (tail + data).split(b"\n")
+            tail = lines.pop()
+            pending.extend(lines)
+            if len(pending) >= METER_CHUNK_LINES:
+                await submit(pending)
+                pending = []
+        if tail:
+            pending.append(tail)
+        if pending:
+            await submit(pending)
+    except module.IngestOverloaded as e:
+        # Everything counted in `accepted` is buffered; the client resends the rest
+        summary["carbon_emission_kg"] = round(summary["carbon_emission_kg"], 4)
+        return JSONResponse(
+            {"detail": f"Ingestion is overloaded: {e}", **summary}, status_code=503, headers={"Retry-After": "5"}
+        )
+    
+    if flush:
+        await buffer.flush()
+    summary["carbon_emission_kg"] = round(summary["carbon_emission_kg"], 4)
+    return {**summary, "stored": flush}
+
+@api_router.get("/energy/series")
+async def get_energy_series_endpoint(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    resolution: str = "auto",
+    site_id: str = "main",
+    current_user: dict = Depends(get_current_user)
+):
+    """Meter readings in [start, end), default the last 7 days; resolution raw, hourly, daily, monthly or auto."""
+    try:
+        end_ts = parse_timestamp(end) if end else datetime.now(timezone.utc).replace(tzinfo=None)
+        start_ts = parse_timestamp(start) if start else end_ts - timedelta(days=7)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be ISO dates or timestamps")
+    if start_ts >= end_ts:
+        raise HTTPException(status_code=400, detail="Window start must be before end")
+    try:
+        series = await get_energy_series(analytics_db, current_user["org_id"], site_id, start_ts, end_ts, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response({"site_id": site_id, "start": start_ts.isoformat(), "end": end_ts.isoformat(), **series})
+
 @api_router.get("/energy", response_model=List[EnergyDataResponse])
 async def get_energy_data(limit: int = 365, current_user: dict = Depends(get_current_user)):
     data = await db.energy_data.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
+        {"organization_id": current_user["org_id"]}, projection(EnergyDataResponse)
     ).sort("date", -1).limit(limit).to_list(limit)
-    return [EnergyDataResponse(**d) for d in data]
+    return json_response(data)
 
 @api_router.get("/energy/forecast")
-async def get_energy_forecast(current_user: dict = Depends(get_current_user)):
-    # Get historical energy data
-    energy_data = await db.energy_data.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).sort("date", -1).limit(365).to_list(365)
+async def get_energy_forecast(current_user: dict = Depends(admitted("energy/forecast"))):
+    org_id = current_user["org_id"]
+    latest = await db.energy_data.find_one(
+        {"organization_id": org_id}, {"_id": 0, "created_at": 1}, sort=[("created_at", -1)]
+    )
     
-    if len(energy_data) < 3:
-        return {
-            "message": "Need at least 3 data points for forecasting",
-            "forecast": None,
-            "sufficient_data": False
-        }
+    # Serve the precomputed forecast (see forecast_batch.py) while no newer readings exist
+    # (forecasts stored without a sufficient_data flag predate it and are recomputed)
+    stored = await db.forecasts.find_one({"organization_id": org_id}, {"_id": 0}) if latest else None
+    if stored and stored["data_updated_at"] >= latest["created_at"] and "sufficient_data" in stored["result"]:
+        result = stored["result"]
+    else:
+        forecasting_module = await forecasting.load()
+        batch_module = await forecast_batch.load()
+        
+        # Get historical energy data (only the columns the model reads)
+        energy_data = await db.energy_data.find(
+            {"organization_id": org_id},
+            {"_id": 0, "date": 1, "electricity_kwh": 1, **{d: 1 for d in forecasting_module.DRIVERS}}
+        ).sort("date", -1).limit(365).to_list(365)
+        
+        if len(energy_data) < 3:
+            return {
+                "message": "Need at least 3 data points for forecasting",
+                "forecast": None,
+                "sufficient_data": False
+            }
+        
+        # Deterministic statistical forecast; the LLM only writes the recommendations
+        result = forecasting_module.forecast_energy(energy_data)
+        await db.forecasts.replace_one(
+            {"organization_id": org_id},
+            batch_module.forecast_document(org_id, result, latest["created_at"]),
+            upsert=True
+        )
     
-    # Simple forecasting based on averages and trends
-    total_kwh = sum(d["electricity_kwh"] for d in energy_data)
-    avg_kwh = total_kwh / len(energy_data)
-    avg_people = sum(d["num_people"] for d in energy_data) / len(energy_data)
-    avg_systems = sum(d["num_systems"] for d in energy_data) / len(energy_data)
-    avg_ac = sum(d["ac_hours"] for d in energy_data) / len(energy_data)
-    avg_temp = sum(d["outdoor_temp_celsius"] for d in energy_data) / len(energy_data)
+    factors = result["factors"]
+    forecast = {
+        "monthly_forecast_kwh": result["monthly_forecast_kwh"],
+        "confidence": result["confidence"],
+        "interval_80": result["interval_80"],
+        "interval_95": result["interval_95"],
+        "horizon_days": result["horizon_days"],
+        "horizon_start": result["horizon_start"],
+        "daily_forecast_kwh": result["daily_forecast_kwh"],
+        "model": result["model"],
+        "recommendations": (
+            [] if result["sufficient_data"] else ["Add more data points for accurate forecasting"]
+        ) + [
+            "Track AC usage patterns",
+            "Monitor occupancy trends"
+        ]
+    }
     
-    # Generate AI-powered forecast using GPT-5.2
     if EMERGENT_LLM_KEY:
         try:
-            chat = LlmChat(
+            chat_module = await llm_chat.load()
+            chat = chat_module.LlmChat(
                 api_key=EMERGENT_LLM_KEY,
                 session_id=f"forecast-{current_user['org_id']}-{datetime.now().strftime('%Y%m%d')}",
-                system_message="You are an energy forecasting expert for NGOs. Provide concise, actionable forecasts."
+                system_message="You are an energy forecasting expert for NGOs. Provide concise, actionable recommendations."
             ).with_model("openai", "gpt-5.2")
             
-            prompt = f"""Based on the following historical data for an NGO:
-- Average daily electricity: {avg_kwh:.2f} kWh
-- Average occupancy: {avg_people:.0f} people
-- Average systems running: {avg_systems:.0f}
-- Average AC usage: {avg_ac:.1f} hours/day
-- Average outdoor temp: {avg_temp:.1f}°C
-- Total data points: {len(energy_data)}
-
-Provide a brief forecast for the next month's energy consumption and 3 specific recommendations to reduce energy usage. Format as JSON with keys: 'monthly_forecast_kwh', 'confidence', 'recommendations' (array of strings)."""
-
-            response = await chat.send_message(UserMessage(text=prompt))
-            
-            import json
+            effects = result["model"]["driver_effects"]
+            prompt = f"""Based on the following energy data for an NGO:
+- Average daily electricity: {result['historical_average_kwh']:.2f} kWh
+- Average occupancy: {factors['avg_people']:.0f} people
+- Average systems running: {factors['avg_systems']:.0f}
+- Average AC usage: {factors['avg_ac_hours']:.1f} hours/day
+- Average outdoor temp: {factors['avg_temp_celsius']:.1f}°C
+- Forecast for the next {result['horizon_days']} days: {result['monthly_forecast_kwh']:.0f} kWh (95% interval {result['interval_95'][0]:.0f}-{result['interval_95'][1]:.0f} kWh)
+- Estimated kWh/day per extra AC hour: {effects['ac_hours']:.2f}, per extra person: {effects['num_people']:.2f}, per extra system: {effects['num_systems']:.2f}
+
+Provide 3 specific recommendations to reduce energy usage. Return as a JSON array of strings."""
+
+            with llm_timer():
+                response = await chat.send_message(chat_module.UserMessage(text=prompt))
             try:
-                forecast_data = json.loads(response)
-            except:
-                forecast_data = {
-                    "monthly_forecast_kwh": avg_kwh * 30,
-                    "confidence": "medium",
-                    "recommendations": [
-                        "Optimize AC usage during peak hours",
-                        "Implement smart lighting systems",
-                        "Schedule equipment shutdown during off-hours"
-                    ]
-                }
-            
-            return {
-                "historical_average_kwh": round(avg_kwh, 2),
-                "forecast": forecast_data,
-                "factors": {
-                    "avg_people": round(avg_people, 1),
-                    "avg_systems": round(avg_systems, 1),
-                    "avg_ac_hours": round(avg_ac, 1),
-                    "avg_temp_celsius": round(avg_temp, 1)
-                },
-                "sufficient_data": True,
-                "data_points": len(energy_data)
-            }
+                recommendations = json.loads(response)
+                if isinstance(recommendations, list) and recommendations:
+                    forecast["recommendations"] = [str(r) for r in recommendations]
+            except ValueError:
+                pass
         except Exception as e:
             logging.error(f"AI forecast error: {e}")
     
-    # Fallback simple forecast
     return {
-        "historical_average_kwh": round(avg_kwh, 2),
-        "forecast": {
-            "monthly_forecast_kwh": round(avg_kwh * 30, 2),
-            "confidence": "low",
-            "recommendations": [
-                "Add more data points for accurate forecasting",
-                "Track AC usage patterns",
-                "Monitor occupancy trends"
-            ]
-        },
-        "factors": {
-            "avg_people": round(avg_people, 1),
-            "avg_systems": round(avg_systems, 1),
-            "avg_ac_hours": round(avg_ac, 1),
-            "avg_temp_celsius": round(avg_temp, 1)
-        },
-        "sufficient_data": len(energy_data) >= 12,
-        "data_points": len(energy_data)
+        **({} if result["sufficient_data"] else {"message": "Need at least 12 data points for a reliable forecast"}),
+        "historical_average_kwh": result["historical_average_kwh"],
+        "forecast": forecast,
+        "factors": factors,
+        "sufficient_data": result["sufficient_data"],
+        "data_points": result["data_points"]
     }
 
+# ==================== ALERTS ENDPOINTS ====================
+
+@api_router.get("/alerts", response_model=List[AlertResponse])
+async def get_alerts(
+    status: Optional[str] = "open",
+    limit: int = 100,
+    current_user: dict = Depends(get_current_user)
+):
+    query = {"organization_id": current_user["org_id"]}
+    if status:
+        query["status"] = status
+    alerts = await db.alerts.find(
+        query, projection(AlertResponse)
+    ).sort("timestamp", -1).limit(limit).to_list(limit)
+    return json_response(alerts)
+
+@api_router.post("/alerts/{alert_id}/acknowledge")
+async def acknowledge_alert(alert_id: str, current_user: dict = Depends(get_current_user)):
+    result = await db.alerts.update_one(
+        {"id": alert_id, "organization_id": current_user["org_id"]},
+        {"$set": {"status": "acknowledged", "acknowledged_by": current_user["user_id"],
+                  "acknowledged_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return {"message": "Alert acknowledged"}
+
 # ==================== GOALS ENDPOINTS ====================
 
 @api_router.post("/goals", response_model=GoalResponse)
@@ -753,13 +1276,12 @@ async def create_goal(data: GoalCreate, current_user: dict = Depends(get_current
     # Calculate baseline if not provided
     baseline = data.baseline_emissions_kg
     if not baseline:
-        # Get total emissions from last 30 days
-        thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).isoformat()
-        activities = await db.activities.find({
-            "organization_id": current_user["org_id"],
-            "created_at": {"$gte": thirty_days_ago}
-        }, {"_id": 0}).to_list(1000)
-        baseline = sum(a.get("carbon_emission_kg", 0) for a in activities)
+        # Total activity emissions dated within the last 30 days
+        window = rolling_window(30)
+        totals = await emissions_in_window(
+            current_user["org_id"], window["start"], window["end"], include_energy=False
+        )
+        baseline = round(totals["activity_emissions_kg"], 2)
         if baseline == 0:
             baseline = 1000  # Default baseline
     
@@ -778,25 +1300,32 @@ async def create_goal(data: GoalCreate, current_user: dict = Depends(get_current
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.goals.insert_one(goal_doc)
+    await bump_data_version(current_user["org_id"], "goal_created", {
+        k: goal_doc[k] for k in ("id", "title", "target_reduction_percent", "target_date")
+    })
     return GoalResponse(**{k: v for k, v in goal_doc.items() if k != "_id"})
 
 @api_router.get("/goals", response_model=List[GoalResponse])
 async def get_goals(current_user: dict = Depends(get_current_user)):
-    goals = await db.goals.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
+    return json_response(await compute_goal_progress(current_user["org_id"]))
+
+async def compute_goal_progress(org_id: str, database=None) -> List[Dict[str, Any]]:
+    database = db if database is None else database
+    goals = await database.goals.find(
+        {"organization_id": org_id}, projection(GoalResponse)
     ).sort("created_at", -1).to_list(100)
     
-    # Fetch all activities once to avoid N+1 query problem
-    all_activities = await db.activities.find({
-        "organization_id": current_user["org_id"]
-    }, {"_id": 0, "carbon_emission_kg": 1, "created_at": 1}).to_list(10000)
+    # Activity emissions dated from the goal's creation through today, the same
+    # measure (and service) as the baseline
+    end = rolling_window(1)["end"]
+    totals = await asyncio.gather(*(
+        emissions_in_window(org_id, goal["created_at"][:10], end, include_energy=False, database=database)
+        for goal in goals
+    ))
     
     # Update current emissions and progress for each goal
-    for goal in goals:
-        # Filter activities in memory instead of querying for each goal
-        goal_activities = [a for a in all_activities if a.get("created_at", "") >= goal["created_at"]]
-        
-        current = sum(a.get("carbon_emission_kg", 0) for a in goal_activities)
+    for goal, window in zip(goals, totals):
+        current = window["activity_emissions_kg"]
         goal["current_emissions_kg"] = current
         
         if goal["baseline_emissions_kg"] > 0:
@@ -806,7 +1335,7 @@ async def get_goals(current_user: dict = Depends(get_current_user)):
         if goal["progress_percent"] >= 100:
             goal["status"] = "completed"
     
-    return [GoalResponse(**g) for g in goals]
+    return goals
 
 @api_router.delete("/goals/{goal_id}")
 async def delete_goal(goal_id: str, current_user: dict = Depends(get_current_user)):
@@ -816,50 +1345,32 @@ async def delete_goal(goal_id: str, current_user: dict = Depends(get_current_use
     })
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Goal not found")
+    await bump_data_version(current_user["org_id"], "goal_deleted", {"id": goal_id})
     return {"message": "Goal deleted"}
 
 # ==================== INSIGHTS ENDPOINTS ====================
 
 @api_router.get("/insights/generate")
-async def generate_insights(current_user: dict = Depends(get_current_user)):
-    # Gather data
-    activities = await db.activities.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).to_list(1000)
-    
-    energy_data = await db.energy_data.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).to_list(365)
-    
-    goals = await db.goals.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).to_list(100)
+async def generate_insights(current_user: dict = Depends(admitted("insights/generate"))):
+    # Gather data (one projected aggregation per collection)
+    database = await analytics_source(current_user["org_id"])
+    summary = await load_org_summary(database, current_user["org_id"])
+    activity, energy, goals = summary["activity"], summary["energy"], summary["goals"]
     
     # Calculate metrics
-    total_emissions = sum(a.get("carbon_emission_kg", 0) for a in activities)
-    total_energy_emissions = sum(e.get("carbon_emission_kg", 0) for e in energy_data)
+    total_emissions = activity["emissions"]
+    total_energy_emissions = energy["emissions"]
     combined_emissions = total_emissions + total_energy_emissions
     
     # Emissions by category
-    by_category = {}
-    for a in activities:
-        cat = a.get("activity_category", "other")
-        by_category[cat] = by_category.get(cat, 0) + a.get("carbon_emission_kg", 0)
+    by_category = activity["by_category"]
     
     # Trees saved equivalent
     trees_saved = combined_emissions / TREES_ABSORPTION_RATE if combined_emissions > 0 else 0
     
-    # Calculate sustainability score
-    completed_goals = len([g for g in goals if g.get("status") == "completed"])
-    reduction_percent = 0
-    if len(activities) > 30:
-        recent = [a for a in activities[:30]]
-        older = [a for a in activities[30:60]] if len(activities) > 60 else []
-        if older:
-            recent_total = sum(a.get("carbon_emission_kg", 0) for a in recent)
-            older_total = sum(a.get("carbon_emission_kg", 0) for a in older)
-            if older_total > 0:
-                reduction_percent = ((older_total - recent_total) / older_total) * 100
+    # Calculate sustainability score (newest 30 activities vs the 30 before)
+    completed_goals = goals["completed"]
+    reduction_percent = activity_reduction_percent(activity, 30)
     
     sustainability_score = calculate_sustainability_score(combined_emissions, reduction_percent, completed_goals)
     
@@ -878,14 +1389,15 @@ async def generate_insights(current_user: dict = Depends(get_current_user)):
         risk_factors.append(f"Heavy reliance on {top_category[0]} activities")
     
     # ROI calculation (estimated)
-    total_cost = sum(a.get("cost", 0) or 0 for a in activities)
+    total_cost = activity["cost"]
     cost_per_kg = total_cost / combined_emissions if combined_emissions > 0 else 0
     
     # Generate AI recommendations
     recommendations = []
-    if EMERGENT_LLM_KEY and activities:
+    if EMERGENT_LLM_KEY and activity["count"]:
         try:
-            chat = LlmChat(
+            chat_module = await llm_chat.load()
+            chat = chat_module.LlmChat(
                 api_key=EMERGENT_LLM_KEY,
                 session_id=f"insights-{current_user['org_id']}-{datetime.now().strftime('%Y%m%d%H')}",
                 system_message="You are a sustainability expert for NGOs. Provide actionable, cost-effective recommendations."
@@ -896,15 +1408,15 @@ async def generate_insights(current_user: dict = Depends(get_current_user)):
 Total Emissions: {combined_emissions:.2f} kg CO2
 Emissions by Category: {by_category}
 Top Emitting Category: {top_category[0]} ({top_category[1]:.2f} kg)
-Total Activities: {len(activities)}
+Total Activities: {activity['count']}
 Sustainability Score: {sustainability_score:.0f}/100
 Risk Level: {risk_level}
 
 Provide exactly 5 specific, actionable recommendations to reduce emissions. Each should be a single sentence. Focus on cost-effective solutions suitable for NGOs with limited budgets. Return as a JSON array of strings."""
 
-            response = await chat.send_message(UserMessage(text=prompt))
+            with llm_timer():
+                response = await chat.send_message(chat_module.UserMessage(text=prompt))
             
-            import json
             try:
                 recommendations = json.loads(response)
                 if not isinstance(recommendations, list):
@@ -951,59 +1463,156 @@ Provide exactly 5 specific, actionable recommendations to reduce emissions. Each
         },
         "recommendations": recommendations,
         "data_summary": {
-            "total_activities": len(activities),
-            "energy_data_points": len(energy_data),
-            "active_goals": len([g for g in goals if g.get("status") == "active"]),
+            "total_activities": activity["count"],
+            "energy_data_points": energy["count"],
+            "active_goals": goals["active"],
             "completed_goals": completed_goals
         }
     }
 
 @api_router.get("/insights/report")
-async def generate_report(current_user: dict = Depends(get_current_user)):
-    # Get all data
-    org = await db.organizations.find_one({"id": current_user["org_id"]}, {"_id": 0})
-    activities = await db.activities.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).to_list(1000)
-    energy_data = await db.energy_data.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).to_list(365)
-    goals = await db.goals.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).to_list(100)
+async def generate_report(request: Request, current_user: dict = Depends(get_current_user)):
+    org_id = current_user["org_id"]
+    return await cached_org_response(request, org_id, "insights/report", lambda database: compute_report(org_id, database))
+
+report_renderer = None
+
+async def get_report_renderer():
+    global report_renderer
+    module = await reports.load()
+    if report_renderer is None:
+        report_renderer = module.ReportRenderer(REPORT_DIR, workers=REPORT_WORKERS)
+    return module, report_renderer
+
+def report_job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    body = {k: job.get(k) for k in ("id", "status", "format", "start", "end", "data_version", "error", "created_at")}
+    body["poll_url"] = f"/api/insights/report/jobs/{job['id']}"
+    if job["status"] == "done":
+        body["download_url"] = f"/api/insights/report/jobs/{job['id']}/download"
+    return body
+
+def report_file_response(request: Request, module, renderer, job: Dict[str, Any]) -> Response:
+    etag = f'"{job["id"]}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return FileResponse(
+        renderer.artifact_path(job), media_type=module.FORMATS[job["format"]], filename=job.get("filename"),
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+    )
+
+@api_router.get("/insights/report/export")
+async def export_report(
+    request: Request,
+    format: str = "pdf",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """The report as a PDF or XLSX file for entries dated in [start, end) (default: all).
+
+    Served at once when already rendered for the organization's current data,
+    otherwise rendering starts in the background and the answer is 202 with a poll URL.
+    Only starting a render goes through admission control.
+    """
+    for value in (start, end):
+        if value is not None:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD")
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    org_id = current_user["org_id"]
+    module, renderer = await get_report_renderer()
+    if format not in module.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(module.FORMATS)}")
+    version = await get_data_version(org_id)
+    job = await db.report_jobs.find_one({"id": module.job_id(org_id, version, format, start, end)}, {"_id": 0})
+    if job is None or not (renderer.ready(job) or job["status"] in ("queued", "running") and not renderer.lost(job)):
+        async with admission_slot("insights/report/export", org_id):
+            database = await analytics_source(org_id)
+            job = await renderer.request(
+                db, database, org_id, version, format, start, end,
+                lambda: compute_report(org_id, database, start, end)
+            )
+    if renderer.ready(job):
+        return report_file_response(request, module, renderer, job)
+    body = report_job_response(job)
+    return JSONResponse(body, status_code=202, headers={"Location": body["poll_url"], "Retry-After": "2"})
+
+async def find_report_job(job_id: str, org_id: str) -> Dict[str, Any]:
+    job = await db.report_jobs.find_one({"id": job_id, "organization_id": org_id}, {"_id": 0})
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@api_router.get("/insights/report/jobs/{job_id}")
+async def get_report_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Rendering status; `download_url` once done.
+
+    A lost job (its worker stopped) is restarted here, through admission control, while
+    the organization's data is still the version it was requested for. Otherwise the
+    answer is 410 and the client requests the export again.
+    """
+    org_id = current_user["org_id"]
+    job = await find_report_job(job_id, org_id)
+    if job["status"] in ("queued", "running"):
+        module, renderer = await get_report_renderer()
+        if renderer.lost(job):
+            if job["data_version"] != await get_data_version(org_id):
+                raise HTTPException(status_code=410, detail="Report job was lost and the data has changed since")
+            async with admission_slot("insights/report/export", org_id):
+                database = await analytics_source(org_id)
+                start, end = job["start"], job["end"]
+                job = await renderer.request(
+                    db, database, org_id, job["data_version"], job["format"], start, end,
+                    lambda: compute_report(org_id, database, start, end)
+                )
+    body = report_job_response(job)
+    if job["status"] in ("queued", "running"):
+        return JSONResponse(body, status_code=202, headers={"Retry-After": "2"})
+    return body
+
+@api_router.get("/insights/report/jobs/{job_id}/download")
+async def download_report(request: Request, job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await find_report_job(job_id, current_user["org_id"])
+    module, renderer = await get_report_renderer()
+    if not renderer.ready(job):
+        raise HTTPException(status_code=409 if job["status"] != "done" else 410, detail=f"Report is {job['status']}")
+    return report_file_response(request, module, renderer, job)
+
+async def compute_report(org_id: str, database=None, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Any]:
+    database = db if database is None else database
+    # Get all data (or the entries dated in [start, end))
+    org = await database.organizations.find_one({"id": org_id}, {"_id": 0, "name": 1})
+    summary = await load_org_summary(database, org_id, start, end)
+    activity, energy, goals = summary["activity"], summary["energy"], summary["goals"]
     
     # Calculate all metrics
-    total_emissions = sum(a.get("carbon_emission_kg", 0) for a in activities)
-    total_energy_emissions = sum(e.get("carbon_emission_kg", 0) for e in energy_data)
+    total_emissions = activity["emissions"]
+    total_energy_emissions = energy["emissions"]
     combined_emissions = total_emissions + total_energy_emissions
     
-    by_category = {}
-    for a in activities:
-        cat = a.get("activity_category", "other")
-        by_category[cat] = by_category.get(cat, 0) + a.get("carbon_emission_kg", 0)
+    by_category = activity["by_category"]
     
     # Monthly breakdown
-    monthly_data = {}
-    for a in activities:
-        month = a.get("date", "")[:7]
-        if month:
-            monthly_data[month] = monthly_data.get(month, 0) + a.get("carbon_emission_kg", 0)
+    monthly_data = activity["by_month"]
     
     trees_saved = combined_emissions / TREES_ABSORPTION_RATE if combined_emissions > 0 else 0
     
-    completed_goals = len([g for g in goals if g.get("status") == "completed"])
+    completed_goals = goals["completed"]
     sustainability_score = calculate_sustainability_score(combined_emissions, 0, completed_goals)
     
     report = {
         "report_date": datetime.now(timezone.utc).isoformat(),
         "organization": org.get("name", "Unknown") if org else "Unknown",
         "period": {
-            "start": activities[-1].get("date", "") if activities else "",
-            "end": activities[0].get("date", "") if activities else ""
+            "start": activity["first_date"],
+            "end": activity["last_date"]
         },
         "executive_summary": {
             "total_carbon_footprint_kg": round(combined_emissions, 2),
-            "total_activities_tracked": len(activities),
+            "total_activities_tracked": activity["count"],
             "sustainability_score": round(sustainability_score, 0),
             "trees_equivalent": round(trees_saved, 1),
             "top_emission_source": max(by_category.items(), key=lambda x: x[1])[0] if by_category else "N/A"
@@ -1015,9 +1624,9 @@ async def generate_report(current_user: dict = Depends(get_current_user)):
             "energy_emissions": round(total_energy_emissions, 2)
         },
         "goals_progress": {
-            "active": len([g for g in goals if g.get("status") == "active"]),
+            "active": goals["active"],
             "completed": completed_goals,
-            "goals": [{"title": g["title"], "progress": g.get("progress_percent", 0)} for g in goals[:5]]
+            "goals": goals["top"]
         },
         "recommendations": [
             "Continue tracking all activities for comprehensive reporting",
@@ -1032,53 +1641,37 @@ async def generate_report(current_user: dict = Depends(get_current_user)):
 # ==================== DASHBOARD ENDPOINTS ====================
 
 @api_router.get("/dashboard/stats")
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
-    activities = await db.activities.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).to_list(1000)
-    
-    energy_data = await db.energy_data.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).to_list(365)
-    
-    goals = await db.goals.find(
-        {"organization_id": current_user["org_id"]}, {"_id": 0}
-    ).to_list(100)
+async def get_dashboard_stats(request: Request, current_user: dict = Depends(get_current_user)):
+    org_id = current_user["org_id"]
+    return await cached_org_response(request, org_id, "dashboard/stats", lambda database: compute_dashboard_stats(org_id, database))
+
+async def compute_dashboard_stats(org_id: str, database=None) -> Dict[str, Any]:
+    database = db if database is None else database
+    summary = await load_org_summary(database, org_id)
+    activity, energy, goals = summary["activity"], summary["energy"], summary["goals"]
     
     # Calculate totals
-    activity_emissions = sum(a.get("carbon_emission_kg", 0) for a in activities)
-    energy_emissions = sum(e.get("carbon_emission_kg", 0) for e in energy_data)
+    activity_emissions = activity["emissions"]
+    energy_emissions = energy["emissions"]
     total_emissions = activity_emissions + energy_emissions
     
     # By category
-    by_category = {"energy": energy_emissions}
-    for a in activities:
-        cat = a.get("activity_category", "other")
-        by_category[cat] = by_category.get(cat, 0) + a.get("carbon_emission_kg", 0)
+    by_category = {"energy": energy_emissions, **activity["by_category"]}
     
     # Monthly trend
-    monthly = {}
-    for a in activities:
-        month = a.get("date", "")[:7]
-        if month:
-            monthly[month] = monthly.get(month, 0) + a.get("carbon_emission_kg", 0)
-    for e in energy_data:
-        month = e.get("date", "")[:7]
-        if month:
-            monthly[month] = monthly.get(month, 0) + e.get("carbon_emission_kg", 0)
-    
+    monthly = merge_monthly(activity["by_month"], energy["by_month"])
     monthly_trend = [{"month": k, "emissions": round(v, 2)} for k, v in sorted(monthly.items())[-12:]]
     
     # Goals
-    active_goals = len([g for g in goals if g.get("status") == "active"])
-    completed_goals = len([g for g in goals if g.get("status") == "completed"])
+    active_goals = goals["active"]
+    completed_goals = goals["completed"]
     
     # Sustainability score
     sustainability_score = calculate_sustainability_score(total_emissions, 0, completed_goals)
     
     return {
         "total_emissions_kg": round(total_emissions, 2),
-        "total_activities": len(activities),
+        "total_activities": activity["count"],
         "emissions_by_category": {k: round(v, 2) for k, v in by_category.items()},
         "monthly_trend": monthly_trend,
         "trees_saved_equivalent": round(total_emissions / TREES_ABSORPTION_RATE, 1) if total_emissions > 0 else 0,
@@ -1087,18 +1680,101 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
         "completed_goals": completed_goals
     }
 
+async def dashboard_snapshot(org_id: str):
+    """(data_version, stats and goal progress) pushed to live dashboards.
+
+    The stats also warm the response cache, so GET /dashboard/stats after an
+    update is a cache hit.
+    """
+    version = await get_data_version(org_id)
+    database = await analytics_source(org_id)
+    stats, goals = await asyncio.gather(
+        compute_dashboard_stats(org_id, database), compute_goal_progress(org_id, database)
+    )
+    await response_cache.set(f"dashboard/stats:{org_id}:{version}", json_dumps(jsonable_encoder(stats)))
+    goals = [
+        {k: goal[k] for k in ("id", "title", "status", "progress_percent", "current_emissions_kg")}
+        for goal in goals
+    ]
+    return version, {"stats": stats, "goals": jsonable_encoder(goals)}
+
+async def data_versions(org_ids: List[str]) -> Dict[str, int]:
+    orgs = await db.organizations.find(
+        {"id": {"$in": org_ids}}, {"_id": 0, "id": 1, "data_version": 1}
+    ).to_list(len(org_ids))
+    return {org["id"]: org.get("data_version", 0) for org in orgs}
+
+live_dashboard = LiveDashboard(
+    dashboard_snapshot,
+    data_versions,
+    max_queue=LIVE_QUEUE_SIZE,
+    max_subscribers=LIVE_MAX_SUBSCRIBERS,
+    poll_interval=LIVE_POLL_SECONDS
+)
+
+@api_router.post("/dashboard/live/ticket")
+async def create_dashboard_live_ticket(current_user: dict = Depends(get_current_user)):
+    """A ticket for `GET /dashboard/live?ticket=`, valid for STREAM_TICKET_SECONDS."""
+    return {
+        "ticket": create_stream_ticket(current_user["user_id"], current_user["org_id"]),
+        "expires_in": STREAM_TICKET_SECONDS
+    }
+
+@api_router.get("/dashboard/live")
+async def stream_dashboard(current_user: dict = Depends(get_stream_user)):
+    """Server-sent events: a "snapshot", then "stats" deltas and item events as data changes."""
+    try:
+        subscriber = await live_dashboard.subscribe(current_user["org_id"])
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+
+    async def events():
+        try:
+            # Reconnect after 3 s when the stream ends (slow-consumer drop, restart)
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout=LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield b": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            live_dashboard.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/dashboard/leaderboard")
-async def get_leaderboard(current_user: dict = Depends(get_current_user)):
+async def get_leaderboard(request: Request, current_user: dict = Depends(get_current_user)):
+    """Shared by every organization and recomputed at most every LEADERBOARD_CACHE_SECONDS."""
+    period = int(time.time() // LEADERBOARD_CACHE_SECONDS)
+    return await cached_response(
+        request, ("dashboard/leaderboard", period), compute_leaderboard,
+        ("dashboard/leaderboard", current_user["org_id"])
+    )
+
+async def compute_leaderboard() -> List[Dict[str, Any]]:
+    if columnar_store is not None:
+        return await columnar_leaderboard()
     # Get all organizations and their emissions
-    orgs = await db.organizations.find({}, {"_id": 0}).to_list(100)
+    orgs = await analytics_db.organizations.find({}, {"_id": 0}).to_list(100)
+    archived = await cold_storage.totals_by_org(analytics_db)
     
     leaderboard = []
     for org in orgs:
-        activities = await db.activities.find(
+        activities = await analytics_db.activities.find(
             {"organization_id": org["id"]}, {"_id": 0}
         ).to_list(1000)
         
         total_emissions = sum(a.get("carbon_emission_kg", 0) for a in activities)
+        total_emissions += archived.get(org["id"], {}).get("emissions", 0)
         
         # Calculate reduction (simplified - comparing recent vs older)
         reduction_percent = 0
@@ -1124,11 +1800,142 @@ async def get_leaderboard(current_user: dict = Depends(get_current_user)):
     
     return leaderboard[:20]
 
+async def columnar_leaderboard(window: int = 15) -> List[Dict[str, Any]]:
+    """The leaderboard from the Parquet snapshot: every organization's activities,
+    newest `window` versus the `window` before them by date."""
+    totals, orgs = await asyncio.gather(
+        columnar_store.leaderboard_totals(window),
+        analytics_db.organizations.find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+    )
+    leaderboard = []
+    for org in orgs:
+        row = totals.get(org["id"], {"emissions": 0, "count": 0, "recent": 0, "older": 0})
+        reduction_percent = 0
+        if row["count"] > 2 * window and row["older"] > 0:
+            reduction_percent = max(((row["older"] - row["recent"]) / row["older"]) * 100, 0)
+        leaderboard.append({
+            "organization_id": org["id"],
+            "organization_name": org["name"],
+            "total_emissions_kg": round(row["emissions"], 2),
+            "reduction_percent": round(reduction_percent, 1)
+        })
+    leaderboard.sort(key=lambda x: (-x["reduction_percent"], x["total_emissions_kg"]))
+    for i, entry in enumerate(leaderboard[:20]):
+        entry["rank"] = i + 1
+    return leaderboard[:20]
+
+# ==================== BENCHMARKS ENDPOINTS ====================
+
+@api_router.get("/benchmarks/percentiles")
+async def get_benchmark_percentiles(
+    month: Optional[str] = None,
+    months: int = 1,
+    current_user: dict = Depends(get_current_user)
+):
+    """Percentile of the organization's emissions (total and per staff) among all
+    organizations, per category, over the `months` ending at `month`."""
+    if month is None:
+        # Default to the last complete month
+        first_of_month = datetime.now(timezone.utc).date().replace(day=1)
+        month = (first_of_month - timedelta(days=1)).strftime("%Y-%m")
+    try:
+        datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="month must be YYYY-MM")
+    if not 1 <= months <= 24:
+        raise HTTPException(status_code=400, detail="months must be between 1 and 24")
+    return await benchmarks.percentiles(analytics_db, benchmark_sketches, current_user["org_id"], month, months)
+
+# ==================== PLANNER ENDPOINTS ====================
+
+@api_router.post("/planner/optimize")
+async def optimize_portfolio(request: PortfolioRequest, current_user: dict = Depends(admitted("planner/optimize"))):
+    """Best set of initiatives within the budget (exact; see portfolio.py)."""
+    module = await portfolio.load()
+    catalog = [i.model_dump() for i in request.initiatives] if request.initiatives is not None else module.DEFAULT_CATALOG
+    try:
+        # Up to MAX_SEARCH_SECONDS of CPU: keep it off the event loop
+        return await asyncio.to_thread(
+            module.optimize, catalog, request.budget, request.horizon_years, request.objective, request.carbon_price
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ==================== EMISSIONS WINDOW ENDPOINT ====================
+
+@api_router.get("/emissions/window")
+async def get_emissions_window(
+    days: Optional[int] = None,
+    fiscal_year: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    if (start is None) != (end is None):
+        raise HTTPException(status_code=400, detail="start and end must be given together")
+    for value in (start, end):
+        if value is not None:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD")
+    if fiscal_year is not None:
+        window = fiscal_year_window(fiscal_year)
+    elif start is not None:
+        window = {"start": start, "end": end}
+    else:
+        window = rolling_window(days or 30)
+    
+    if window["start"] >= window["end"]:
+        raise HTTPException(status_code=400, detail="Window start must be before end")
+    
+    totals = await emissions_in_window(current_user["org_id"], window["start"], window["end"])
+    return {
+        **totals,
+        "activity_emissions_kg": round(totals["activity_emissions_kg"], 2),
+        "energy_emissions_kg": round(totals["energy_emissions_kg"], 2),
+        "total_emissions_kg": round(totals["total_emissions_kg"], 2)
+    }
+
+@api_router.get("/emissions/uncertainty")
+async def get_emissions_uncertainty(request: Request, current_user: dict = Depends(get_current_user)):
+    """Monte Carlo confidence intervals of the all-time totals per category (see uncertainty.py)."""
+    org_id = current_user["org_id"]
+
+    async def compute(database):
+        module = await uncertainty.load()
+        return await module.org_uncertainty(database, org_id)
+
+    return await cached_org_response(request, org_id, "emissions/uncertainty", compute, admit=True)
+
 # ==================== EMISSION FACTORS ENDPOINT ====================
 
+EMISSION_FACTORS_BODY = json.dumps(EMISSION_FACTORS, separators=(",", ":")).encode()
+EMISSION_FACTORS_ETAG = make_etag("emission-factors", EMISSION_FACTORS_BODY.decode())
+
 @api_router.get("/emission-factors")
-async def get_emission_factors():
-    return EMISSION_FACTORS
+async def get_emission_factors(request: Request):
+    # Static table: revalidation is free for clients that kept the ETag
+    if etag_matches(request.headers.get("if-none-match"), EMISSION_FACTORS_ETAG):
+        return _json_response(b"", EMISSION_FACTORS_ETAG, status_code=304)
+    return _json_response(EMISSION_FACTORS_BODY, EMISSION_FACTORS_ETAG)
+
+# ==================== PROFILING ENDPOINTS ====================
+
+async def require_profiling_token(x_profile_token: Optional[str] = Header(None)):
+    if not PROFILING_TOKEN or not hmac.compare_digest((x_profile_token or "").encode(), PROFILING_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Profiling access denied")
+
+@api_router.get("/admin/profiles", dependencies=[Depends(require_profiling_token)])
+async def list_profiles():
+    return {"profiles": profile_store.list()}
+
+@api_router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_profiling_token)])
+async def get_profile(profile_id: str, format: str = "speedscope"):
+    path = profile_store.path(profile_id, format)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=path.name)
 
 # ==================== ROOT AND HEALTH ====================
 
@@ -1138,7 +1945,34 @@ async def root():
 
 @api_router.get("/health")
 async def health():
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), timeout=5)
+        mongo = {"status": "ok", "ping_ms": round((time.perf_counter() - started) * 1000, 2)}
+    except Exception as e:
+        logger.error(f"Health check ping failed: {e}")
+        mongo = {"status": "error", "error": type(e).__name__}
+    body = {
+        "status": "healthy" if mongo["status"] == "ok" else "unhealthy",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "mongo": mongo,
+        "pool": {
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "min_pool_size": MONGO_MIN_POOL_SIZE,
+            "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "analytics_read_preference": ANALYTICS_READ_PREFERENCE,
+            **POOL_LISTENER.summary()
+        }
+    }
+    if meter_buffer is not None:
+        body["meter_ingest"] = meter_buffer.status()
+    if report_renderer is not None:
+        body["reports"] = report_renderer.status()
+    body["live_dashboard"] = live_dashboard.status()
+    body["admission"] = admission.status()
+    if columnar_store is not None:
+        body["columnar"] = columnar_store.status()
+    return JSONResponse(body, status_code=200 if mongo["status"] == "ok" else 503)
 
 # Include the router
 app.include_router(api_router)
@@ -1152,6 +1986,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Sampled request profiling (X-Profile: 1 with X-Profile-Token, or PROFILE_SAMPLE_RATE)
+if PROFILING_TOKEN or PROFILE_SAMPLE_RATE > 0:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        token=PROFILING_TOKEN,
+        sample_rate=PROFILE_SAMPLE_RATE
+    )
+
+# Request metrics (outermost, so CORS and routing time is included)
+app.add_middleware(MetricsMiddleware, slow_request_ms=float(os.environ.get('SLOW_REQUEST_MS', '1000')))
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1159,6 +2009,69 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ==================== STARTUP ====================
+
+# Set by the gunicorn master (gunicorn.conf.py) once prefork_warm_up() has run
+prefork_warmed = False
+
+def warm_up_models():
+    # First LAPACK call pays for BLAS thread-pool and dispatch setup
+    today = datetime.now(timezone.utc).date()
+    sample = [
+        {"date": (today - timedelta(days=i)).isoformat(), "electricity_kwh": 50.0 + i % 7,
+         "num_people": 10, "num_systems": 3, "ac_hours": i % 5, "outdoor_temp_celsius": 30.0}
+        for i in range(30)
+    ]
+    forecasting.get().forecast_energy(sample)
+
+def preload_subsystems():
+    forecast_batch.get()
+    warm_up_models()
+    if EMERGENT_LLM_KEY:
+        llm_chat.get()
+
+# Keeps background tasks referenced until they finish
+_background_tasks = set()
+
+async def background_warm_up():
+    try:
+        await asyncio.to_thread(preload_subsystems)
+    except Exception as e:
+        # First use retries the import and reports the error to that request
+        logger.warning(f"Background warm-up failed: {e}")
+
+async def prefork_warm_up():
+    """One-off work done in the gunicorn master before workers fork.
+
+    Uses its own short-lived client: the app's client must not connect before
+    the fork, since pymongo pools and monitor threads do not survive it.
+    """
+    warm_client = AsyncIOMotorClient(mongo_url)
+    try:
+        await create_indexes(warm_client[os.environ['DB_NAME']])
+    finally:
+        warm_client.close()
+    preload_subsystems()
+
+@app.on_event("startup")
+async def startup_warm_up():
+    if not prefork_warmed:
+        await create_indexes()
+        # Serve immediately; heavy modules load while the first requests run
+        task = asyncio.create_task(background_warm_up())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    # Open this worker's pool (minPoolSize connections fill in the background)
+    try:
+        await client.admin.command("ping")
+    except Exception as e:
+        logger.warning(f"MongoDB ping at startup failed: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await live_dashboard.close()
+    if meter_buffer is not None:
+        await meter_buffer.close()
+    if report_renderer is not None:
+        await report_renderer.close()
     client.close()
@@ -0,0 +1,353 @@
+"""Seeded synthetic data for scale testing.
+
+Generates organizations with skewed (Zipf-like) sizes, activities across all
+six categories and every activity type in EMISSION_FACTORS, and daily energy
+readings with an annual temperature cycle. Quantities are drawn as NumPy
+columns and emissions are computed with vectorized versions of the server's
+calculate_* formulas; Python only touches each document once, to build the
+dict. Output goes to MongoDB (batched `insert_many`), NDJSON or Parquet.
+
+    python synthetic_data.py --orgs 1000 --activities 2000000 --seed 7 --out mongo
+    python synthetic_data.py --orgs 50 --activities 100000 --out ndjson --path /tmp/ecopulse-data
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional, only speeds up NDJSON output
+    orjson = None
+
+from activity_search import search_text
+from emission_factors import EMISSION_FACTORS, EVENT_CATERING_KG, EVENT_TRAVEL_KG
+
+CATEGORIES = list(EMISSION_FACTORS)
+# Share of activities per category (travel and events dominate NGO logs)
+CATEGORY_WEIGHTS = np.array([0.32, 0.18, 0.15, 0.12, 0.15, 0.08])
+TYPE_FIELD = {
+    "travel": "vehicle_type",
+    "events": "event_type",
+    "infrastructure": "equipment_type",
+    "marketing": "marketing_type",
+    "office": "activity_type",
+    "staff_welfare": "welfare_type",
+}
+WELFARE_GROUPS = {
+    "gym_membership": "health_wellness", "health_checkup": "health_wellness",
+    "medical_insurance_admin": "health_wellness", "wellness_program": "health_wellness",
+    "team_outing_local": "recreation", "team_outing_travel": "recreation", "staff_party": "recreation",
+    "gifts_physical": "recreation", "gifts_digital": "recreation",
+    "uniform_cotton": "uniforms_safety", "uniform_synthetic": "uniforms_safety",
+    "safety_equipment": "uniforms_safety", "ppe_disposable": "uniforms_safety",
+}
+PER_DAY_MARKETING = {"digital_campaign", "social_media_post", "website_hosting"}
+DESCRIPTIONS = {
+    "travel": ["Field visit", "Partner meeting", "Site survey", "Donor visit", "Training travel"],
+    "events": ["Community workshop", "Fundraising gala", "Volunteer training", "Awareness drive"],
+    "infrastructure": ["Office power", "Server room", "Generator backup", "Cooling"],
+    "marketing": ["Campaign launch", "Newsletter", "Annual report print", "Social outreach"],
+    "office": ["Courier dispatch", "Printing", "Calls", "Water usage"],
+    "staff_welfare": ["Staff wellness", "Team outing", "Uniform order", "Safety kit"],
+}
+CITIES = ["Mumbai", "Delhi", "Pune", "Chennai", "Kolkata", "Nairobi", "Dhaka", "Kathmandu"]
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    return np.round(values, 2)
+
+
+def _ids(rng: np.random.Generator, n: int) -> List[str]:
+    """Seeded UUID4 strings (version and variant bits set in bulk)."""
+    raw = np.frombuffer(rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    h = raw.tobytes().hex()
+    return [f"{h[i:i + 8]}-{h[i + 8:i + 12]}-{h[i + 12:i + 16]}-{h[i + 16:i + 20]}-{h[i + 20:i + 32]}"
+            for i in range(0, 32 * n, 32)]
+
+
+def organization_sizes(n_orgs: int, total_activities: int, rng: np.random.Generator, skew: float = 1.1) -> np.ndarray:
+    """Split `total_activities` across organizations with a heavy-tailed size distribution."""
+    weights = 1.0 / np.arange(1, n_orgs + 1) ** skew
+    rng.shuffle(weights)
+    return rng.multinomial(total_activities, weights / weights.sum())
+
+
+def generate_organizations(n_orgs: int, rng: np.random.Generator, created_at: str) -> List[Dict]:
+    ids = _ids(rng, n_orgs)
+    cities = rng.choice(CITIES, n_orgs)
+    return [
+        {"id": org_id, "name": f"{city} Synthetic NGO {i + 1}", "created_at": created_at, "settings": {"synthetic": True}}
+        for i, (org_id, city) in enumerate(zip(ids, cities))
+    ]
+
+
+def _category_columns(category: str, types: np.ndarray, n: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Draw the detail columns for one category and compute emissions like server.calculate_*."""
+    names = list(EMISSION_FACTORS[category])
+    factors = np.array([EMISSION_FACTORS[category][t] for t in names])[types]
+    if category == "travel":
+        distance = _round2(rng.lognormal(3.5, 1.0, n))
+        passengers = rng.integers(1, 5, n)
+        return {"distance_km": distance, "passengers": passengers,
+                "emission": factors * distance / passengers}
+    if category == "events":
+        attendees = rng.integers(5, 300, n)
+        duration = _round2(rng.uniform(1, 8, n))
+        catering = rng.random(n) < 0.6
+        travel = rng.random(n) < 0.3
+        emission = factors * attendees * duration + catering * attendees * EVENT_CATERING_KG + travel * attendees * EVENT_TRAVEL_KG
+        return {"attendees": attendees, "duration_hours": duration, "has_catering": catering,
+                "has_travel": travel, "emission": emission}
+    if category == "infrastructure":
+        usage = _round2(rng.uniform(1, 720, n))
+        power = _round2(rng.lognormal(0.0, 0.8, n))
+        quantity = rng.integers(1, 20, n)
+        return {"usage_hours": usage, "power_rating_kw": power, "quantity": quantity,
+                "emission": factors * power * usage * quantity}
+    if category == "marketing":
+        quantity = rng.integers(1, 50_000, n)
+        duration = rng.integers(1, 60, n)
+        per_day = np.isin(np.array(names)[types], list(PER_DAY_MARKETING))
+        return {"quantity": quantity, "duration_days": duration,
+                "emission": factors * quantity * np.where(per_day, duration, 1)}
+    if category == "office":
+        quantity = _round2(rng.lognormal(4.0, 1.5, n))
+        return {"quantity": quantity, "emission": factors * quantity}
+    beneficiaries = rng.integers(1, 200, n)
+    return {"beneficiaries": beneficiaries, "emission": factors * beneficiaries}
+
+
+def _seasonal_days(rng: np.random.Generator, n: int, days: int) -> np.ndarray:
+    """Day offsets with more activity in the second half of each year (campaign season)."""
+    offsets = np.arange(days)
+    weights = 1.0 + 0.35 * np.sin(2 * np.pi * (offsets / 365.25 - 0.25))
+    return rng.choice(days, n, p=weights / weights.sum())
+
+
+def generate_activities(
+    org_ids: List[str],
+    counts: np.ndarray,
+    rng: np.random.Generator,
+    start_date: datetime,
+    days: int,
+    chunk_size: int = 100_000
+) -> Iterator[List[Dict]]:
+    """Yield lists of activity documents, at most `chunk_size` per list."""
+    org_index = np.repeat(np.arange(len(org_ids)), counts)
+    created_at = datetime.now(timezone.utc).isoformat()
+    for begin in range(0, len(org_index), chunk_size):
+        owners = org_index[begin:begin + chunk_size]
+        n = len(owners)
+        owner_ids = [org_ids[i] for i in owners.tolist()]
+        categories = rng.choice(len(CATEGORIES), n, p=CATEGORY_WEIGHTS / CATEGORY_WEIGHTS.sum())
+        day_offsets = _seasonal_days(rng, n, days)
+        dates = (np.datetime64(start_date.date(), "D") + day_offsets).astype(str).tolist()
+        costs = np.where(rng.random(n) < 0.7, _round2(rng.lognormal(4.5, 1.2, n)), np.nan).tolist()
+        cities = rng.choice(CITIES, n).tolist()
+        ids = _ids(rng, n)
+        docs: List[Optional[Dict]] = [None] * n
+
+        for c, category in enumerate(CATEGORIES):
+            rows = np.flatnonzero(categories == c)
+            if not len(rows):
+                continue
+            type_names = list(EMISSION_FACTORS[category])
+            types = rng.integers(0, len(type_names), len(rows))
+            columns = _category_columns(category, types, len(rows), rng)
+            type_list = [type_names[t] for t in types.tolist()]
+            emissions = _round2(columns.pop("emission")).tolist()
+            detail_lists = {k: v.tolist() for k, v in columns.items()}
+            descriptions = DESCRIPTIONS[category]
+            description_pick = rng.integers(0, len(descriptions), len(rows)).tolist()
+            type_field = TYPE_FIELD[category]
+            for j, row in enumerate(rows.tolist()):
+                activity_type = type_list[j]
+                details = {type_field: activity_type}
+                for key, values in detail_lists.items():
+                    details[key] = values[j]
+                if category == "staff_welfare":
+                    details["category"] = WELFARE_GROUPS.get(activity_type, "recreation")
+                cost = costs[row]
+                docs[row] = {
+                    "id": ids[row],
+                    "organization_id": owner_ids[row],
+                    "activity_category": category,
+                    "activity_type": activity_type,
+                    "description": f"{descriptions[description_pick[j]]} - {cities[row]}",
+                    "date": dates[row],
+                    "details": details,
+                    "search_text": search_text(details),
+                    "carbon_emission_kg": emissions[j],
+                    "cost": None if cost != cost else cost,
+                    "created_at": created_at,
+                    "created_by": "synthetic"
+                }
+        yield docs
+
+
+def generate_energy(
+    org_ids: List[str],
+    sizes: np.ndarray,
+    rng: np.random.Generator,
+    start_date: datetime,
+    days: int
+) -> Iterator[List[Dict]]:
+    """Yield one list of daily energy readings per organization."""
+    electricity_factor = EMISSION_FACTORS["infrastructure"]["electricity"]
+    day_index = np.arange(days)
+    calendar = np.datetime64(start_date.date(), "D") + day_index
+    dates = calendar.astype(str).tolist()
+    weekend = ((calendar.astype(np.int64) + 3) % 7) >= 5  # 1970-01-01 was a Thursday
+    season = np.sin(2 * np.pi * (day_index / 365.25 - 0.3))
+    created_at = datetime.now(timezone.utc).isoformat()
+    # Headcount grows with organization size (activities logged)
+    headcount = np.clip(np.round(5 + 3 * np.log1p(sizes)), 3, 500)
+
+    for i, org_id in enumerate(org_ids):
+        base_temp = rng.uniform(18, 30)
+        temp = _round2(base_temp + 8 * season + rng.normal(0, 2, days))
+        people = np.maximum(np.round(headcount[i] * np.where(weekend, 0.2, 1.0) + rng.normal(0, 1, days)), 0).astype(int)
+        systems = np.maximum(np.round(people * rng.uniform(0.6, 1.2)), 1).astype(int)
+        ac = _round2(np.clip((temp - 24) * 0.8 + rng.normal(0, 1, days), 0, 14))
+        kwh = _round2(np.maximum(5 + 0.9 * people + 0.4 * systems + 2.5 * ac + rng.normal(0, 2, days), 0.5))
+        ids = _ids(rng, days)
+        kwh_list, people_list, systems_list, ac_list, temp_list = kwh.tolist(), people.tolist(), systems.tolist(), ac.tolist(), temp.tolist()
+        yield [
+            {
+                "id": ids[d],
+                "organization_id": org_id,
+                "date": dates[d],
+                "electricity_kwh": kwh_list[d],
+                "num_people": people_list[d],
+                "num_systems": systems_list[d],
+                "ac_hours": ac_list[d],
+                "outdoor_temp_celsius": temp_list[d],
+                "carbon_emission_kg": round(kwh_list[d] * electricity_factor, 2),
+                "notes": None,
+                "created_at": created_at
+            }
+            for d in range(days)
+        ]
+
+
+class _MongoSink:
+    def __init__(self, url: str, db_name: str, batch_size: int):
+        from pymongo import MongoClient
+        self.client = MongoClient(url)
+        self.db = self.client[db_name]
+        self.batch_size = batch_size
+
+    def write(self, collection: str, docs: List[Dict]):
+        for i in range(0, len(docs), self.batch_size):
+            # insert_many adds _id to the dicts; the generator never reuses them
+            self.db[collection].insert_many(docs[i:i + self.batch_size], ordered=False)
+
+    def close(self):
+        self.client.close()
+
+
+class _NdjsonSink:
+    def __init__(self, path: Path):
+        path.mkdir(parents=True, exist_ok=True)
+        self.files = {}
+        self.path = path
+
+    def write(self, collection: str, docs: List[Dict]):
+        handle = self.files.get(collection)
+        if handle is None:
+            handle = self.files[collection] = open(self.path / f"{collection}.ndjson", "wb")
+        if orjson is not None:
+            handle.write(b"".join(orjson.dumps(d) + b"\n" for d in docs))
+        else:
+            handle.write("".join(json.dumps(d, separators=(",", ":")) + "\n" for d in docs).encode())
+
+    def close(self):
+        for handle in self.files.values():
+            handle.close()
+
+
+class _ParquetSink:
+    def __init__(self, path: Path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow") from exc
+        self.pa, self.pq = pa, pq
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.writers = {}
+
+    def write(self, collection: str, docs: List[Dict]):
+        if collection == "activities":
+            # Heterogeneous details are stored as JSON text to keep one schema
+            docs = [{**d, "details": json.dumps(d["details"])} for d in docs]
+        table = self.pa.Table.from_pylist(docs)
+        writer = self.writers.get(collection)
+        if writer is None:
+            writer = self.writers[collection] = self.pq.ParquetWriter(self.path / f"{collection}.parquet", table.schema)
+        writer.write_table(table.cast(writer.schema))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic EcoPulse data at a known scale")
+    parser.add_argument("--orgs", type=int, default=100)
+    parser.add_argument("--activities", type=int, default=100_000, help="total activities across all organizations")
+    parser.add_argument("--days", type=int, default=730, help="history length for activities and energy")
+    parser.add_argument("--energy-days", type=int, default=365, help="daily energy readings per organization (0 to skip)")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of organization sizes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", choices=["mongo", "ndjson", "parquet"], default="mongo")
+    parser.add_argument("--path", type=Path, default=Path("synthetic-data"), help="output directory for files")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="documents per insert_many")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    start_date = datetime.now(timezone.utc) - timedelta(days=args.days)
+    if args.out == "mongo":
+        from dotenv import load_dotenv
+        load_dotenv(Path(__file__).parent / '.env')
+        sink = _MongoSink(os.environ['MONGO_URL'], os.environ['DB_NAME'], args.batch_size)
+    elif args.out == "ndjson":
+        sink = _NdjsonSink(args.path)
+    else:
+        sink = _ParquetSink(args.path)
+
+    started = time.perf_counter()
+    written = 0
+    try:
+        orgs = generate_organizations(args.orgs, rng, start_date.isoformat())
+        sink.write("organizations", orgs)
+        org_ids = [o["id"] for o in orgs]
+        sizes = organization_sizes(args.orgs, args.activities, rng, args.skew)
+        for docs in generate_activities(org_ids, sizes, rng, start_date, args.days):
+            sink.write("activities", docs)
+            written += len(docs)
+            elapsed = time.perf_counter() - started
+            print(f"activities: {written:,}/{args.activities:,} ({written / elapsed:,.0f} docs/s)", flush=True)
+        if args.energy_days:
+            energy_start = datetime.now(timezone.utc) - timedelta(days=args.energy_days)
+            for docs in generate_energy(org_ids, sizes, rng, energy_start, args.energy_days):
+                sink.write("energy_data", docs)
+                written += len(docs)
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written:,} documents for {args.orgs} organizations in {elapsed:.1f}s "
+          f"({written / elapsed:,.0f} docs/s, seed {args.seed})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Monte Carlo confidence intervals for an organization's emission totals.
+
+Every stored emission is a point estimate: a quantity times a factor from
+emission_factors.py. Two kinds of error are drawn, both lognormal with the
+point estimate as mean (FACTOR_UNCERTAINTY and ACTIVITY_DATA_UNCERTAINTY give
+the relative half-width of their 95% intervals):
+
+* factor error, one draw per factor and simulation, shared by every entry
+  using that factor (a wrong grid factor skews all electricity alike);
+* quantity error, drawn independently for every entry.
+
+The simulation is a (draws x entries) matrix of emissions built in chunks of
+entries, so memory stays under ~3 x CHUNK_BYTES. Each chunk is reduced to
+per-category totals with one matrix product against the entries' category
+one-hot. Past MAX_SIMULATED_ENTRIES, only the largest entries are simulated
+one by one. The quantity errors of the others are summed per factor and
+category as a normal with the same mean and variance: the sum of many small
+independent errors. Factor errors still apply to them in full.
+"""
+import asyncio
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+import cold_storage
+from emission_factors import (
+    ACTIVITY_DATA_UNCERTAINTY, EVENT_CATERING_KG, EVENT_TRAVEL_KG, FACTOR_UNCERTAINTY
+)
+
+DRAWS = 10_000
+SEED = 20240601
+CHUNK_BYTES = 16 * 2**20
+MAX_SIMULATED_ENTRIES = 2_000
+Z95 = 1.959963984540054
+
+ACTIVITY_FIELDS = {
+    "_id": 0, "activity_category": 1, "activity_type": 1, "carbon_emission_kg": 1,
+    "details.attendees": 1, "details.has_catering": 1, "details.has_travel": 1
+}
+
+
+def _sigma(half_width: float) -> float:
+    """Lognormal sigma whose 95% interval is about ±`half_width` around the median."""
+    return math.log1p(half_width) / Z95
+
+
+def factor_sigma(category: str, factor: str) -> float:
+    table = FACTOR_UNCERTAINTY.get(category, {})
+    return _sigma(table.get(factor, table.get("default", 0.0)))
+
+
+def activity_components(activity: Dict[str, Any]) -> List[Tuple[str, str, float]]:
+    """(factor category, factor, kg) parts of an activity's emission."""
+    category, kg = activity["activity_category"], activity.get("carbon_emission_kg") or 0.0
+    if category != "events":
+        return [(category, activity.get("activity_type") or "default", kg)]
+    details = activity.get("details") or {}
+    attendees = details.get("attendees") or 0
+    catering = attendees * EVENT_CATERING_KG if details.get("has_catering") else 0.0
+    travel = attendees * EVENT_TRAVEL_KG if details.get("has_travel") else 0.0
+    parts = [(category, activity.get("activity_type") or "default", max(kg - catering - travel, 0.0))]
+    if catering:
+        parts.append((category, "catering", catering))
+    if travel:
+        parts.append((category, "attendee_travel", travel))
+    return parts
+
+
+class Entries:
+    """Emission parts as arrays: kg, factor index and reporting-category index."""
+
+    def __init__(self):
+        self.factors: Dict[Tuple[str, str], int] = {}
+        self.categories: Dict[str, int] = {}
+        self.kg: List[float] = []
+        self.factor: List[int] = []
+        self.category: List[int] = []
+
+    def add(self, category: str, factor_category: str, factor: str, kg: float):
+        if kg <= 0:
+            return
+        self.kg.append(kg)
+        self.factor.append(self.factors.setdefault((factor_category, factor), len(self.factors)))
+        self.category.append(self.categories.setdefault(category, len(self.categories)))
+
+
+async def load_entries(db, org_id: str) -> Entries:
+    entries = Entries()
+    cursor = db.activities.find({"organization_id": org_id}, ACTIVITY_FIELDS).batch_size(5000)
+    async for activity in cursor:
+        for factor_category, factor, kg in activity_components(activity):
+            entries.add(activity["activity_category"], factor_category, factor, kg)
+    async for activity in cold_storage.iter_rows(db, org_id):
+        for factor_category, factor, kg in activity_components(activity):
+            entries.add(activity["activity_category"], factor_category, factor, kg)
+    cursor = db.energy_data.find({"organization_id": org_id}, {"_id": 0, "carbon_emission_kg": 1}).batch_size(5000)
+    async for entry in cursor:
+        entries.add("energy", "infrastructure", "electricity", entry.get("carbon_emission_kg") or 0.0)
+    return entries
+
+
+def simulate(
+    kg: np.ndarray, factor: np.ndarray, category: np.ndarray,
+    factor_sigmas: np.ndarray, data_sigmas: np.ndarray, n_categories: int,
+    draws: int = DRAWS, seed: int = SEED
+) -> np.ndarray:
+    """(draws x categories) simulated totals for entries with point emissions `kg`.
+
+    `factor` and `category` index each entry's factor and reporting category,
+    `data_sigmas` is the lognormal sigma of each entry's quantity error.
+    """
+    rng = np.random.default_rng(seed)
+    # Mean-preserving lognormal multipliers: exp(sigma z - sigma^2 / 2) has mean 1
+    factor_multiplier = rng.standard_normal((draws, len(factor_sigmas)))
+    factor_multiplier *= factor_sigmas
+    factor_multiplier -= factor_sigmas ** 2 / 2
+    np.exp(factor_multiplier, out=factor_multiplier)
+
+    order = np.argsort(-kg, kind="stable")
+    simulated, pooled = order[:MAX_SIMULATED_ENTRIES], order[MAX_SIMULATED_ENTRIES:]
+    totals = np.zeros((draws, n_categories))
+    chunk = max(1, CHUNK_BYTES // (8 * draws))
+    for start in range(0, len(simulated), chunk):
+        rows = simulated[start:start + chunk]
+        sigma = data_sigmas[rows]
+        emissions = rng.standard_normal((draws, len(rows)))
+        emissions *= sigma
+        emissions -= sigma ** 2 / 2
+        np.exp(emissions, out=emissions)
+        emissions *= factor_multiplier[:, factor[rows]]
+        emissions *= kg[rows]
+        one_hot = np.zeros((len(rows), n_categories))
+        one_hot[np.arange(len(rows)), category[rows]] = 1.0
+        totals += emissions @ one_hot
+
+    if len(pooled):
+        # Per (factor, category) group: sum of kg x lognormal(sigma) ~ normal with matching moments
+        groups, group_index = np.unique(
+            np.stack([factor[pooled], category[pooled]], axis=1), axis=0, return_inverse=True
+        )
+        group_index = group_index.ravel()
+        mean = np.bincount(group_index, weights=kg[pooled], minlength=len(groups))
+        variance = np.bincount(
+            group_index, weights=kg[pooled] ** 2 * np.expm1(data_sigmas[pooled] ** 2), minlength=len(groups)
+        )
+        sums = mean + rng.standard_normal((draws, len(groups))) * np.sqrt(variance)
+        sums *= factor_multiplier[:, groups[:, 0]]
+        one_hot = np.zeros((len(groups), n_categories))
+        one_hot[np.arange(len(groups)), groups[:, 1]] = 1.0
+        totals += sums @ one_hot
+    return totals
+
+
+def _summary(samples: np.ndarray, point: float) -> Dict[str, Any]:
+    p = np.percentile(samples, [2.5, 5, 50, 95, 97.5])
+    return {
+        "point_kg": round(point, 2),
+        "mean_kg": round(float(samples.mean()), 2),
+        "std_kg": round(float(samples.std()), 2),
+        "median_kg": round(float(p[2]), 2),
+        "interval_90_kg": [round(float(p[1]), 2), round(float(p[3]), 2)],
+        "interval_95_kg": [round(float(p[0]), 2), round(float(p[4]), 2)],
+        # Half-width of the 95% interval relative to the point estimate
+        "relative_uncertainty_95": round(float(p[4] - p[0]) / 2 / point, 3) if point else None,
+    }
+
+
+def summarize(entries: Entries, draws: int = DRAWS, seed: int = SEED) -> Dict[str, Any]:
+    kg = np.array(entries.kg)
+    category = np.array(entries.category, dtype=np.int64)
+    names = list(entries.categories)
+    points = np.bincount(category, weights=kg, minlength=len(names)) if len(kg) else np.zeros(len(names))
+    if len(kg):
+        factor_sigmas = np.array([factor_sigma(*key) for key in entries.factors])
+        data_sigmas = np.array([_sigma(ACTIVITY_DATA_UNCERTAINTY.get(name, 0.0)) for name in names])[category]
+        samples = simulate(kg, np.array(entries.factor, dtype=np.int64), category,
+                           factor_sigmas, data_sigmas, len(names), draws, seed)
+    else:
+        samples = np.zeros((draws, 0))
+    return {
+        "draws": draws,
+        "entries": len(kg),
+        "simulated_individually": min(len(kg), MAX_SIMULATED_ENTRIES),
+        "total": _summary(samples.sum(axis=1), float(points.sum())),
+        "categories": {
+            name: _summary(samples[:, i], float(points[i])) for name, i in sorted(entries.categories.items())
+        },
+        "generated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+async def org_uncertainty(db, org_id: str, draws: int = DRAWS) -> Dict[str, Any]:
+    """Confidence intervals of the organization's all-time emissions, per category and in total."""
+    entries = await load_entries(db, org_id)
+    # Up to a second of NumPy for large organizations: keep it off the event loop
+    return await asyncio.to_thread(summarize, entries, draws)
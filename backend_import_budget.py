@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Import-time budget check for the EcoPulse backend.
+
+Imports `server` in a fresh interpreter under `python -X importtime`. The
+check fails when the cumulative import time exceeds the budget, or when a
+module that should load lazily (see backend/lazy_imports.py) was imported at
+startup. It also prints the slowest imports, so a regression points at its
+cause.
+
+    python backend_import_budget.py
+    python backend_import_budget.py --budget-ms 600 --runs 5 --top 20
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+# Must not be imported by `import server` (loaded lazily or by the warm-up task)
+LAZY_MODULES = ["emergentintegrations", "numpy", "forecasting", "forecast_batch", "meter_ingest", "portfolio", "uncertainty", "reports", "duckdb", "pyarrow"]
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure_once() -> Tuple[int, Dict[str, Tuple[int, int]]]:
+    """Cumulative microseconds for `server`, and (self, cumulative) per module."""
+    env = dict(os.environ)
+    # Importing server only builds a (not yet connected) client; no database is needed
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "ecopulse_import_budget")
+    env.setdefault("JWT_SECRET", "import-budget-check-secret-not-used-for-tokens")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import server failed:\n{completed.stderr[-2000:]}")
+
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in completed.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    if "server" not in modules:
+        raise RuntimeError("no import timing for server in -X importtime output")
+    return modules["server"][1], modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when server.py's import time exceeds a budget")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", "800")))
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to measure (median is compared)")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args()
+
+    totals: List[int] = []
+    modules: Dict[str, Tuple[int, int]] = {}
+    for _ in range(args.runs):
+        total, modules = measure_once()
+        totals.append(total)
+    median_ms = statistics.median(totals) / 1000
+
+    print(f"{'module':<48}{'self ms':>10}{'cumulative ms':>15}")
+    for name, (own, cumulative) in sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f"{name:<48}{own / 1000:>10.1f}{cumulative / 1000:>15.1f}")
+    print(f"\nimport server: median {median_ms:.0f} ms over {args.runs} runs "
+          f"({', '.join(f'{t / 1000:.0f}' for t in totals)}), budget {args.budget_ms:.0f} ms")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"import time {median_ms:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+    eager = sorted(
+        name for name in modules
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    )
+    roots = sorted({name.split(".")[0] for name in eager})
+    if roots:
+        failures.append(f"lazily loaded modules imported at startup: {', '.join(roots)}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Within import budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
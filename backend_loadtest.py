@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""Offline load test and latency benchmark for the EcoPulse backend.
+
+Runs the FastAPI app in-process (httpx ASGI transport, no network) against
+mongomock-motor or a local mongod, seeds organizations of realistic sizes,
+drives concurrent clients through
+
+    login -> log activities -> dashboard -> goals -> leaderboard
+
+and reports throughput plus p50/p95/p99 latency per route. The LLM is
+replaced by a stub with a fixed delay. Results are compared with a stored
+baseline and the run exits non-zero when a route's p95 regresses beyond the
+tolerance.
+
+    python backend_loadtest.py                                  # mongomock, default sizes
+    python backend_loadtest.py --mongo mongodb://localhost:27017 --org-sizes 10,1000,100000
+    python backend_loadtest.py --update-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+DEFAULT_BASELINE = ROOT_DIR / "test_reports" / "perf_baseline.json"
+DEFAULT_RESULTS = ROOT_DIR / "test_reports" / "loadtest_latest.json"
+PASSWORD = "LoadTest123!"
+
+ACTIVITY_PAYLOADS = {
+    "travel": lambda day: {"description": "Field visit", "date": day, "vehicle_type": random.choice(["petrol_car", "bus", "train"]),
+                           "distance_km": random.uniform(5, 400), "passengers": random.randint(1, 4), "cost": random.uniform(10, 500)},
+    "events": lambda day: {"description": "Community workshop", "date": day, "event_type": "workshop",
+                           "attendees": random.randint(5, 80), "duration_hours": random.uniform(1, 6), "has_catering": True},
+    "office": lambda day: {"description": "Courier and paper", "date": day, "activity_type": "paper_usage",
+                           "quantity": random.randint(50, 2000)},
+}
+
+
+class StubLlmChat:
+    """Stands in for emergentintegrations' LlmChat with a fixed latency."""
+    delay = 0.05
+
+    def __init__(self, **kwargs):
+        pass
+
+    def with_model(self, *args):
+        return self
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.delay)
+        return json.dumps(["Use trains for regional travel", "Switch off idle systems", "Consolidate events"])
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class EcoPulseLoadTester:
+    def __init__(self, args):
+        self.args = args
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.users: List[str] = []
+
+    def setup_app(self):
+        os.environ.setdefault("MONGO_URL", self.args.mongo if self.args.mongo != "mongomock" else "mongodb://localhost:27017")
+        os.environ.setdefault("DB_NAME", "ecopulse_loadtest")
+        os.environ.setdefault("JWT_SECRET", uuid.uuid4().hex + uuid.uuid4().hex)
+        os.environ["EMERGENT_LLM_KEY"] = "stub"
+        # Few organizations make most requests here: measure capacity, not their rate limit
+        os.environ.setdefault("ADMISSION_RATE_PER_SECOND", "1000000")
+        os.environ.setdefault("ADMISSION_BURST", "1000000")
+        import server
+
+        server.llm_chat.override(SimpleNamespace(LlmChat=StubLlmChat, UserMessage=lambda text: text))
+        if self.args.mongo == "mongomock":
+            from mongomock_motor import AsyncMongoMockClient
+            server.client = AsyncMongoMockClient()
+            server.db = server.analytics_db = server.client[os.environ["DB_NAME"]]
+        self.server = server
+        return server
+
+    async def seed(self):
+        """Insert organizations, users and activities directly (bypassing bcrypt per user)."""
+        db = self.server.db
+        for collection in ("organizations", "users", "activities", "energy_data", "goals", "forecasts"):
+            await db[collection].delete_many({})
+        await self.server.create_indexes()
+
+        import numpy as np
+        from synthetic_data import generate_activities, generate_energy
+
+        password_hash = self.server.hash_password(PASSWORD)
+        today = datetime.now(timezone.utc)
+        org_ids = []
+        for size in self.args.org_sizes:
+            org_id = str(uuid.uuid4())
+            created_at = today.isoformat()
+            await db.organizations.insert_one({"id": org_id, "name": f"Load NGO {size}", "created_at": created_at, "settings": {}})
+            email = f"load_{size}_{org_id[:8]}@example.com"
+            await db.users.insert_one({
+                "id": str(uuid.uuid4()), "email": email, "password_hash": password_hash, "name": "Load User",
+                "organization_id": org_id, "organization_name": f"Load NGO {size}", "created_at": created_at
+            })
+            self.users.append(email)
+            org_ids.append(org_id)
+
+        # Same seeded generator as synthetic_data.py, so runs are comparable
+        rng = np.random.default_rng(self.args.seed)
+        sizes = np.array(self.args.org_sizes)
+        for docs in generate_activities(org_ids, sizes, rng, today - timedelta(days=730), 730):
+            for i in range(0, len(docs), 5000):
+                await db.activities.insert_many(docs[i:i + 5000])
+        for docs in generate_energy(org_ids, sizes, rng, today - timedelta(days=90), 90):
+            await db.energy_data.insert_many(docs)
+
+    async def timed(self, client, method: str, route: str, path: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, path, **kwargs)
+        self.latencies.setdefault(route, []).append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        return response
+
+    async def run_client(self, client, email: str):
+        response = await self.timed(client, "POST", "POST /auth/login", "/auth/login", json={"email": email, "password": PASSWORD})
+        if response.status_code != 200:
+            return
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        for _ in range(self.args.iterations):
+            day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            for category in random.sample(list(ACTIVITY_PAYLOADS), 2):
+                await self.timed(client, "POST", f"POST /activities/{category}", f"/activities/{category}",
+                                 json=ACTIVITY_PAYLOADS[category](day), headers=headers)
+            await self.timed(client, "GET", "GET /dashboard/stats", "/dashboard/stats", headers=headers)
+            await self.timed(client, "POST", "POST /goals", "/goals", headers=headers, json={
+                "title": "Cut travel", "description": "Load test goal", "target_reduction_percent": 10,
+                "target_date": (datetime.now(timezone.utc) + timedelta(days=90)).strftime("%Y-%m-%d")
+            })
+            await self.timed(client, "GET", "GET /goals", "/goals", headers=headers)
+            await self.timed(client, "GET", "GET /dashboard/leaderboard", "/dashboard/leaderboard", headers=headers)
+            await self.timed(client, "GET", "GET /energy/forecast", "/energy/forecast", headers=headers)
+
+    async def run(self) -> Dict:
+        import httpx
+
+        self.setup_app()
+        seed_started = time.perf_counter()
+        await self.seed()
+        print(f"Seeded {len(self.args.org_sizes)} organizations ({sum(self.args.org_sizes)} activities) "
+              f"in {time.perf_counter() - seed_started:.1f}s")
+
+        transport = httpx.ASGITransport(app=self.server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest/api", timeout=120) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                self.run_client(client, self.users[i % len(self.users)]) for i in range(self.args.clients)
+            ))
+            elapsed = time.perf_counter() - started
+
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            values.sort()
+            routes[route] = {
+                "requests": len(values),
+                "errors": self.errors.get(route, 0),
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+            }
+        total = sum(r["requests"] for r in routes.values())
+        return {
+            "run_at": datetime.now(timezone.utc).isoformat(),
+            "config": {"mongo": "mongomock" if self.args.mongo == "mongomock" else "mongod",
+                       "org_sizes": self.args.org_sizes, "clients": self.args.clients, "iterations": self.args.iterations},
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+            "routes": routes,
+        }
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for route, stats in results["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if previous and stats["p95_ms"] > previous["p95_ms"] * tolerance:
+            regressions.append(f"{route}: p95 {stats['p95_ms']}ms vs baseline {previous['p95_ms']}ms")
+        if stats["errors"]:
+            regressions.append(f"{route}: {stats['errors']} failed requests")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EcoPulse backend load test")
+    parser.add_argument("--mongo", default="mongomock", help="'mongomock' or a MongoDB URL")
+    parser.add_argument("--org-sizes", default="10,100,1000", type=lambda s: [int(x) for x in s.split(",")],
+                        help="activities per seeded organization, comma separated")
+    parser.add_argument("--clients", type=int, default=20, help="concurrent clients")
+    parser.add_argument("--iterations", type=int, default=5, help="flow iterations per client")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed p95 ratio over baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    results = asyncio.run(EcoPulseLoadTester(args).run())
+
+    print(f"\n{'Route':<32}{'reqs':>7}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, stats in results["routes"].items():
+        print(f"{route:<32}{stats['requests']:>7}{stats['errors']:>6}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    print(f"\nThroughput: {results['throughput_rps']} req/s over {results['elapsed_seconds']}s")
+
+    DEFAULT_RESULTS.write_text(json.dumps(results, indent=2))
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("No baseline found; run with --update-baseline to record one")
+        return 0
+    regressions = compare_with_baseline(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for line in regressions:
+        print(f"❌ {line}")
+    if not regressions:
+        print("✅ No regressions against baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Serialization cost of the list endpoints, before and after the fast path.
+
+Encodes synthetic activity documents the way `GET /api/activities` used to:
+an `ActivityResponse` per document, then FastAPI's `response_model` dump,
+validate and serialize, then `JSONResponse` rendering. It compares that with
+the current path (projected documents encoded once by `fast_json`). Both are
+timed with the real FastAPI/Pydantic code, and the encoded payloads are
+checked to decode to the same data.
+
+    python backend_serialization_bench.py
+    python backend_serialization_bench.py --docs 100 1000 10000 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+import numpy as np  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from pydantic import BaseModel, ConfigDict  # noqa: E402
+
+import fast_json  # noqa: E402
+from synthetic_data import generate_activities  # noqa: E402
+
+
+class ActivityResponse(BaseModel):
+    # Mirrors server.ActivityResponse; importing server would need a MongoDB URL and secrets
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    organization_id: str
+    activity_category: str
+    activity_type: str
+    description: str
+    date: str
+    details: Dict[str, Any]
+    carbon_emission_kg: float
+    cost: Optional[float]
+    created_at: str
+    created_by: str
+
+
+RESPONSE_FIELD = create_response_field(name="Response_get_activities", type_=List[ActivityResponse])
+# One loop for all runs so loop setup is not charged to the Pydantic path
+LOOP = asyncio.new_event_loop()
+
+
+def make_documents(count: int, seed: int) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    docs: List[dict] = []
+    for chunk in generate_activities(["bench-org"], np.array([count]), rng, start, 365):
+        docs.extend(chunk)
+    keep = fast_json.projection(ActivityResponse)
+    return [{k: v for k, v in d.items() if k in keep} for d in docs]
+
+
+def pydantic_path(docs: List[dict]) -> bytes:
+    models = [ActivityResponse(**d) for d in docs]
+    content = LOOP.run_until_complete(serialize_response(field=RESPONSE_FIELD, response_content=models))
+    return JSONResponse(content).body
+
+
+def fast_path(docs: List[dict]) -> bytes:
+    return fast_json.json_response(docs).body
+
+
+def time_per_call(fn: Callable[[List[dict]], bytes], docs: List[dict], repeat: int) -> float:
+    fn(docs)  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list endpoint serialization")
+    parser.add_argument("--docs", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10, help="runs per measurement (best is reported)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    encoder = "orjson" if fast_json.orjson is not None else "json (orjson not installed)"
+    print(f"Fast path encoder: {encoder}\n")
+    print(f"{'docs':>7}{'pydantic ms':>14}{'fast ms':>10}{'ms/1000 before':>17}{'ms/1000 after':>16}{'speedup':>10}")
+    for count in args.docs:
+        docs = make_documents(count, args.seed)
+        if json.loads(pydantic_path(docs)) != json.loads(fast_path(docs)):
+            print(f"payload mismatch for {count} documents", file=sys.stderr)
+            return 1
+        before = time_per_call(pydantic_path, docs, args.repeat) * 1000
+        after = time_per_call(fast_path, docs, args.repeat) * 1000
+        print(f"{len(docs):>7}{before:>14.2f}{after:>10.2f}{before / len(docs) * 1000:>17.2f}"
+              f"{after / len(docs) * 1000:>16.2f}{before / after:>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
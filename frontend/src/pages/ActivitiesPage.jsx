@@ -13,7 +13,9 @@ import {
   Heart,
   Trash2,
   Info,
-  Leaf
+  Leaf,
+  Search,
+  X
 } from "lucide-react";
 import { Card, CardContent, CardHeader, CardTitle } from "../components/ui/card";
 import { Button } from "../components/ui/button";
@@ -163,6 +165,10 @@ const ActivitiesPage = () => {
   const [submitting, setSubmitting] = useState(false);
   const [selectedCategory, setSelectedCategory] = useState("travel");
   const [deleting, setDeleting] = useState(null);
+  const [searchQuery, setSearchQuery] = useState("");
+  const [searchResults, setSearchResults] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [searching, setSearching] = useState(false);
 
   // Form states for different categories
   const [travelForm, setTravelForm] = useState({
@@ -319,12 +325,38 @@ const ActivitiesPage = () => {
     setStaffWelfareForm({ description: "", date: defaultDate, welfare_type: "", category: "health_wellness", beneficiaries: "1", cost: "" });
   };
 
+  const runSearch = async (cursor = null) => {
+    if (!searchQuery.trim()) {
+      clearSearch();
+      return;
+    }
+    setSearching(true);
+    try {
+      const response = await apiClient.get("/activities/search", {
+        params: { q: searchQuery, limit: 20, ...(cursor ? { cursor } : {}) }
+      });
+      setSearchResults(prev => (cursor && prev ? [...prev, ...response.data.items] : response.data.items));
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      toast.error("Search failed");
+    } finally {
+      setSearching(false);
+    }
+  };
+
+  const clearSearch = () => {
+    setSearchQuery("");
+    setSearchResults(null);
+    setNextCursor(null);
+  };
+
   const handleDelete = async (id) => {
     setDeleting(id);
     try {
       await apiClient.delete(`/activities/${id}`);
       toast.success("Activity deleted");
       setActivities(prev => prev.filter(a => a.id !== id));
+      setSearchResults(prev => (prev ? prev.filter(a => a.id !== id) : prev));
     } catch (error) {
       toast.error("Failed to delete activity");
     } finally {
@@ -991,17 +1023,39 @@ const ActivitiesPage = () => {
 
         {/* Activities List */}
         <Card className="card-base" data-testid="activities-list">
-          <CardHeader>
-            <CardTitle className="font-heading text-lg">Recent Activities</CardTitle>
+          <CardHeader className="flex flex-row items-center justify-between gap-4 space-y-0">
+            <CardTitle className="font-heading text-lg">
+              {searchResults ? "Search Results" : "Recent Activities"}
+            </CardTitle>
+            <form
+              className="flex items-center gap-2"
+              onSubmit={(e) => { e.preventDefault(); runSearch(); }}
+            >
+              <Input
+                value={searchQuery}
+                onChange={(e) => setSearchQuery(e.target.value)}
+                placeholder="Search descriptions and types"
+                className="w-64"
+                data-testid="activity-search-input"
+              />
+              <Button type="submit" variant="outline" size="icon" disabled={searching} data-testid="activity-search-btn">
+                {searching ? <Loader2 className="w-4 h-4 animate-spin" /> : <Search className="w-4 h-4" />}
+              </Button>
+              {searchResults && (
+                <Button type="button" variant="ghost" size="icon" onClick={clearSearch} data-testid="activity-search-clear">
+                  <X className="w-4 h-4" />
+                </Button>
+              )}
+            </form>
           </CardHeader>
           <CardContent>
             {loading ? (
               <div className="flex items-center justify-center py-12">
                 <Loader2 className="w-8 h-8 animate-spin text-[#1A4D2E]" />
               </div>
-            ) : activities.length > 0 ? (
+            ) : (searchResults ?? activities).length > 0 ? (
               <div className="space-y-4">
-                {activities.map((activity) => {
+                {(searchResults ?? activities).map((activity) => {
                   const catInfo = getCategoryInfo(activity.activity_category);
                   const Icon = catInfo.icon || Leaf;
                   return (
@@ -1055,6 +1109,19 @@ const ActivitiesPage = () => {
                     </div>
                   );
                 })}
+                {searchResults && nextCursor && (
+                  <div className="text-center">
+                    <Button variant="outline" onClick={() => runSearch(nextCursor)} disabled={searching} data-testid="activity-search-more">
+                      {searching && <Loader2 className="w-4 h-4 animate-spin mr-2" />}
+                      Load more
+                    </Button>
+                  </div>
+                )}
+              </div>
+            ) : searchResults ? (
+              <div className="py-12 text-center text-[#71717A]">
+                <Search className="w-12 h-12 mx-auto mb-4 opacity-20" />
+                <p>No activities match your search.</p>
               </div>
             ) : (
               <div className="py-12 text-center text-[#71717A]">
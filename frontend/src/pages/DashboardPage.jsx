@@ -38,11 +38,68 @@ const DashboardPage = () => {
   const [stats, setStats] = useState(null);
   const [leaderboard, setLeaderboard] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [uncertainty, setUncertainty] = useState(null);
 
   useEffect(() => {
     fetchData();
   }, []);
 
+  // Confidence interval of the total (Monte Carlo, cached server-side per data version)
+  const totalEmissions = stats?.total_emissions_kg;
+  useEffect(() => {
+    if (!totalEmissions) return;
+    apiClient
+      .get("/emissions/uncertainty")
+      .then((res) => setUncertainty(res.data.total))
+      .catch((error) => console.error(error));
+  }, [totalEmissions]);
+
+  // Live updates: the server pushes a snapshot, then only the stats that changed
+  useEffect(() => {
+    if (!localStorage.getItem("ecopulse_token") || typeof EventSource === "undefined") return;
+    let source = null;
+    let retry = null;
+    let closed = false;
+
+    // The stream is opened with a short-lived ticket: the access token never goes into the URL
+    const connect = async () => {
+      try {
+        const res = await apiClient.post("/dashboard/live/ticket");
+        if (closed) return;
+        source = new EventSource(
+          `${apiClient.defaults.baseURL}/dashboard/live?ticket=${encodeURIComponent(res.data.ticket)}`
+        );
+      } catch (error) {
+        console.error(error);
+        if (!closed) retry = setTimeout(connect, 30000);
+        return;
+      }
+      source.addEventListener("snapshot", (event) => {
+        setStats(JSON.parse(event.data).stats);
+      });
+      source.addEventListener("stats", (event) => {
+        const update = JSON.parse(event.data);
+        if (update.stats) {
+          setStats((prev) => ({ ...prev, ...update.stats }));
+        }
+      });
+      // On "resync" or a dropped connection the browser reconnects and gets a fresh snapshot.
+      // Once the ticket has expired that reconnect is refused: start over with a new ticket.
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && !closed) {
+          source.close();
+          retry = setTimeout(connect, 3000);
+        }
+      };
+    };
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) source.close();
+    };
+  }, []);
+
   const fetchData = async () => {
     try {
       const [statsRes, leaderboardRes] = await Promise.all([
@@ -103,6 +160,12 @@ const DashboardPage = () => {
                     {stats?.total_emissions_kg?.toLocaleString() || 0}
                   </p>
                   <p className="text-sm text-[#71717A]">kg CO₂</p>
+                  {uncertainty?.interval_95_kg && (
+                    <p className="text-xs text-[#71717A] mt-1" data-testid="total-emissions-interval">
+                      95% range: {Math.round(uncertainty.interval_95_kg[0]).toLocaleString()}–
+                      {Math.round(uncertainty.interval_95_kg[1]).toLocaleString()}
+                    </p>
+                  )}
                 </div>
                 <div className="w-12 h-12 rounded-2xl bg-[#1A4D2E]/10 flex items-center justify-center">
                   <TrendingDown className="w-6 h-6 text-[#1A4D2E]" />
@@ -39,12 +39,15 @@ import {
 } from "recharts";
 
 const COLORS = ['#1A4D2E', '#4F6F52', '#F9E400', '#3B82F6', '#EF4444', '#8B5CF6'];
+// Report rendering is polled every 2s for at most 5 minutes
+const REPORT_POLL_INTERVAL_MS = 2000;
+const REPORT_POLL_ATTEMPTS = 150;
 
 const InsightsPage = () => {
   const [insights, setInsights] = useState(null);
   const [loading, setLoading] = useState(true);
   const [generating, setGenerating] = useState(false);
-  const [downloading, setDownloading] = useState(false);
+  const [downloading, setDownloading] = useState(null);
 
   useEffect(() => {
     fetchInsights();
@@ -75,59 +78,44 @@ const InsightsPage = () => {
     }
   };
 
-  const downloadReport = async () => {
-    setDownloading(true);
+  const downloadReport = async (format) => {
+    setDownloading(format);
     try {
-      const response = await apiClient.get("/insights/report");
-      const report = response.data;
-      
-      // Create downloadable report
-      const reportContent = `
-ECOPULSE SUSTAINABILITY REPORT
-==============================
-Generated: ${new Date(report.report_date).toLocaleDateString()}
-Organization: ${report.organization}
-Period: ${report.period.start || 'N/A'} to ${report.period.end || 'N/A'}
-
-EXECUTIVE SUMMARY
------------------
-Total Carbon Footprint: ${report.executive_summary.total_carbon_footprint_kg} kg CO₂
-Total Activities Tracked: ${report.executive_summary.total_activities_tracked}
-Sustainability Score: ${report.executive_summary.sustainability_score}/100
-Trees Equivalent to Offset: ${report.executive_summary.trees_equivalent}
-Top Emission Source: ${report.executive_summary.top_emission_source}
-
-EMISSIONS BREAKDOWN
--------------------
-Activity Emissions: ${report.emissions_breakdown.activity_emissions} kg CO₂
-Energy Emissions: ${report.emissions_breakdown.energy_emissions} kg CO₂
-
-By Category:
-${Object.entries(report.emissions_breakdown.by_category || {}).map(([cat, val]) => `  - ${cat}: ${val} kg CO₂`).join('\n')}
+      // Rendered in the background: 202 with a poll URL until the file is ready
+      const requestExport = () => apiClient.get("/insights/report/export", {
+        params: { format },
+        responseType: "blob"
+      });
+      let response = await requestExport();
+      let job = response.status === 202 ? JSON.parse(await response.data.text()) : null;
+      for (let attempt = 0; job && (job.status === "queued" || job.status === "running"); attempt++) {
+        if (attempt >= REPORT_POLL_ATTEMPTS) {
+          throw new Error("Report is still rendering, try again later");
+        }
+        await new Promise((resolve) => setTimeout(resolve, REPORT_POLL_INTERVAL_MS));
+        try {
+          job = (await apiClient.get(job.poll_url.replace(/^\/api/, ""))).data;
+        } catch (error) {
+          // 410: the job was lost and the data changed since; ask for the current report
+          if (error.response?.status !== 410) {
+            throw error;
+          }
+          response = await requestExport();
+          job = response.status === 202 ? JSON.parse(await response.data.text()) : null;
+        }
+      }
+      if (job) {
+        if (job.status !== "done") {
+          throw new Error(job.error || "Report rendering failed");
+        }
+        response = await apiClient.get(job.download_url.replace(/^\/api/, ""), { responseType: "blob" });
+      }
 
-By Month:
-${Object.entries(report.emissions_breakdown.by_month || {}).map(([month, val]) => `  - ${month}: ${val} kg CO₂`).join('\n')}
-
-GOALS PROGRESS
---------------
-Active Goals: ${report.goals_progress.active}
-Completed Goals: ${report.goals_progress.completed}
-${report.goals_progress.goals.map(g => `  - ${g.title}: ${g.progress.toFixed(0)}% complete`).join('\n')}
-
-RECOMMENDATIONS
----------------
-${report.recommendations.map((r, i) => `${i + 1}. ${r}`).join('\n')}
-
----
-Report generated by EcoPulse NGO Sustainability Platform
-`;
-      
-      // Download as text file
-      const blob = new Blob([reportContent], { type: 'text/plain' });
-      const url = window.URL.createObjectURL(blob);
+      const filename = /filename="([^"]+)"/.exec(response.headers["content-disposition"] || "");
+      const url = window.URL.createObjectURL(response.data);
       const a = document.createElement('a');
       a.href = url;
-      a.download = `ecopulse-sustainability-report-${new Date().toISOString().split('T')[0]}.txt`;
+      a.download = filename ? filename[1] : `ecopulse-sustainability-report.${format}`;
       document.body.appendChild(a);
       a.click();
       window.URL.revokeObjectURL(url);
@@ -136,8 +124,9 @@ Report generated by EcoPulse NGO Sustainability Platform
       toast.success("Report downloaded successfully!");
     } catch (error) {
       toast.error("Failed to download report");
+      console.error(error);
     } finally {
-      setDownloading(false);
+      setDownloading(null);
     }
   };
 
@@ -200,13 +189,26 @@ Report generated by EcoPulse NGO Sustainability Platform
               )}
               Regenerate
             </Button>
+            <Button 
+              variant="outline"
+              onClick={() => downloadReport("xlsx")}
+              disabled={!!downloading}
+              data-testid="download-report-xlsx-btn"
+            >
+              {downloading === "xlsx" ? (
+                <Loader2 className="w-4 h-4 animate-spin mr-2" />
+              ) : (
+                <Download className="w-4 h-4 mr-2" />
+              )}
+              Excel
+            </Button>
             <Button 
               className="btn-primary"
-              onClick={downloadReport}
-              disabled={downloading}
+              onClick={() => downloadReport("pdf")}
+              disabled={!!downloading}
               data-testid="download-report-btn"
             >
-              {downloading ? (
+              {downloading === "pdf" ? (
                 <Loader2 className="w-4 h-4 animate-spin mr-2" />
               ) : (
                 <Download className="w-4 h-4 mr-2" />
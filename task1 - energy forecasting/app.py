@@ -1,3 +1,8 @@
+import os
+import sys
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
 import streamlit as st
 import numpy as np
 import pandas as pd
@@ -5,6 +10,28 @@ import joblib
 import plotly.express as px
 from config import ENSEMBLE_WEIGHTS, CO2_FACTOR
 
+# Shared with the backend: the portfolio optimizer and the optional profiler
+sys.path.append(str(Path(__file__).resolve().parent.parent / "backend"))
+from portfolio import DEFAULT_CATALOG, OBJECTIVES, optimize
+
+# Optional sampling profiler shared with the backend (enabled by PROFILE_DIR)
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+
+
+@contextmanager
+def _profile_run(label):
+    from profiling import ProfileStore, SamplingProfiler
+
+    store = ProfileStore(PROFILE_DIR, max_profiles=int(os.environ.get("PROFILE_MAX_FILES", "50")))
+    profiler = SamplingProfiler(interval=0.001)
+    with profiler:
+        yield
+    store.save(store.new_id(label), profiler.samples, profiler.interval)
+
+
+def profiled(label):
+    return _profile_run(label) if PROFILE_DIR else nullcontext()
+
 st.set_page_config(layout="wide")
 
 # -------------------------------------------------
@@ -21,6 +48,50 @@ def load_models():
 
 lr, rf, gb, scaler = load_models()
 
+# -------------------------------------------------
+# INVESTMENT PLANNER
+# -------------------------------------------------
+
+CATALOG_COLUMNS = {
+    "id": "ID",
+    "name": "Initiative",
+    "cost": "Estimated Investment (₹)",
+    "co2_t_per_year": "CO₂ Reduction (tons/year)",
+    "annual_savings": "Annual Savings (₹)",
+    "lifetime_years": "Lifetime (Years)",
+    "requires": "Requires (IDs)",
+}
+
+
+def catalog_frame(catalog):
+    df = pd.DataFrame(catalog)
+    df["requires"] = df["requires"].apply(", ".join)
+    return df[list(CATALOG_COLUMNS)].rename(columns=CATALOG_COLUMNS)
+
+
+def catalog_from_frame(df):
+    catalog = []
+    for row in df.rename(columns={v: k for k, v in CATALOG_COLUMNS.items()}).to_dict("records"):
+        # Rows added in the editor start empty
+        row = {k: None if pd.isna(v) else v for k, v in row.items()}
+        if not str(row["id"] or "").strip() or row["cost"] is None:
+            continue
+        catalog.append({
+            "id": str(row["id"]).strip(),
+            "name": row["name"] or str(row["id"]).strip(),
+            "cost": float(row["cost"]),
+            "co2_t_per_year": float(row["co2_t_per_year"] or 0),
+            "annual_savings": float(row["annual_savings"] or 0),
+            "lifetime_years": None if row["lifetime_years"] is None else float(row["lifetime_years"]),
+            "requires": [r.strip() for r in str(row["requires"] or "").split(",") if r.strip()],
+        })
+    return catalog
+
+
+@st.cache_data
+def plan_portfolio(catalog, budget, horizon, objective, carbon_price):
+    return optimize(catalog, budget, horizon, objective, carbon_price)
+
 # -------------------------------------------------
 # TITLE
 # -------------------------------------------------
@@ -185,6 +256,26 @@ Strategic optimization could reduce emissions by **20–30% annually**.
 
     rolling = (lag1 + lag2) / 2
 
+    st.sidebar.header("Investment Planner")
+
+    budget = st.sidebar.number_input("Budget (₹)", min_value=0, value=500000, step=10000)
+    horizon = st.sidebar.slider("Planning Horizon (Years)", 1, 20, 5)
+    objective = st.sidebar.selectbox(
+        "Optimize For", OBJECTIVES,
+        format_func={"co2": "CO₂ reduction", "net_savings": "Net savings", "carbon_value": "Savings + carbon value"}.get
+    )
+    carbon_price = st.sidebar.number_input("Carbon Price (₹/ton)", min_value=0, value=12000, step=1000) \
+        if objective == "carbon_value" else 0
+
+    with st.expander("Initiative Catalog"):
+        edited = st.data_editor(catalog_frame(DEFAULT_CATALOG), num_rows="dynamic", use_container_width=True)
+
+    try:
+        plan = plan_portfolio(catalog_from_frame(edited), budget, horizon, objective, carbon_price)
+    except ValueError as e:
+        plan = None
+        st.error(f"Initiative catalog: {e}")
+
     features = np.array([[
         hour, is_weekend, activity_index,
         T_out, RH_out, wind,
@@ -195,17 +286,18 @@ Strategic optimization could reduce emissions by **20–30% annually**.
     # Run Prediction
     if st.button("Run AI Sustainability Analysis"):
 
-        scaled = scaler.transform(features)
+        with profiled("streamlit-prediction"):
+            scaled = scaler.transform(features)
 
-        pred_lr = np.expm1(lr.predict(scaled))[0]
-        pred_rf = np.expm1(rf.predict(features))[0]
-        pred_gb = np.expm1(gb.predict(features))[0]
+            pred_lr = np.expm1(lr.predict(scaled))[0]
+            pred_rf = np.expm1(rf.predict(features))[0]
+            pred_gb = np.expm1(gb.predict(features))[0]
 
-        ensemble = (
-            ENSEMBLE_WEIGHTS["lr"] * pred_lr +
-            ENSEMBLE_WEIGHTS["rf"] * pred_rf +
-            ENSEMBLE_WEIGHTS["gb"] * pred_gb
-        )
+            ensemble = (
+                ENSEMBLE_WEIGHTS["lr"] * pred_lr +
+                ENSEMBLE_WEIGHTS["rf"] * pred_rf +
+                ENSEMBLE_WEIGHTS["gb"] * pred_gb
+            )
 
         carbon = ensemble * CO2_FACTOR
 
@@ -262,42 +354,16 @@ Strategic optimization could reduce emissions by **20–30% annually**.
         # Decision Engine
         st.header("AI Decision Intelligence")
 
-        actions = [
-            ("Optimize HVAC schedules", carbon*0.18, 65000),
-            ("Shift programs to hybrid delivery", carbon*0.12, 52000),
-            ("Upgrade to LED lighting", carbon*0.09, 40000)
-        ]
+        actions = [i for i in plan["initiatives"] if i["selected"]] if plan else []
 
-        for action, co2, money in actions:
-            st.write(f"✅ **{action}**")
-            st.write(f"CO₂ Reduction Potential: {co2:.2f} tons/year")
-            st.write(f"Savings Potential: ₹{money:,}")
+        for action in actions:
+            st.write(f"✅ **{action['name']}**")
+            st.write(f"CO₂ Reduction Potential: {action['co2_t_per_year']:.2f} tons/year")
+            st.write(f"Savings Potential: ₹{action['annual_savings']:,.0f}")
             st.divider()
 
-        # Investment Planner
-        st.header("AI Sustainability Capital Allocator")
-
-        data = {
-            "Initiative": ["LED Lighting Upgrade",
-                           "Hybrid Program Delivery",
-                           "Solar Installation"],
-            "Estimated Investment (₹)": [150000, 80000, 400000],
-            "CO₂ Reduction (tons/year)": [3.2, 2.1, 6.8],
-            "Annual Savings (₹)": [90000, 70000, 120000]
-        }
-
-        df = pd.DataFrame(data)
-        df["ROI Score"] = (df["Annual Savings (₹)"] /
-                           df["Estimated Investment (₹)"]).round(2)
-
-        df["Payback Period (Years)"] = (
-            df["Estimated Investment (₹)"] /
-            df["Annual Savings (₹)"]
-        ).round(1)
-
-        st.dataframe(df.sort_values(by="ROI Score", ascending=False))
-
-        st.success("AI recommends prioritizing investments with the highest carbon reduction per rupee.")
+        if not actions:
+            st.write("No initiative fits the planner budget.")
 
         # Environmental Equivalent
         trees = int(carbon * 0.04 * 365)
@@ -311,3 +377,39 @@ Strategic optimization could reduce emissions by **20–30% annually**.
             • Explainable AI  
             • Scenario-based sustainability planning  
             """)
+
+    # Investment Planner
+    st.header("AI Sustainability Capital Allocator")
+
+    if plan:
+        t = plan["totals"]
+        p1, p2, p3, p4 = st.columns(4)
+        p1.metric("Portfolio Investment", f"₹{t['cost']:,.0f}", f"₹{t['budget_remaining']:,.0f} unallocated", delta_color="off")
+        p2.metric("CO₂ Reduction", f"{t['co2_t_per_year']:.1f} tons/year", f"{t['co2_t']:.1f} tons over {horizon} years", delta_color="off")
+        p3.metric("Annual Savings", f"₹{t['annual_savings']:,.0f}")
+        p4.metric("Payback Period", f"{t['payback_years']} years" if t["payback_years"] else "—")
+
+        df = pd.DataFrame(plan["initiatives"]).rename(columns={
+            "name": "Initiative",
+            "selected": "Selected",
+            "cost": "Estimated Investment (₹)",
+            "co2_t_per_year": "CO₂ Reduction (tons/year)",
+            "annual_savings": "Annual Savings (₹)",
+            "roi": "ROI Score",
+            "payback_years": "Payback Period (Years)",
+            "cost_per_tonne": "₹ per ton CO₂",
+        }).drop(columns=["id", "objective_value"])
+
+        st.dataframe(df.sort_values(by=["Selected", "Estimated Investment (₹)"], ascending=[False, True]), hide_index=True)
+
+        if plan["optimal"]:
+            st.success(f"Optimal portfolio for this budget ({plan['method'].replace('_', ' ')}, {plan['solve_ms']:.0f} ms).")
+        else:
+            st.warning(f"Search stopped early: the portfolio is within {plan['optimality_gap']:,.2f} of the optimum.")
+
+        if plan["frontier"]:
+            st.subheader("Budget Frontier")
+            frontier = pd.DataFrame(plan["frontier"])
+            fig = px.line(frontier, x="budget", y="value", line_shape="hv",
+                          labels={"budget": "Budget (₹)", "value": objective})
+            st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,98 @@
+import itertools
+import random
+
+import pytest
+
+import portfolio
+from portfolio import DEFAULT_CATALOG, optimize
+
+
+def brute_force(catalog, budget, horizon_years, objective, carbon_price=0.0):
+    values = portfolio.initiative_values(catalog, horizon_years)
+    value = portfolio.objective_values(values, objective, carbon_price)
+    parents = portfolio._parents(catalog)
+    best = 0.0
+    for mask in itertools.product((False, True), repeat=len(catalog)):
+        selected = [i for i, taken in enumerate(mask) if taken]
+        if values["cost"][selected].sum() > budget:
+            continue
+        if all(mask[p] for i in selected for p in parents[i]):
+            best = max(best, float(value[selected].sum()))
+    return best
+
+
+def random_catalog(rng, n, max_requires):
+    catalog = []
+    for i in range(n):
+        requires = rng.sample(range(i), min(i, rng.randint(1, max_requires))) if i and rng.random() < 0.5 else []
+        catalog.append({
+            "id": f"i{i}",
+            "cost": rng.randint(1, 100) * 1000 + rng.choice((0, rng.randint(0, 999))),
+            "co2_t_per_year": round(rng.uniform(0, 10), 2),
+            "annual_savings": rng.randint(0, 50) * 1000,
+            "lifetime_years": rng.randint(2, 15),
+            "requires": [f"i{j}" for j in requires],
+        })
+    return catalog
+
+
+@pytest.mark.parametrize("objective", portfolio.OBJECTIVES)
+@pytest.mark.parametrize("budget", [0, 100000, 300000, 600000, 1000000, 2000000])
+def test_default_catalog_matches_brute_force(budget, objective):
+    result = optimize(DEFAULT_CATALOG, budget, 5, objective, carbon_price=5000)
+    assert result["optimal"]
+    assert result["objective_value"] == pytest.approx(brute_force(DEFAULT_CATALOG, budget, 5, objective, 5000), abs=1e-6)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_random_catalogs_match_brute_force(seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 12)
+    catalog = random_catalog(rng, n, max_requires=1 if seed % 2 else 3)
+    budget = rng.randint(0, n * 50) * 1000
+    values = portfolio.initiative_values(catalog, 6)
+    parents = portfolio._parents(catalog)
+    for objective in ("co2", "net_savings"):
+        expected = brute_force(catalog, budget, 6, objective)
+        assert optimize(catalog, budget, 6, objective)["objective_value"] == pytest.approx(expected, abs=1e-6)
+
+        # Branch and bound on every catalog, forests included
+        value = portfolio.objective_values(values, objective, 0.0)
+        selected, _, complete, root_bound = portfolio._solve_branch_and_bound(value, values["cost"], float(budget), parents)
+        assert complete
+        assert float(value[selected].sum()) == pytest.approx(expected, abs=1e-6)
+        assert values["cost"][selected].sum() <= budget + 1e-6
+        assert all(p in selected for i in selected for p in parents[i])
+        assert root_bound >= expected - 1e-6
+
+
+def test_max_closure_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(100):
+        n = rng.randint(1, 10)
+        parents = [sorted(rng.sample(range(i), min(i, rng.randint(0, 3)))) for i in range(n)]
+        gain = [rng.uniform(-10, 10) for _ in range(n)]
+        closure, flows = portfolio._max_closure(gain, parents)
+        assert all(p in closure for i in closure for p in parents[i])
+        best = max(
+            sum(gain[i] for i in range(n) if mask[i])
+            for mask in itertools.product((False, True), repeat=n)
+            if all(mask[p] for i in range(n) if mask[i] for p in parents[i])
+        )
+        assert sum(gain[i] for i in closure) == pytest.approx(best, abs=1e-9)
+        assert all(f >= 0 for fs in flows for f in fs)
+
+
+def test_large_dag_bound_is_close():
+    rng = random.Random(3)
+    catalog = random_catalog(rng, 300, max_requires=4)
+    result = optimize(catalog, sum(item["cost"] for item in catalog) // 4, 5, "co2")
+    assert result["method"] == "branch_and_bound"
+    assert result["optimality_gap"] <= 0.05 * result["objective_value"]
+
+
+def test_rejects_cycles_and_unknown_prerequisites():
+    with pytest.raises(ValueError):
+        optimize([{"id": "a", "cost": 1, "requires": ["b"]}, {"id": "b", "cost": 1, "requires": ["a"]}], 10)
+    with pytest.raises(ValueError):
+        optimize([{"id": "a", "cost": 1, "requires": ["missing"]}], 10)
@@ -0,0 +1,102 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import benchmarks
+from quantile_sketch import TDigest
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+@pytest.fixture(scope="module")
+def values():
+    return np.random.default_rng(7).lognormal(mean=3.0, sigma=1.2, size=200_000)
+
+
+@pytest.fixture(scope="module")
+def merged(values):
+    digest = TDigest(benchmarks.COMPRESSION)
+    for part in np.array_split(values, 10):
+        partial = TDigest(benchmarks.COMPRESSION)
+        partial.update(part.tolist())
+        digest.merge(partial)
+    return digest
+
+
+def assert_matches(digest, values):
+    assert digest.total == len(values)
+    assert digest.min == values.min() and digest.max == values.max()
+    for q in QUANTILES:
+        exact = np.percentile(values, q * 100)
+        # Compared by rank: the lognormal tail makes value errors meaningless there
+        assert np.mean(values <= digest.quantile(q)) == pytest.approx(q, abs=0.005)
+        assert digest.cdf(exact) == pytest.approx(q, abs=0.005)
+
+
+def test_merged_partial_digests_match_numpy(merged, values):
+    assert_matches(merged, values)
+    assert len(merged.means) < benchmarks.COMPRESSION * np.log(len(values))
+
+
+def test_round_trip_keeps_the_digest(merged, values):
+    restored = TDigest.from_dict(merged.to_dict())
+    assert restored.means == merged.means and restored.weights == merged.weights
+    assert_matches(restored, values)
+
+
+def test_cdf_and_quantile_bounds():
+    digest = TDigest()
+    assert digest.quantile(0.5) is None and digest.cdf(1.0) == 0.0
+    digest.update([1.0, 2.0, 3.0])
+    assert digest.cdf(0.5) == 0.0 and digest.cdf(3.0) == 1.0
+    assert digest.quantile(0.0) == 1.0 and digest.quantile(1.0) == 3.0
+
+
+def month(values_by_org, staffed=()):
+    """MonthSketches for one category from {org id: kg}."""
+    digests = {metric: TDigest(benchmarks.COMPRESSION) for metric in benchmarks.METRICS}
+    for org_id, kg in values_by_org.items():
+        digests["kg"].add(kg)
+        if org_id in staffed:
+            digests["kg_per_staff"].add(kg)
+    return {"travel": digests}, {"travel": list(values_by_org)}, sorted(staffed)
+
+
+def test_window_counts_inactive_peer_months_as_zero(monkeypatch):
+    months = {
+        "2026-08": month({"a": 10.0, "c": 6.0}, staffed={"a", "c"}),
+        "2026-09": month({"a": 10.0, "b": 20.0}, staffed={"a"}),
+    }
+    sketches = benchmarks.BenchmarkSketches()
+
+    async def fake_months(db, window):
+        return {m: months[m] for m in window if m in months}
+
+    monkeypatch.setattr(sketches, "months", fake_months)
+    merged, peers = asyncio.run(sketches.window(None, ["2026-08", "2026-09"]))
+
+    kg = merged["travel"]["kg"]
+    # a: 10, 10; b: 0, 20; c: 6, 0
+    assert kg.total == 6
+    assert (kg.min, kg.means[0], kg.weights[0]) == (0.0, 0.0, 2.0)
+    assert peers["travel"] == {"kg": 3, "kg_per_staff": 2}
+    # a and c staffed: 10, 6 and c's empty month
+    assert merged["travel"]["kg_per_staff"].total == 4
+
+    # Unchanged months reuse the merged window
+    again, _ = asyncio.run(sketches.window(None, ["2026-08", "2026-09"]))
+    assert again is merged
+
+
+def test_window_without_inactive_months_adds_no_zeros(monkeypatch):
+    months = {"2026-09": month({"a": 10.0, "b": 20.0})}
+    sketches = benchmarks.BenchmarkSketches()
+
+    async def fake_months(db, window):
+        return months
+
+    monkeypatch.setattr(sketches, "months", fake_months)
+    merged, peers = asyncio.run(sketches.window(None, ["2026-09"]))
+    assert merged["travel"]["kg"].total == 2 and merged["travel"]["kg"].min == 10.0
+    assert peers["travel"]["kg"] == 2